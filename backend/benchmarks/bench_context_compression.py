@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+上下文压缩基准测试
+
+使用确定性假模型（可配置延迟）驱动 ContextManager，在 10 ~ 10000 条中英文混合的合成历史上测量：
+- count_tokens（冷缓存 / 热缓存）
+- _group_dialogue_blocks
+- compress_messages（按 --modes 指定的压缩模式）
+统计耗时（--repeat 轮取中位数）、发起的LLM调用次数以及峰值内存（tracemalloc，单独一轮测量，不影响计时）。
+
+指定 --baseline 时与基线比较：LLM调用次数增加、或峰值内存超过基线 (1 + threshold) 倍时视为性能回退，
+这两项与机器负载无关；耗时同样按 (1 + threshold) 倍判定，但只有耗时差超过 --min-delta-ms 时才计入，
+避免 CI 机器的计时抖动导致误报。有回退时进程以状态码 1 退出，可直接用于 CI。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_context_compression --sizes 10,100,1000,10000
+    python -m benchmarks.bench_context_compression --baseline benchmarks/baselines/context_compression.json
+    python -m benchmarks.bench_context_compression --update-baseline benchmarks/baselines/context_compression.json
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from benchmarks.fake_llm import FakeChatModel
+from src.utils.content import ContextManager
+
+_ZH = "大语言模型在深度研究任务中需要检索大量网页，并将检索结果整理成结构化的研究报告。"
+_EN = "Large language models retrieve many web pages during deep research and summarize the findings. "
+
+
+def synthetic_history(n: int, seed: int = 0) -> list:
+    """生成 n 条确定性的中英文混合历史：用户提问、AI 回复与工具调用/结果交替出现"""
+    rng = random.Random(seed)
+    messages = [SystemMessage(content="你是一个研究助手。"), HumanMessage(content="研究大语言模型的最新进展")]
+    i = 0
+    while len(messages) < n:
+        text = "".join(rng.choice([_ZH, _EN]) for _ in range(rng.randint(1, 12)))
+        kind = i % 4
+        if kind == 0:
+            messages.append(HumanMessage(content=f"[{i}] {text}", id=f"h{i}"))
+        elif kind == 1 and len(messages) + 2 <= n:
+            call = {"id": f"call_{i}", "name": "search", "args": {"query": text[:20]}}
+            messages.append(AIMessage(content="", tool_calls=[call], id=f"a{i}"))
+            messages.append(ToolMessage(content=f"[{i}] {text * 3}", tool_call_id=f"call_{i}", id=f"t{i}"))
+        else:
+            messages.append(AIMessage(content=f"[{i}] {text}", id=f"a{i}"))
+        i += 1
+    return messages[:n]
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _peak_memory(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes: List[int], modes: List[str], latency: float, max_tokens: int,
+        repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+
+    def record(name: str, make_op: Callable[[], Callable[[], object]], llm: FakeChatModel = None) -> None:
+        # make_op 每次返回一个新的操作（新的 ContextManager），保证各轮计时与内存测量互不影响缓存
+        walls = []
+        calls = 0
+        for _ in range(max(repeat, 1)):
+            op = make_op()
+            calls_before = llm.calls if llm else 0
+            walls.append(_timed(op))
+            calls = (llm.calls - calls_before) if llm else 0
+        peak = _peak_memory(make_op())
+        results[name] = {"wall_ms": statistics.median(walls) * 1000, "llm_calls": calls, "peak_kb": peak / 1024}
+
+    for n in sizes:
+        history = synthetic_history(n)
+
+        def count_cold():
+            manager = ContextManager(None, max_tokens=max_tokens)
+            return lambda: manager.count_tokens(history)
+
+        def count_warm():
+            manager = ContextManager(None, max_tokens=max_tokens)
+            manager.count_tokens(history)
+            return lambda: manager.count_tokens(history)
+
+        def group_blocks():
+            manager = ContextManager(None, max_tokens=max_tokens)
+            dialogue = [m for m in history if not isinstance(m, ToolMessage)]
+            return lambda: manager._group_dialogue_blocks(dialogue)
+
+        record(f"count_tokens/cold/{n}", count_cold)
+        record(f"count_tokens/warm/{n}", count_warm)
+        record(f"group_blocks/-/{n}", group_blocks)
+
+        for mode in modes:
+            llm = FakeChatModel(latency=latency, response="总结 summary")
+
+            def compress(mode=mode, llm=llm):
+                manager = ContextManager(llm, max_tokens=max_tokens, compression_mode=mode)
+                return lambda: manager.compress_messages(history)
+
+            record(f"compress/{mode}/{n}", compress, llm)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float, min_delta_ms: float) -> List[str]:
+    """返回性能回退的描述列表"""
+    regressions = []
+    for name, base in baseline.items():
+        cur = results.get(name)
+        if cur is None:
+            continue
+        if cur["wall_ms"] > base["wall_ms"] * (1 + threshold) and cur["wall_ms"] - base["wall_ms"] > min_delta_ms:
+            regressions.append(f"{name}: 耗时 {base['wall_ms']:.1f}ms -> {cur['wall_ms']:.1f}ms")
+        if cur["peak_kb"] > base["peak_kb"] * (1 + threshold) and cur["peak_kb"] - base["peak_kb"] > 64:
+            regressions.append(f"{name}: 峰值内存 {base['peak_kb']:.0f}KB -> {cur['peak_kb']:.0f}KB")
+        if cur["llm_calls"] > base["llm_calls"]:
+            regressions.append(f"{name}: LLM调用 {base['llm_calls']:.0f} -> {cur['llm_calls']:.0f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="历史消息条数，逗号分隔")
+    parser.add_argument("--modes", default="full,incremental,extractive", help="压缩模式，逗号分隔")
+    parser.add_argument("--latency", type=float, default=0.0, help="假模型每次调用的延迟（秒）")
+    parser.add_argument("--max-tokens", type=int, default=32768, help="ContextManager 的 token 上限")
+    parser.add_argument("--baseline", help="基线 JSON 文件，与之比较并在回退时以状态码 1 退出")
+    parser.add_argument("--update-baseline", help="将本次结果写入基线 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.5, help="允许的相对回退比例")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="小于该耗时差的变化不判定回退")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例计时的轮数，取中位数")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    modes = [m for m in args.modes.split(",") if m]
+    results = run(sizes, modes, args.latency, args.max_tokens, args.repeat)
+
+    print(f"{'用例':<32}{'耗时':>12}{'LLM调用':>10}{'峰值内存':>12}")
+    for name, r in results.items():
+        print(f"{name:<32}{r['wall_ms']:>10.1f}ms{r['llm_calls']:>10.0f}{r['peak_kb']:>10.0f}KB")
+
+    if args.update_baseline:
+        path = Path(args.update_baseline)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, ensure_ascii=False, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"基线已写入 {path}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("性能回退：")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"与基线 {args.baseline} 相比没有性能回退（阈值 {args.threshold:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+搜索连接池基准测试
+
+在后台线程启动本地模拟 Tavily 服务（默认 HTTPS，自签名证书由 openssl 生成），
+顺序发起 N 次搜索请求，对比每次请求的平均/中位延迟：
+- 异步：每次新建 aiohttp.ClientSession（原实现） vs 共享 HttpPool 会话
+- 同步：requests.post（原实现） vs 共享 requests.Session
+模拟服务按 --server-latency 延迟响应，差值即为每次请求重新建立 TCP/TLS 连接的开销。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_search_pool --queries 200
+    python -m benchmarks.bench_search_pool --queries 200 --no-tls
+"""
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+import aiohttp
+import requests
+from aiohttp import web
+
+from src.tools.http_pool import HttpPool
+
+
+def _make_cert(directory: str):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+         "-days", "1", "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def _start_server(server_latency: float, cert_key=None):
+    """在后台线程运行模拟服务，返回 (base_url, stop)"""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    async def search(request):
+        body = await request.json()
+        if server_latency:
+            await asyncio.sleep(server_latency)
+        return web.json_response({"query": body.get("query"), "results": [], "images": []})
+
+    async def setup():
+        app = web.Application()
+        app.router.add_post("/search", search)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        ssl_ctx = None
+        if cert_key:
+            ssl_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_ctx.load_cert_chain(*cert_key)
+        site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=ssl_ctx)
+        await site.start()
+        state["runner"] = runner
+        state["port"] = site._server.sockets[0].getsockname()[1]
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(setup())
+        started.set()
+        loop.run_forever()
+        loop.run_until_complete(state["runner"].cleanup())
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    scheme = "https" if cert_key else "http"
+    return f"{scheme}://127.0.0.1:{state['port']}", stop
+
+
+async def _async_case(url: str, n: int, pooled: bool, ssl_ctx) -> list:
+    pool = HttpPool(ssl_context=ssl_ctx)
+    latencies = []
+    try:
+        for i in range(n):
+            t0 = time.perf_counter()
+            if pooled:
+                async with pool.session().post(f"{url}/search", json={"query": str(i)}) as resp:
+                    await resp.text()
+            else:
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(f"{url}/search", json={"query": str(i)}, ssl=ssl_ctx) as resp:
+                        await resp.text()
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        await pool.close()
+    return latencies
+
+
+def _sync_case(url: str, n: int, pooled: bool, verify) -> list:
+    pool = HttpPool()
+    session = pool.sync_session()
+    latencies = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        if pooled:
+            # verify 按请求传入：设置了 REQUESTS_CA_BUNDLE 时会覆盖 session.verify
+            session.post(f"{url}/search", json={"query": str(i)}, verify=verify).raise_for_status()
+        else:
+            requests.post(f"{url}/search", json={"query": str(i)}, verify=verify).raise_for_status()
+        latencies.append(time.perf_counter() - t0)
+    asyncio.run(pool.close())
+    return latencies
+
+
+def _report(name: str, latencies: list) -> None:
+    ms = [x * 1000 for x in latencies]
+    print(f"{name:<28}{statistics.mean(ms):>10.2f}ms{statistics.median(ms):>10.2f}ms{max(ms):>10.2f}ms")
+
+
+def run(n_queries: int, server_latency: float, tls: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cert_key = _make_cert(tmpdir) if tls else None
+        url, stop = _start_server(server_latency, cert_key)
+        ssl_ctx = ssl.create_default_context(cafile=cert_key[0]) if tls else None
+        verify = cert_key[0] if tls else True
+        try:
+            print(f"模拟服务: {url}, 请求数: {n_queries}, 服务端延迟: {server_latency * 1000:g}ms")
+            print(f"{'场景':<28}{'平均':>12}{'中位':>12}{'最大':>12}")
+            _report("异步-每次新建会话", asyncio.run(_async_case(url, n_queries, False, ssl_ctx)))
+            _report("异步-共享连接池", asyncio.run(_async_case(url, n_queries, True, ssl_ctx)))
+            _report("同步-requests.post", _sync_case(url, n_queries, False, verify))
+            _report("同步-共享Session", _sync_case(url, n_queries, True, verify))
+        finally:
+            stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--server-latency", type=float, default=0.0, help="模拟服务的响应延迟（秒）")
+    parser.add_argument("--no-tls", action="store_true", help="使用 HTTP 而不是 HTTPS")
+    args = parser.parse_args()
+    run(args.queries, args.server_latency, not args.no_tls)
+
+
+if __name__ == "__main__":
+    main()
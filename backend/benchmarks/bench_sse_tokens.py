@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+SSE token 帧合并基准测试
+
+模拟 N 条并发流，每条流以固定速率产出 1~3 个字符的增量 token，
+与服务端相同：经 coalesce_token_events 合并后写入 EventLog，再由 main._sse_response 订阅写成 SSE 字节流，对比：
+- 合并前：每个 token 单独成帧（token_flush_bytes=0）
+- 合并后：按 sse 配置的字节数/时间窗口合并
+统计帧数、帧/秒、输出字节数以及每 1k token 消耗的 CPU 时间；
+"token源" 一行为仅产出 token 的开销，两种场景减去它即为 SSE 输出层本身的开销。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_sse_tokens --streams 20 --tokens 2000 --rate 1000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.fake_llm import install_fake_llm
+from src.server.event_log import EventLog
+from src.server.streaming import coalesce_token_events, create_token_batcher
+
+_ALPHABET = "研究报告的深度分析数据模型abcdefghijklmnopqrstuvwxyz "
+
+
+async def _token_source(plan_id: str, n_tokens: int, rate: float, seed: int):
+    """以约 rate token/s 的速率产出 chunk 事件（按 1ms 粒度成批产出）"""
+    rng = random.Random(seed)
+    per_ms = max(1, int(rate / 1000))
+    for i in range(n_tokens):
+        delta = "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(1, 3)))
+        yield "chunk", {"plan_id": plan_id, "delta": delta}
+        if (i + 1) % per_ms == 0:
+            await asyncio.sleep(0.001)
+    yield "done", {"plan_id": plan_id}
+
+
+async def stream_frames(main, source, conf: dict):
+    """
+    与后台运行相同的路径：合并后的事件写入 EventLog，_sse_response 订阅日志输出 SSE 帧
+    环形缓冲区足够容纳整条流，慢消费者不会出现 replay_gap
+    """
+    log = EventLog(maxlen=1_000_000)
+
+    async def produce():
+        try:
+            batcher = create_token_batcher(conf)
+            async for event, data in coalesce_token_events(source, batcher):
+                log.append(event, data)
+        finally:
+            log.close()
+
+    producer = asyncio.create_task(produce())
+    try:
+        async for frame in main._sse_response(log).body_iterator:
+            yield frame
+    finally:
+        producer.cancel()
+
+
+async def _run_case(main, conf, n_streams: int, n_tokens: int, rate: float) -> dict:
+    """conf 为 None 时只消费 token 源本身，用于扣除模拟产出 token 的开销"""
+
+    async def consume(i: int):
+        source = _token_source(f"p{i}", n_tokens, rate, seed=i)
+        frames = 0
+        size = 0
+        if conf is None:
+            async for _ in source:
+                frames += 1
+            return frames, size
+        async for frame in stream_frames(main, source, conf):
+            frames += 1
+            size += len(frame)
+        return frames, size
+
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*[consume(i) for i in range(n_streams)])
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    frames = sum(f for f, _ in results)
+    total_tokens = n_streams * n_tokens
+    return {
+        "frames": frames,
+        "bytes": sum(s for _, s in results),
+        "wall": wall,
+        "frames_per_sec": frames / wall,
+        "cpu_per_1k_tokens_ms": cpu / (total_tokens / 1000) * 1000,
+    }
+
+
+async def run(n_streams: int, n_tokens: int, rate: float, flush_bytes: int, flush_ms: float) -> dict:
+    install_fake_llm()
+    import main
+
+    cases = [
+        ("token源(参照)", None),
+        ("合并前(逐token)", {"token_flush_bytes": 0, "token_flush_ms": 0}),
+        (f"合并后({flush_bytes}B/{flush_ms:g}ms)", {"token_flush_bytes": flush_bytes, "token_flush_ms": flush_ms}),
+    ]
+    print(f"流数: {n_streams}, 每流token数: {n_tokens}, 每流速率: {rate:g} token/s")
+    print(f"{'场景':<22}{'帧数':>10}{'帧/秒':>12}{'字节数':>12}{'CPU/1k token':>16}")
+    results = {}
+    for name, conf in cases:
+        r = results[name] = await _run_case(main, conf, n_streams, n_tokens, rate)
+        print(
+            f"{name:<22}{r['frames']:>10}{r['frames_per_sec']:>12.0f}"
+            f"{r['bytes']:>12}{r['cpu_per_1k_tokens_ms']:>14.2f}ms"
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=20, help="并发流数量")
+    parser.add_argument("--tokens", type=int, default=2000, help="每条流的 token 数")
+    parser.add_argument("--rate", type=float, default=1000, help="每条流每秒产出的 token 数")
+    parser.add_argument("--flush-bytes", type=int, default=256, help="合并后的字节数上限")
+    parser.add_argument("--flush-ms", type=float, default=30, help="合并后的时间窗口（毫秒）")
+    args = parser.parse_args()
+    asyncio.run(run(args.streams, args.tokens, args.rate, args.flush_bytes, args.flush_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+/api/research/start 并发基准测试
+
+使用假模型（固定延迟）替换真实LLM，同时发起N个 /start 请求，
+对比单个请求耗时与N个并发请求的总耗时，并统计事件循环最大卡顿时间。
+协调器路径完全异步时，N个并发请求的总耗时应与单个请求接近。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_start_concurrency --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_llm import install_fake_llm
+
+
+async def _loop_lag_monitor(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """记录事件循环的最大调度延迟"""
+    max_lag = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+    return max_lag
+
+
+async def run(n_requests: int, latency: float) -> None:
+    install_fake_llm(latency=latency)
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def start_one(i: int) -> float:
+            t0 = time.perf_counter()
+            resp = await client.post("/api/research/start", json={"topic": f"问题 {i}", "locale": "zh-CN"})
+            resp.raise_for_status()
+            return time.perf_counter() - t0
+
+        # 预热，避免首次导入/编译开销计入
+        await start_one(-1)
+
+        single = await start_one(0)
+
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(_loop_lag_monitor(stop))
+        t0 = time.perf_counter()
+        latencies = await asyncio.gather(*[start_one(i) for i in range(n_requests)])
+        total = time.perf_counter() - t0
+        stop.set()
+        max_lag = await monitor
+
+    print(f"模型延迟: {latency:.3f}s, 并发请求数: {n_requests}")
+    print(f"单个请求耗时:   {single:.3f}s")
+    print(f"并发总耗时:     {total:.3f}s  (单请求的 {total / single:.2f} 倍)")
+    print(f"并发请求平均:   {sum(latencies) / len(latencies):.3f}s, 最大: {max(latencies):.3f}s")
+    print(f"事件循环最大卡顿: {max_lag * 1000:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="并发请求数")
+    parser.add_argument("--latency", type=float, default=0.5, help="假模型每次调用的延迟（秒）")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+token 计数器基准测试：估算 vs 本地词表 BPE
+
+对几类典型上下文（中文报告、英文网页、代码、JSON 工具输出）分别统计：
+- 真实 token 数（BPE 词表分词结果）与估算值，估算/真实 的比值越大，上下文窗口浪费越多
+  （ContextManager 还会对 AI/Tool 消息再乘以 1.2/1.5）
+- 在 max_tokens 预算下，按估算最多能放入的真实 token 数
+- 每 1MB 文本的计数耗时：估算、纯 Python BPE（冷/热缓存）、tiktoken 原生实现
+
+用法（在 backend 目录下，词表需提前下载到本地）：
+    python -m benchmarks.bench_tokenizer --vocab data/cl100k_base.tiktoken --size 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from src.utils.tokenizer import BPETokenizer, HeuristicTokenizer
+
+
+def _corpora(size: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    zh = "大语言模型在深度研究任务中需要检索大量网页，并将检索结果整理成结构化的研究报告。"
+    en = "Large language models retrieve many web pages during deep research and summarize the findings. "
+    code = (
+        "def merge_sections(sections: list[dict], limit: int = 10) -> str:\n"
+        "    return \"\\n\\n\".join(s[\"content\"][:limit] for s in sections if s.get(\"ok\"))\n\n"
+    )
+
+    def tool_output() -> str:
+        return json.dumps({
+            "url": f"https://example.com/articles/{rng.randint(1, 10**6)}",
+            "title": "深度研究 Deep Research 报告",
+            "score": round(rng.random(), 4),
+            "content": rng.choice([zh, en]),
+        }, ensure_ascii=False) + "\n"
+
+    def fill(make) -> str:
+        parts, n = [], 0
+        while n < size:
+            part = make()
+            parts.append(part)
+            n += len(part)
+        return "".join(parts)[:size]
+
+    return {
+        "中文报告": fill(lambda: zh),
+        "英文网页": fill(lambda: en),
+        "代码": fill(lambda: code),
+        "JSON工具输出": fill(tool_output),
+    }
+
+
+def _timed(fn, text: str):
+    t0 = time.perf_counter()
+    result = fn(text)
+    return result, time.perf_counter() - t0
+
+
+def run(vocab_path: str, pattern: str, size: int, max_tokens: int) -> None:
+    heuristic = HeuristicTokenizer()
+    python_bpe = BPETokenizer(vocab_path, pattern=pattern, use_tiktoken=False)
+    native_bpe = BPETokenizer(vocab_path, pattern=pattern)
+
+    print(f"词表: {vocab_path}, 每类文本 {size} 字符, 预算 max_tokens={max_tokens}")
+    header = (
+        f"{'文本':<14}{'真实token':>10}{'估算':>10}{'估算/真实':>10}{'预算可用':>10}"
+        f"{'估算 ms/MB':>12}{'BPE冷 ms/MB':>13}{'BPE热 ms/MB':>13}{'tiktoken ms/MB':>16}"
+    )
+    print(header)
+    for name, text in _corpora(size).items():
+        mb = len(text.encode("utf-8")) / 1e6
+        estimated, t_heuristic = _timed(heuristic.count, text)
+        python_bpe._cache.clear()
+        exact, t_cold = _timed(python_bpe.count, text)
+        _, t_warm = _timed(python_bpe.count, text)
+        if native_bpe.backend == "tiktoken":
+            native, t_native = _timed(native_bpe.count, text)
+            assert native == exact, f"{name}: tiktoken={native} python={exact}"
+            native_ms = f"{t_native / mb * 1000:>14.1f}"
+        else:
+            native_ms = f"{'-':>14}"
+        ratio = estimated / exact if exact else 0.0
+        # 按估算填满预算时实际能放入的真实 token 数
+        usable = int(max_tokens / ratio) if ratio else 0
+        print(
+            f"{name:<14}{exact:>10}{estimated:>10}{ratio:>10.2f}{usable:>10}"
+            f"{t_heuristic / mb * 1000:>10.1f}ms{t_cold / mb * 1000:>11.1f}ms"
+            f"{t_warm / mb * 1000:>11.1f}ms{native_ms}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocab", required=True, help="tiktoken 格式词表文件路径")
+    parser.add_argument("--pattern", default="cl100k", help="预分词正则：cl100k, o200k 或自定义正则")
+    parser.add_argument("--size", type=int, default=200000, help="每类文本的字符数")
+    parser.add_argument("--max-tokens", type=int, default=163840, help="上下文预算")
+    args = parser.parse_args()
+    run(args.vocab, args.pattern, args.size, args.max_tokens)
+
+
+if __name__ == "__main__":
+    main()
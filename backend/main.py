@@ -1,11 +1,14 @@
 from ast import Str
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from langgraph.store.base import Op
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+import asyncio
 import json
+from contextlib import asynccontextmanager
 from langchain_core.messages import AIMessageChunk
 import uuid
 from datetime import datetime
@@ -15,11 +18,45 @@ from langgraph.types import Command
 # 导入研究流程组件
 from src.graph.node import graph, State
 from src.graph.type import Plan
+from src.server.state_store import (
+    ResearchStateStore,
+    diff_status,
+    get_research_state_store,
+    purge_periodically,
+    version_of,
+)
+from src.server.streaming import (
+    coalesce_token_events,
+    create_token_batcher,
+    get_sse_conf,
+    subscribe_with_backpressure,
+)
+from src.server.event_log import EventLog, EventLogRegistry, create_event_log_registry
+from src.server.run_manager import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_RESEARCH,
+    RunManager,
+    create_run_manager,
+    get_run_conf,
+)
+from src.tools.http_pool import close_http_pool
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Deep Research API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 定期清理过期的研究状态（读取时也会跳过过期状态，这里负责回收存储空间）
+    purge_task = asyncio.create_task(purge_periodically(research_states))
+    yield
+    purge_task.cancel()
+    # 关闭时取消仍在执行的后台运行
+    await run_manager.shutdown()
+    # 关闭搜索请求的共享连接池
+    await close_http_pool()
+
+
+app = FastAPI(title="Deep Research API", version="1.0.0", lifespan=lifespan)
 
 # 配置CORS
 app.add_middleware(
@@ -50,9 +87,16 @@ class ResearchStatus(BaseModel):
     step_results: List[Dict] = []
     error: Optional[str] = None
     message: Optional[str] = None  # 添加message字段
+    version: int = 0  # 状态版本号，每次更新加一
 
-# 存储研究状态
-research_states: Dict[str, Dict] = {}
+# 存储研究状态（后端由 config.yaml 的 state_store 配置决定，支持多 worker 共享）
+research_states: ResearchStateStore = get_research_state_store()
+# SSE 输出配置（token 合并窗口、背压队列长度、事件日志大小）
+sse_conf: Dict[str, Any] = get_sse_conf()
+# 每个研究计划的事件日志（断线重连时按 Last-Event-ID 补发）
+event_logs: EventLogRegistry = create_event_log_registry(sse_conf)
+# 后台运行管理器：图的执行与 HTTP 连接解耦，全局并发上限 + 优先级队列
+run_manager: RunManager = create_run_manager(event_logs, get_run_conf())
 
 
 def _json_dumps(data: Any) -> str:
@@ -65,9 +109,11 @@ def _json_dumps(data: Any) -> str:
     return json.dumps(data, ensure_ascii=False, default=_default)
 
 
-def _sse_pack(data: Any, event: Optional[str] = None) -> bytes:
+def _sse_pack(data: Any, event: Optional[str] = None, event_id: Optional[int] = None) -> bytes:
     payload = _json_dumps(data)
     lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
     if event:
         lines.append(f"event: {event}")
     # 避免单行过长，可按行切分（简单实现）
@@ -109,78 +155,89 @@ async def start_research(request: ResearchRequest):
         logger.info(f"开始协调器分析: {plan_id}, 用户输入: {request.topic}")
         
         # 存储初始状态
-        research_states[plan_id] = {
+        research_states.set(plan_id, {
             "config": config,
             "current_state": initial_state,
             "status": "coordinate",
             "created_at": datetime.now().isoformat()
-        }
+        })
         
         # 执行graph流程
         all_results = []
-        for result in graph.stream(initial_state, config):
-            stage_name = list(result.keys())[0]
-            logger.info(f"执行阶段: {stage_name}")
-            all_results.append(result)
+        # 占用交互池的执行槽位：协调器/生成计划耗时短，不与研究执行共享并发上限
+        async with run_manager.slot(PRIORITY_INTERACTIVE):
+            async for result in graph.astream(initial_state, config):
+                stage_name = list(result.keys())[0]
+                logger.info(f"执行阶段: {stage_name}")
+                all_results.append(result)
             
-            # 处理协调器结果
-            if stage_name == "coordinate":
-                coordinate_result = result[stage_name]
-                if "messages" in coordinate_result:
-                    # 简单问题：直接返回答案
-                    # 提取消息内容（messages是一个消息对象列表）
-                    messages_list = coordinate_result["messages"]
-                    if messages_list and len(messages_list) > 0:
-                        # 获取最后一条消息的内容
-                        last_message = messages_list[-1]
-                        if hasattr(last_message, 'content'):
-                            resp.messages = last_message.content
-                        elif isinstance(last_message, dict) and 'content' in last_message:
-                            resp.messages = last_message['content']
+                # 处理协调器结果
+                if stage_name == "coordinate":
+                    coordinate_result = result[stage_name]
+                    if "messages" in coordinate_result:
+                        # 简单问题：直接返回答案
+                        # 提取消息内容（messages是一个消息对象列表）
+                        messages_list = coordinate_result["messages"]
+                        if messages_list and len(messages_list) > 0:
+                            # 获取最后一条消息的内容
+                            last_message = messages_list[-1]
+                            if hasattr(last_message, 'content'):
+                                resp.messages = last_message.content
+                            elif isinstance(last_message, dict) and 'content' in last_message:
+                                resp.messages = last_message['content']
+                            else:
+                                resp.messages = str(last_message)
                         else:
-                            resp.messages = str(last_message)
-                    else:
-                        resp.messages = "协调器没有返回有效消息"
+                            resp.messages = "协调器没有返回有效消息"
                     
-                    resp.status = "completed"
-                    resp.current_stage = "coordinate"
-                    resp.need_plan = False  # 简单问题不需要计划
+                        resp.status = "completed"
+                        resp.current_stage = "coordinate"
+                        resp.need_plan = False  # 简单问题不需要计划
                     
-                    # 更新状态
-                    research_states[plan_id]["status"] = "completed"
-                    research_states[plan_id]["current_state"] = coordinate_result
-                    break  # 简单问题直接返回，不继续执行
+                        # 更新状态
+                        research_states.update(
+                            plan_id,
+                            status="completed",
+                            current_state=coordinate_result,
+                        )
+                        break  # 简单问题直接返回，不继续执行
             
-            # 处理计划生成结果
-            elif stage_name == "generate_plan":
-                plan_result = result[stage_name]
-                if "current_plan" in plan_result:
-                    resp.need_plan = True
-                    resp.status = "plan_generated"
-                    resp.current_stage = "generate_plan"
-                    resp.current_plan = plan_result["current_plan"]
+                # 处理计划生成结果
+                elif stage_name == "generate_plan":
+                    plan_result = result[stage_name]
+                    if "current_plan" in plan_result:
+                        resp.need_plan = True
+                        resp.status = "plan_generated"
+                        resp.current_stage = "generate_plan"
+                        resp.current_plan = plan_result["current_plan"]
                     
-                    # 更新状态
-                    research_states[plan_id]["status"] = "plan_generated"
-                    research_states[plan_id]["current_state"] = plan_result
-                    research_states[plan_id]["current_plan"] = plan_result["current_plan"]
+                        # 更新状态
+                        research_states.update(
+                            plan_id,
+                            status="plan_generated",
+                            current_state=plan_result,
+                            current_plan=plan_result["current_plan"],
+                        )
                     
-                    # 复杂问题需要用户确认，中断流程
-                    continue
+                        # 复杂问题需要用户确认，中断流程
+                        continue
             
-            # 处理中断（用户反馈）
-            elif stage_name == "__interrupt__":
-                resp.need_plan = True
-                resp.status = "awaiting_confirmation"
-                resp.current_stage = "human_feedback"
-                msg =""
-                for i in plan_result["current_plan"].steps:
-                        msg += f"{i.title}\n\n{i.description}\n\n"
-                resp.messages = f"我已经生成了一个研究计划: 如下 \n\n{msg}"
-                # 更新状态
-                research_states[plan_id]["status"] = "awaiting_confirmation"
-                research_states[plan_id]["current_stage"] = "human_feedback"
-                break
+                # 处理中断（用户反馈）
+                elif stage_name == "__interrupt__":
+                    resp.need_plan = True
+                    resp.status = "awaiting_confirmation"
+                    resp.current_stage = "human_feedback"
+                    msg =""
+                    for i in plan_result["current_plan"].steps:
+                            msg += f"{i.title}\n\n{i.description}\n\n"
+                    resp.messages = f"我已经生成了一个研究计划: 如下 \n\n{msg}"
+                    # 更新状态
+                    research_states.update(
+                        plan_id,
+                        status="awaiting_confirmation",
+                        current_stage="human_feedback",
+                    )
+                    break
             
         return resp
         
@@ -189,18 +246,254 @@ async def start_research(request: ResearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# SSE 通道与 LangGraph stream_mode 的对应关系
+# - tokens:   LLM 增量 token（messages）
+# - stages:   阶段切换事件 coordinate/plan/interrupt/research（updates）
+# - progress: research_node 推送的研究进度事件（custom）
+SSE_CHANNELS = {"tokens": "messages", "stages": "updates", "progress": "custom"}
+# 兼容 mode 参数：stages / messages / both
+SSE_MODE_CHANNELS = {
+    "stages": {"stages", "progress"},
+    "messages": {"tokens"},
+    "both": {"tokens", "stages", "progress"},
+}
+
+
+def _parse_channels(http_request: Request, default_mode: str = "stages") -> set:
+    """
+    从查询参数解析客户端订阅的通道：
+    - channels=tokens,stages,progress 显式指定（优先）
+    - mode=stages|messages|both 预设组合
+    """
+    channels_param = http_request.query_params.get("channels")
+    if channels_param:
+        channels = {c.strip().lower() for c in channels_param.split(",") if c.strip()}
+        unknown = channels - set(SSE_CHANNELS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"未知的通道: {', '.join(sorted(unknown))}")
+        return channels
+    mode = http_request.query_params.get("mode", default_mode).lower()
+    if mode not in SSE_MODE_CHANNELS:
+        raise HTTPException(status_code=400, detail=f"无效的模式: {mode}")
+    return SSE_MODE_CHANNELS[mode]
+
+
+def _stream_modes(channels: set) -> List[str]:
+    """订阅通道对应的 LangGraph stream_mode；updates / custom 总是需要，用于维护研究状态"""
+    modes = ["updates", "custom"]
+    if "tokens" in channels:
+        modes.append("messages")
+    return modes
+
+
+def _handle_stage_update(plan_id: str, result: Dict[str, Any]) -> Tuple[List[Tuple[str, Dict]], bool]:
+    """
+    处理一次阶段更新（stream_mode="updates"）：更新研究状态存储，
+    返回需要推送的 (事件名, 数据) 列表，以及本次流是否已结束
+    """
+    stage_name = list(result.keys())[0]
+    payload = result[stage_name]
+    logger.info(f"[SSE] 阶段: {stage_name}")
+
+    if stage_name == "coordinate":
+        # 仅当coordinate节点直接产出答案(无handoff)时，才认为是简单问题并完成
+        msg = None
+        if isinstance(payload, dict) and payload.get("messages"):
+            last_message = payload["messages"][-1]
+            if hasattr(last_message, "content"):
+                msg = last_message.content
+            elif isinstance(last_message, dict) and "content" in last_message:
+                msg = last_message["content"]
+            else:
+                msg = str(last_message)
+        if msg:
+            research_states.update(plan_id, status="completed", current_state=payload)
+            return [("coordinate", {"plan_id": plan_id, "message": msg, "simple": True})], True
+        # 否则是复杂问题，后续会进入generate_plan，不在此处结束或推送coordinate事件
+        return [], False
+
+    if stage_name == "generate_plan":
+        current_plan = payload.get("current_plan") if isinstance(payload, dict) else None
+        research_states.update(
+            plan_id,
+            status="plan_generated",
+            current_state=payload,
+            current_plan=current_plan,
+        )
+        return [("plan", {"plan_id": plan_id, "current_plan": current_plan})], False
+
+    if stage_name == "__interrupt__":
+        # 进入人工确认：等待确认，结束本次流
+        research_states.update(
+            plan_id,
+            status="awaiting_confirmation",
+            current_stage="human_feedback",
+        )
+        return [("interrupt", {
+            "plan_id": plan_id,
+            "need_plan": True,
+            "message": "等待用户确认研究计划"
+        })], True
+
+    if stage_name == "research_node":
+        research_result = payload if isinstance(payload, dict) else {}
+        research_states.update(
+            plan_id,
+            status="completed",
+            current_state=research_result,
+        )
+        return [("research", {
+            "plan_id": plan_id,
+            "research_summary": research_result.get("research_summary"),
+            "step_results": research_result.get("step_results", []),
+        })], True
+
+    return [], False
+
+
+def _record_step_progress(plan_id: str, event: str, data: Dict[str, Any]) -> None:
+    """研究过程中每完成一个步骤就写入状态存储，状态推送据此只发送新增的步骤结果"""
+    if event == "section_merged":
+        result = {"step_index": data.get("step_index"), "title": data.get("title"),
+                  "section_md": data.get("section_md"), "error": False}
+    elif event == "step_researched" and data.get("error"):
+        result = {"step_index": data.get("step_index"), "title": data.get("title"),
+                  "message": data.get("message"), "error": True}
+    else:
+        return
+    stored_state = research_states.get(plan_id) or {}
+    research_states.update(
+        plan_id,
+        status="researching",
+        current_stage="research_node",
+        step_results=stored_state.get("step_results", []) + [result],
+    )
+
+
+async def _graph_event_stream(
+    graph_input: Any,
+    config: Dict,
+    plan_id: str,
+    channels: set,
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """以多路复用方式运行图，按客户端订阅的通道产出 (事件名, 数据)"""
+    async for stream_mode, chunk in graph.astream(graph_input, config, stream_mode=_stream_modes(channels)):
+        if stream_mode == "messages":
+            message_chunk = chunk[0]
+            if isinstance(message_chunk, AIMessageChunk) and message_chunk.content:
+                yield "chunk", {"plan_id": plan_id, "delta": message_chunk.content}
+
+        elif stream_mode == "custom":
+            # research_node 推送的增量事件，记录步骤进度后原样转发
+            data = dict(chunk) if isinstance(chunk, dict) else {"data": chunk}
+            event = data.pop("event", "progress")
+            _record_step_progress(plan_id, event, data)
+            if "progress" in channels:
+                yield event, {"plan_id": plan_id, **data}
+
+        elif stream_mode == "updates":
+            events, finished = _handle_stage_update(plan_id, chunk)
+            if "stages" in channels:
+                for event, data in events:
+                    yield event, data
+            if finished:
+                break
+
+    yield "done", {"plan_id": plan_id}
+
+
+def _submit_stream_run(
+    plan_id: str,
+    graph_input: Any,
+    config: Dict,
+    channels: set,
+    started: Dict,
+    priority: int,
+) -> Tuple[EventLog, int]:
+    """
+    提交后台运行：图的事件写入该计划的事件日志，连续的 chunk 事件按 sse 配置合并后再写入
+    返回事件日志以及本次运行之前的最后一个事件 id（订阅起点）
+    """
+    def events():
+        return coalesce_token_events(
+            _graph_event_stream(graph_input, config, plan_id, channels),
+            create_token_batcher(sse_conf),
+        )
+
+    return run_manager.submit(
+        plan_id,
+        events,
+        {"channels": sorted(channels), **started},
+        priority=priority,
+        on_failure=_failure_recorder(plan_id),
+    )
+
+
+# 状态推送在这些状态处结束：研究完成、失败、取消，或计划等待用户确认（确认后客户端携带版本号重新订阅）
+WATCH_END_STATUSES = ("completed", "error", "cancelled", "awaiting_confirmation")
+
+
+def _failure_recorder(plan_id: str):
+    """运行失败或被取消时把终止状态写入研究状态，避免计划一直停留在 researching"""
+    def record(status: str, message: str) -> None:
+        research_states.update(plan_id, status=status, error=message)
+    return record
+
+
+def _sse_response(log: EventLog, last_event_id: int = 0) -> StreamingResponse:
+    """
+    订阅事件日志写成 SSE 响应：
+    - 先补发 last_event_id 之后的事件，再输出实时事件，直到本次运行结束
+    - 每个事件的 id 与数据中的 seq 相同，均为计划内单调递增的序号
+    - 客户端落后超过 sse.queue_size 个事件时，积压的 chunk 合并成一帧写出
+    """
+    async def event_generator():
+        queue_size = sse_conf.get("queue_size", 64)
+        async for event_id, event, data in subscribe_with_backpressure(log, last_event_id, queue_size):
+            if event_id:
+                data = {**data, "seq": event_id}
+            # replay_gap 事件的 id 为 0（没有序号），不写 id 行，避免覆盖客户端记录的 Last-Event-ID
+            yield _sse_pack(data, event=event, event_id=event_id or None)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+def _last_event_id(http_request: Request) -> int:
+    """读取重连时的 Last-Event-ID（请求头或 last_event_id 查询参数）"""
+    raw = http_request.headers.get("last-event-id") or http_request.query_params.get("last_event_id") or "0"
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"无效的 Last-Event-ID: {raw}")
+
+
 @app.post("/api/research/start/stream")
 async def start_research_stream(request: ResearchRequest, http_request: Request):
-    """基于SSE的流式启动研究：按阶段推送事件。
-    事件类型：
-    - started: 返回plan_id
-    - coordinate: 简单问题直接返回答案
-    - plan: 生成研究计划（Plan结构）
-    - interrupt: 进入人工确认阶段
-    - research: 研究完成结果（summary、step_results）
-    - done: 结束
+    """基于SSE的流式启动研究。
+    查询参数：
+    - mode: stages（默认，阶段+研究进度）/ messages（LLM增量token）/ both（全部）
+    - channels: 逗号分隔的通道列表 tokens,stages,progress，指定时优先于 mode
+    事件类型（每个事件的数据都带有单调递增的 seq）：
+    - started: 返回plan_id（总是推送）
+    - chunk: LLM增量token，按 sse 配置的窗口合并（tokens 通道）
+    - coordinate: 简单问题直接返回答案（stages 通道）
+    - plan: 生成研究计划（Plan结构）（stages 通道）
+    - interrupt: 进入人工确认阶段（stages 通道）
+    - research: 研究完成结果（summary、step_results）（stages 通道）
+    - step_started / step_researched / section_merged / summary_delta: 研究进度（progress 通道）
+    - done: 结束（总是推送）
+    断线后研究在后台继续，可通过 GET /api/research/stream/{plan_id} 携带 Last-Event-ID 重连
     """
     try:
+        channels = _parse_channels(http_request)
         plan_id = str(uuid.uuid4())
         config = {"configurable": {"thread_id": plan_id}}
         initial_state = State(
@@ -209,134 +502,20 @@ async def start_research_stream(request: ResearchRequest, http_request: Request)
             locale=request.locale
         )
 
-        research_states[plan_id] = {
+        research_states.set(plan_id, {
             "config": config,
             "current_state": initial_state,
             "status": "coordinate",
             "created_at": datetime.now().isoformat()
-        }
+        })
 
-        # 可选模式：stages（默认，按阶段推送）/ messages（推送LLM增量token）
-        mode = http_request.query_params.get("mode", "stages").lower()
-        mode = "messages"
-        async def event_generator():
-            try:
-                # 开场事件
-                yield _sse_pack({"plan_id": plan_id, "message": "研究流程已启动"}, event="started")
-
-                if mode == "messages":
-                    # 按token增量推送（与 node.py 本地流式测试一致的效果）
-                    # 将列表作为 stream_mode 参数传递，以同时流式处理多种模式。
-                    # 流式输出将是 (模式, 块) 的元组，其中 模式 是流模式的名称，块 是该模式流式传输的数据。
-                    # async for msg_chunk in graph.astream(initial_state, config, stream_mode=["messages","updates"]):
-                    async for msg_chunk in graph.astream(initial_state, config, stream_mode="messages"):
-                        if await http_request.is_disconnected():
-                            logger.info(f"SSE client disconnected: {plan_id}")
-                            break
-                        try:
-                        
-                            # 兼容 node.py 的打印方式：result[0].content
-                            chunk = msg_chunk[0]
-                            # logger.info(f"chunk: {chunk}")
-                            # logger.info(f"type(chunk): {type(chunk)}")
-                            if isinstance(chunk, AIMessageChunk):
-                                delta = getattr(chunk, "content", None)
-                                if delta:
-                                    yield _sse_pack({"plan_id": plan_id, "delta": delta}, event="chunk")
-                            else:
-                                logger.info(f"完整消息: {msg_chunk}")
-                        except Exception as e:
-                            logger.debug(f"消息流chunk解析失败: {e}")
-                            continue
-                    # 结束
-                    yield _sse_pack({"plan_id": plan_id}, event="done")
-                else:
-                    # 默认：按阶段推送
-                    async for result in graph.astream(initial_state, config):
-                        if await http_request.is_disconnected():
-                            logger.info(f"SSE client disconnected: {plan_id}")
-                            break
-
-                        stage_name = list(result.keys())[0]
-                        payload = result[stage_name]
-                        logger.info(f"[SSE] 阶段: {stage_name}")
-
-                        if stage_name == "coordinate":
-                            # 仅当coordinate节点直接产出答案(无handoff)时，才认为是简单问题并完成
-                            is_simple = False
-                            msg = None
-                            if isinstance(payload, dict) and "messages" in payload:
-                                messages_list = payload["messages"]
-                                if messages_list:
-                                    last_message = messages_list[-1]
-                                    if hasattr(last_message, "content"):
-                                        msg = last_message.content
-                                    elif isinstance(last_message, dict) and "content" in last_message:
-                                        msg = last_message["content"]
-                                    else:
-                                        msg = str(last_message)
-                                    is_simple = True if msg else False
-                            if is_simple:
-                                yield _sse_pack({"plan_id": plan_id, "message": msg, "simple": True}, event="coordinate")
-                                research_states[plan_id]["status"] = "completed"
-                                research_states[plan_id]["current_state"] = payload
-                                yield _sse_pack({"plan_id": plan_id}, event="done")
-                                break
-                            # 否则是复杂问题，后续会进入generate_plan，不在此处结束或推送coordinate事件
-                            continue
-
-                        elif stage_name == "generate_plan":
-                            # 推送计划
-                            current_plan = payload.get("current_plan") if isinstance(payload, dict) else None
-                            research_states[plan_id]["status"] = "plan_generated"
-                            research_states[plan_id]["current_state"] = payload
-                            research_states[plan_id]["current_plan"] = current_plan
-                            yield _sse_pack({
-                                "plan_id": plan_id,
-                                "current_plan": current_plan
-                            }, event="plan")
-
-                        elif stage_name == "__interrupt__":
-                            # 进入人工确认
-                            research_states[plan_id]["status"] = "awaiting_confirmation"
-                            research_states[plan_id]["current_stage"] = "human_feedback"
-                            yield _sse_pack({
-                                "plan_id": plan_id,
-                                "need_plan": True,
-                                "message": "等待用户确认研究计划"
-                            }, event="interrupt")
-                            # 中断点：等待确认，结束本次流
-                            yield _sse_pack({"plan_id": plan_id}, event="done")
-                            break
-
-                        elif stage_name == "research_node":
-                            # 推送最终研究结果
-                            research_result = payload if isinstance(payload, dict) else {}
-                            research_states[plan_id]["status"] = "completed"
-                            research_states[plan_id]["current_state"] = research_result
-                            yield _sse_pack({
-                                "plan_id": plan_id,
-                                "research_summary": research_result.get("research_summary"),
-                                "step_results": research_result.get("step_results", []),
-                            }, event="research")
-                            yield _sse_pack({"plan_id": plan_id}, event="done")
-                            break
-
-                # 结束
-            except Exception as gen_e:
-                logger.exception(f"SSE 生成器异常: {gen_e}")
-                yield _sse_pack({"plan_id": plan_id, "error": str(gen_e)}, event="error")
-
-        return StreamingResponse(
-            event_generator(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        log, after_id = _submit_stream_run(
+            plan_id, initial_state, config, channels, {"message": "研究流程已启动"}, PRIORITY_INTERACTIVE
         )
+        return _sse_response(log, after_id)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"开始研究流程(SSE)失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -347,11 +526,12 @@ async def confirm_plan(request: ConfirmPlan):
     try:
         plan_id = request.plan_id
         
-        if plan_id not in research_states:
-            raise HTTPException(status_code=404, detail="研究计划不存在")
-        
         # 获取存储的状态
-        stored_state = research_states[plan_id]
+        stored_state = research_states.get(plan_id)
+        if stored_state is None:
+            raise HTTPException(status_code=404, detail="研究计划不存在")
+        if run_manager.is_running(plan_id):
+            raise HTTPException(status_code=409, detail="研究正在进行中")
         config = stored_state["config"]
         
         resp = ResearchStatus(messages="处理用户确认中", plan_id=plan_id)
@@ -376,42 +556,52 @@ async def confirm_plan(request: ConfirmPlan):
             raise HTTPException(status_code=400, detail="无效的用户确认类型")
         
         # 继续执行graph流程
-        async for result in graph.astream(cmd, config):
-            stage_name = list(result.keys())[0]
-            logger.info(f"继续执行阶段: {stage_name}")
+        # 登记到运行表（与 /confirm-plan/stream 互斥）并占用全局执行槽位，与后台运行共享并发上限
+        async with run_manager.inline_run(plan_id, PRIORITY_RESEARCH, on_failure=_failure_recorder(plan_id)):
+            async for result in graph.astream(cmd, config):
+                stage_name = list(result.keys())[0]
+                logger.info(f"继续执行阶段: {stage_name}")
             
-            # 处理研究节点结果
-            if stage_name == "research_node":
-                research_result = result[stage_name]
-                resp.status = "research_completed"
-                resp.current_stage = "research_node"
-                if "research_summary" in research_result:
-                    resp.research_summary = research_result["research_summary"]
-                if "step_results" in research_result:
-                    resp.step_results = research_result["step_results"]
+                # 处理研究节点结果
+                if stage_name == "research_node":
+                    research_result = result[stage_name]
+                    resp.status = "research_completed"
+                    resp.current_stage = "research_node"
+                    if "research_summary" in research_result:
+                        resp.research_summary = research_result["research_summary"]
+                    if "step_results" in research_result:
+                        resp.step_results = research_result["step_results"]
                 
-                # 更新状态
-                research_states[plan_id]["status"] = "completed"
-                research_states[plan_id]["current_state"] = research_result
-                break
-            
-            # 处理重新生成计划
-            elif stage_name == "generate_plan":
-                plan_result = result[stage_name]
-                if "current_plan" in plan_result:
-                    resp.need_plan = True
-                    resp.status = "plan_generated"
-                    resp.current_stage = "generate_plan"
-                    resp.current_plan = plan_result["current_plan"]
-                    
                     # 更新状态
-                    research_states[plan_id]["status"] = "plan_generated"
-                    research_states[plan_id]["current_state"] = plan_result
-                    research_states[plan_id]["current_plan"] = plan_result["current_plan"]
+                    research_states.update(
+                        plan_id,
+                        status="completed",
+                        current_state=research_result,
+                    )
                     break
+            
+                # 处理重新生成计划
+                elif stage_name == "generate_plan":
+                    plan_result = result[stage_name]
+                    if "current_plan" in plan_result:
+                        resp.need_plan = True
+                        resp.status = "plan_generated"
+                        resp.current_stage = "generate_plan"
+                        resp.current_plan = plan_result["current_plan"]
+                    
+                        # 更新状态
+                        research_states.update(
+                            plan_id,
+                            status="plan_generated",
+                            current_state=plan_result,
+                            current_plan=plan_result["current_plan"],
+                        )
+                        break
         
         return resp
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"确认研究计划失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -420,14 +610,21 @@ async def confirm_plan(request: ConfirmPlan):
 @app.post("/api/research/confirm-plan/stream")
 async def confirm_plan_stream(request: ConfirmPlan, http_request: Request):
     """基于SSE的流式确认研究计划。
+    查询参数 mode / channels 与 /api/research/start/stream 相同，默认 stages
     事件类型：plan / interrupt / research / done / error
+    研究过程中的增量事件（由 research_node 通过自定义流推送）：
+    - step_started: 某个研究步骤开始执行
+    - step_researched: 某个研究步骤完成（或失败）
+    - section_merged: 某个步骤的报告章节已按顺序合并，携带 section_md
+    - summary_delta: 最终总结的增量内容
+    断线后研究在后台继续，可通过 GET /api/research/stream/{plan_id} 携带 Last-Event-ID 重连
     """
     try:
+        channels = _parse_channels(http_request)
         plan_id = request.plan_id
-        if plan_id not in research_states:
+        stored_state = research_states.get(plan_id)
+        if stored_state is None:
             raise HTTPException(status_code=404, detail="研究计划不存在")
-
-        stored_state = research_states[plan_id]
         config = stored_state["config"]
 
         if request.user_confirm == "confirm":
@@ -437,79 +634,45 @@ async def confirm_plan_stream(request: ConfirmPlan, http_request: Request):
         else:
             raise HTTPException(status_code=400, detail="无效的用户确认类型")
 
-        async def event_generator():
-            try:
-                # 立即反馈确认已接收
-                yield _sse_pack({"plan_id": plan_id, "ack": request.user_confirm}, event="started")
-
-                async for result in graph.astream(cmd, config):
-                    if await http_request.is_disconnected():
-                        logger.info(f"SSE client disconnected(confirm): {plan_id}")
-                        break
-
-                    stage_name = list(result.keys())[0]
-                    payload = result[stage_name]
-                    logger.info(f"[SSE-confirm] 阶段: {stage_name}")
-
-                    if stage_name == "generate_plan":
-                        current_plan = payload.get("current_plan") if isinstance(payload, dict) else None
-                        research_states[plan_id]["status"] = "plan_generated"
-                        research_states[plan_id]["current_state"] = payload
-                        research_states[plan_id]["current_plan"] = current_plan
-                        yield _sse_pack({
-                            "plan_id": plan_id,
-                            "current_plan": current_plan
-                        }, event="plan")
-
-                    elif stage_name == "__interrupt__":
-                        research_states[plan_id]["status"] = "awaiting_confirmation"
-                        research_states[plan_id]["current_stage"] = "human_feedback"
-                        yield _sse_pack({
-                            "plan_id": plan_id,
-                            "need_plan": True,
-                            "message": "等待用户确认研究计划"
-                        }, event="interrupt")
-                        yield _sse_pack({"plan_id": plan_id}, event="done")
-                        break
-
-                    elif stage_name == "research_node":
-                        research_result = payload if isinstance(payload, dict) else {}
-                        research_states[plan_id]["status"] = "completed"
-                        research_states[plan_id]["current_state"] = research_result
-                        yield _sse_pack({
-                            "plan_id": plan_id,
-                            "research_summary": research_result.get("research_summary"),
-                            "step_results": research_result.get("step_results", []),
-                        }, event="research")
-                        yield _sse_pack({"plan_id": plan_id}, event="done")
-                        break
+        if run_manager.is_running(plan_id):
+            # 已在运行：不能重复恢复图，客户端应通过 GET 重连
+            raise HTTPException(status_code=409, detail="研究正在进行中，请通过 /api/research/stream/{plan_id} 重新连接")
 
-            except Exception as gen_e:
-                logger.exception(f"SSE(confirm) 生成器异常: {gen_e}")
-                yield _sse_pack({"plan_id": plan_id, "error": str(gen_e)}, event="error")
-
-        return StreamingResponse(
-            event_generator(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        # 立即反馈确认已接收；研究执行耗时较长，优先级低于交互式请求
+        log, after_id = _submit_stream_run(
+            plan_id, cmd, config, channels, {"ack": request.user_confirm}, PRIORITY_RESEARCH
         )
+        return _sse_response(log, after_id)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"确认研究计划(SSE)失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/research/status/{plan_id}", response_model=ResearchStatus)
-async def get_research_status(plan_id: str):
-    """获取研究状态"""
-    if plan_id not in research_states:
-        raise HTTPException(status_code=404, detail="研究计划不存在")
-    
-    stored_state = research_states[plan_id]
-    
+@app.get("/api/research/stream/{plan_id}")
+async def resume_research_stream(plan_id: str, http_request: Request):
+    """断线重连：按 Last-Event-ID 补发错过的事件，再接着推送实时事件，不会重新执行图
+    - Last-Event-ID 请求头（浏览器 EventSource 自动携带）或 last_event_id 查询参数
+    - 错过的事件已被环形缓冲区淘汰时，先推送 replay_gap 事件，客户端可改用状态接口补齐
+    """
+    last_event_id = _last_event_id(http_request)
+    log = event_logs.get(plan_id)
+    if log is None:
+        raise HTTPException(status_code=404, detail="研究事件不存在或已过期")
+    return _sse_response(log, last_event_id)
+
+
+@app.delete("/api/research/run/{plan_id}")
+async def cancel_research_run(plan_id: str):
+    """取消计划的后台运行；运行与连接解耦，不再需要的研究需显式取消以释放执行槽位"""
+    if not run_manager.cancel(plan_id):
+        raise HTTPException(status_code=404, detail="没有运行中的研究")
+    return {"plan_id": plan_id, "cancelled": True}
+
+
+def _build_status(plan_id: str, stored_state: Dict[str, Any]) -> ResearchStatus:
+    """由存储的研究状态构造 ResearchStatus（状态查询与状态推送共用）"""
     # 处理current_plan，如果是Plan对象则转换为字典
     current_plan = stored_state.get("current_plan")
     if hasattr(current_plan, 'dict'):
@@ -523,7 +686,8 @@ async def get_research_status(plan_id: str):
         current_stage=stored_state.get("current_stage"),
         current_plan=current_plan,
         need_plan=stored_state.get("status") in ["plan_generated", "awaiting_confirmation"],
-        messages=""  # 添加默认消息
+        messages="",  # 添加默认消息
+        version=version_of(stored_state),
     )
     
     # 根据状态设置消息
@@ -541,11 +705,102 @@ async def get_research_status(plan_id: str):
     elif stored_state["status"] == "awaiting_confirmation":
         resp.messages = "等待用户确认研究计划"
         resp.need_plan = True
+    elif stored_state["status"] in ("error", "cancelled"):
+        resp.messages = "研究失败" if stored_state["status"] == "error" else "研究已取消"
+        resp.error = stored_state.get("error")
+        # 失败或取消之前已完成的步骤
+        resp.step_results = stored_state.get("step_results", [])
     else:
         resp.messages = "研究进行中"
+        # 研究过程中已完成的步骤
+        resp.step_results = stored_state.get("step_results", [])
     
     return resp
 
+
+def _status_etag(plan_id: str, version: int) -> str:
+    return f'"{plan_id}:{version}"'
+
+
+@app.get("/api/research/status/{plan_id}", response_model=ResearchStatus)
+async def get_research_status(plan_id: str, http_request: Request, wait: float = 0):
+    """获取研究状态
+    - 响应带有 ETag（计划内单调递增的版本号），请求携带 If-None-Match 且未变化时返回 304
+    - wait > 0 时为长轮询：状态未变化则最多等待 wait 秒（上限 60 秒）再返回
+    """
+    stored_state = research_states.get(plan_id)
+    if stored_state is None:
+        raise HTTPException(status_code=404, detail="研究计划不存在")
+
+    if_none_match = http_request.headers.get("if-none-match")
+    if if_none_match == _status_etag(plan_id, version_of(stored_state)) and wait > 0:
+        stored_state = await research_states.wait_for_change(
+            plan_id, version_of(stored_state), timeout=min(wait, 60)
+        )
+        if stored_state is None:
+            raise HTTPException(status_code=404, detail="研究计划不存在")
+
+    etag = _status_etag(plan_id, version_of(stored_state))
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    resp = _build_status(plan_id, stored_state)
+    return JSONResponse(content=jsonable_encoder(resp), headers={"ETag": etag})
+
+
+@app.get("/api/research/status/{plan_id}/watch")
+async def watch_research_status(plan_id: str, http_request: Request):
+    """基于SSE推送研究状态变化，替代前端轮询
+    - snapshot: 连接时推送完整状态；客户端携带的版本号等于当前版本时省略
+    - diff: 之后只推送变化的字段 changes，以及新增的步骤结果 step_results_added
+    - 事件 id 为状态版本号，断线重连时携带 Last-Event-ID（或 version 查询参数）：
+      期间没有变化则不重复推送快照；已有变化时重新推送完整快照（服务端不保留历史版本，无法还原增量）
+    - 空闲时不产生任何查询；其他 worker 写入的变化按 status_watch_interval 周期检查，并发送心跳
+    - 研究完成、失败、取消或计划等待确认时推送最后一次变化并结束
+    """
+    stored_state = research_states.get(plan_id)
+    if stored_state is None:
+        raise HTTPException(status_code=404, detail="研究计划不存在")
+    # 未携带版本号、或版本号落后于当前版本的客户端先收到完整快照
+    known_version = http_request.headers.get("last-event-id") or http_request.query_params.get("version") or "-1"
+    try:
+        known_version = int(known_version)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"无效的版本号: {known_version}")
+    interval = sse_conf.get("status_watch_interval", 15)
+
+    async def event_generator():
+        state = stored_state
+        version = version_of(state)
+        last_sent = jsonable_encoder(_build_status(plan_id, state))
+        if known_version != version:
+            yield _sse_pack(last_sent, event="snapshot", event_id=version)
+        while last_sent["status"] not in WATCH_END_STATUSES:
+            state = await research_states.wait_for_change(plan_id, version, timeout=interval)
+            if state is None:
+                yield _sse_pack({"plan_id": plan_id, "error": "研究计划不存在或已过期"}, event="error")
+                return
+            if version_of(state) == version:
+                # 心跳注释，保持代理连接
+                yield b": keepalive\n\n"
+                continue
+            version = version_of(state)
+            current = jsonable_encoder(_build_status(plan_id, state))
+            diff = diff_status(last_sent, current)
+            diff["changes"].pop("version", None)
+            last_sent = current
+            yield _sse_pack({"plan_id": plan_id, "version": version, **diff}, event="diff", event_id=version)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
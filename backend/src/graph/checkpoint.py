@@ -0,0 +1,741 @@
+"""
+图的检查点存储（checkpointer）。
+
+InMemorySaver 会把每个线程的全部 State 永久保存在进程内存中，且被 human_feedback
+中断的计划只能由同一进程恢复。这里提供可配置的持久化后端：
+- memory: 进程内存储（调试用）；配置了 keep_latest / ttl_seconds 时使用支持清理的
+          MemoryCheckpointSaver，否则使用 langgraph 自带的 InMemorySaver
+- sqlite: SQLite(WAL) 文件，同一台机器上的多个 worker 共享
+- redis:  Redis 协议的键值存储；未配置 redis_url 时使用进程内的 Redis 兼容实现
+
+各后端均支持：
+- keep_latest: 每个线程只保留最新的 N 个检查点（中断恢复只依赖最新检查点）
+- ttl_seconds: 线程超过该时间没有新的检查点即被清理
+"""
+import asyncio
+import fnmatch
+from abc import ABC, abstractmethod
+import logging
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.config.loader import load_yaml_config
+
+logger = logging.getLogger(__name__)
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+def _checkpoint_config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+
+
+class _PrunableSaver(BaseCheckpointSaver[str], ABC):
+    """持久化检查点的公共逻辑：版本号生成、异步包装与定期过期清理"""
+
+    def __init__(
+        self,
+        *,
+        keep_latest: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        evict_interval: float = 60.0,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        # keep_latest 为空或 <= 0 表示保留全部检查点
+        self.keep_latest = keep_latest if keep_latest and keep_latest > 0 else None
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.evict_interval = evict_interval
+        self._last_evict = 0.0
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # 与 InMemorySaver 保持一致的字符串版本号
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def _maybe_evict(self) -> None:
+        if self.ttl_seconds is None:
+            return
+        now = time.time()
+        if now - self._last_evict < self.evict_interval:
+            return
+        self._last_evict = now
+        removed = self.evict_expired()
+        if removed:
+            logger.info(f"清理过期检查点线程: {removed} 个")
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """删除超过 ttl_seconds 未更新的线程，返回删除的线程数"""
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    @staticmethod
+    def _match_metadata(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+        if not filter:
+            return True
+        return all(metadata.get(k) == v for k, v in filter.items())
+
+
+class SQLiteCheckpointSaver(_PrunableSaver):
+    """基于 SQLite(WAL) 的检查点存储"""
+
+    def __init__(self, path: str = "data/checkpoints.db", **kwargs: Any):
+        super().__init__(**kwargs)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata BLOB,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at ON checkpoints (thread_id, created_at);
+            """
+        )
+        self._lock = threading.Lock()
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in rows]
+
+    def _row_to_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata = row
+        return CheckpointTuple(
+            config=_checkpoint_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=pickle.loads(metadata),
+            parent_config=(
+                _checkpoint_config(thread_id, checkpoint_ns, parent_checkpoint_id)
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._row_to_tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+            "FROM checkpoints"
+        )
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            results = []
+            for thread_id, checkpoint_ns, *row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                if filter and not self._match_metadata(pickle.loads(row[-1]), filter):
+                    continue
+                results.append(self._row_to_tuple(thread_id, checkpoint_ns, tuple(row)))
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    serialized,
+                    pickle.dumps(get_checkpoint_metadata(config, metadata)),
+                    time.time(),
+                ),
+            )
+            self._prune(thread_id, checkpoint_ns)
+            self._maybe_evict()
+        return _checkpoint_config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        regular, special = [], []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, serialized = self.serde.dumps_typed(value)
+            row = (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, serialized, task_path)
+            (regular if write_idx >= 0 else special).append(row)
+        columns = "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path)"
+        with self._lock:
+            # 普通写入（idx >= 0）已存在时不覆盖，特殊写入（错误、中断等）总是覆盖
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO writes {columns} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", regular
+            )
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO writes {columns} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", special
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        """只保留最新的 keep_latest 个检查点及其写入"""
+        if self.keep_latest is None:
+            return
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_latest),
+        ).fetchall()
+        if not stale:
+            return
+        params = [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in stale]
+        self._conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+        self._conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+        )
+
+    def evict_expired(self) -> int:
+        if self.ttl_seconds is None:
+            return 0
+        expired = self._conn.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+            (time.time() - self.ttl_seconds,),
+        ).fetchall()
+        for (thread_id,) in expired:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        return len(expired)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class LocalRedis:
+    """
+    进程内的 Redis 兼容实现，只覆盖 RedisCheckpointSaver 用到的命令。
+    用于本地开发与测试；需要跨进程共享时请配置 redis_url 使用真实 Redis。
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expire_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def _alive(self, key: str) -> bool:
+        expire_at = self._expire_at.get(key)
+        if expire_at is not None and expire_at <= time.time():
+            self._data.pop(key, None)
+            self._expire_at.pop(key, None)
+        return key in self._data
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> bool:
+        with self._lock:
+            self._data[key] = value
+            self._expire_at.pop(key, None)
+            if ex:
+                self._expire_at[key] = time.time() + ex
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expire_at.pop(key, None)
+            return removed
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expire_at[key] = time.time() + seconds
+            return True
+
+    def exists(self, key: str) -> int:
+        with self._lock:
+            return int(self._alive(key))
+
+    def purge_expired(self) -> List[str]:
+        """
+        删除所有已过期的键，返回被删除的键
+        真实 Redis 会主动淘汰过期键；这里的过期检查只在访问时发生，需要定期调用，
+        否则不再被访问的线程会一直占用内存
+        """
+        with self._lock:
+            now = time.time()
+            expired = [key for key, expire_at in self._expire_at.items() if expire_at <= now]
+            for key in expired:
+                self._data.pop(key, None)
+                self._expire_at.pop(key, None)
+            return expired
+
+    def scan_iter(self, match: str = "*") -> Iterator[bytes]:
+        with self._lock:
+            keys = [k for k in list(self._data) if self._alive(k) and fnmatch.fnmatchcase(k, match)]
+        for key in keys:
+            yield key.encode()
+
+    # ---- sorted set ----
+    def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = {}
+            zset = self._data[key]
+            added = sum(1 for member in mapping if member not in zset)
+            zset.update(mapping)
+            return added
+
+    def zrem(self, key: str, *members: str) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return 0
+            zset = self._data[key]
+            removed = sum(1 for m in members if zset.pop(m, None) is not None)
+            if not zset:
+                self.delete(key)
+            return removed
+
+    def zrevrange(self, key: str, start: int, end: int) -> List[bytes]:
+        with self._lock:
+            if not self._alive(key):
+                return []
+            ordered = sorted(self._data[key].items(), key=lambda x: (x[1], x[0]), reverse=True)
+            stop = None if end == -1 else end + 1
+            return [m.encode() for m, _ in ordered[start:stop]]
+
+    # ---- hash ----
+    def hsetnx(self, key: str, field: str, value: bytes) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = {}
+            if field in self._data[key]:
+                return 0
+            self._data[key][field] = value
+            return 1
+
+    def hset(self, key: str, field: str, value: bytes) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = {}
+            added = int(field not in self._data[key])
+            self._data[key][field] = value
+            return added
+
+    def hgetall(self, key: str) -> Dict[bytes, bytes]:
+        with self._lock:
+            if not self._alive(key):
+                return {}
+            return {f.encode(): v for f, v in self._data[key].items()}
+
+    # ---- set ----
+    def sadd(self, key: str, *members: str) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = set()
+            before = len(self._data[key])
+            self._data[key].update(members)
+            return len(self._data[key]) - before
+
+    def smembers(self, key: str) -> set:
+        with self._lock:
+            if not self._alive(key):
+                return set()
+            return {m.encode() for m in self._data[key]}
+
+
+def _s(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisCheckpointSaver(_PrunableSaver):
+    """
+    基于 Redis 命令的检查点存储。
+
+    键结构（前缀 prefix 默认为 "ckpt"）：
+    - {prefix}:ns:{thread_id}                    该线程的 checkpoint_ns 集合
+    - {prefix}:idx:{thread_id}:{ns}              检查点ID有序集合（分数为写入时间）
+    - {prefix}:cp:{thread_id}:{ns}:{id}          检查点内容
+    - {prefix}:w:{thread_id}:{ns}:{id}           该检查点的待处理写入（hash）
+    TTL 直接使用 Redis 的 EXPIRE，每次写入时刷新整个线程的过期时间。
+    """
+
+    def __init__(self, client: Any = None, prefix: str = "ckpt", **kwargs: Any):
+        super().__init__(**kwargs)
+        self.client = client if client is not None else LocalRedis()
+        self.prefix = prefix
+
+    def _ns_key(self, thread_id: str) -> str:
+        return f"{self.prefix}:ns:{thread_id}"
+
+    def _idx_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}:idx:{thread_id}:{checkpoint_ns}"
+
+    def _cp_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}:cp:{thread_id}:{checkpoint_ns}:{checkpoint_id}"
+
+    def _writes_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}:w:{thread_id}:{checkpoint_ns}:{checkpoint_id}"
+
+    def _load(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Optional[CheckpointTuple]:
+        raw = self.client.get(self._cp_key(thread_id, checkpoint_ns, checkpoint_id))
+        if raw is None:
+            return None
+        typed_checkpoint, metadata, parent_checkpoint_id = pickle.loads(raw)
+        writes = sorted(
+            pickle.loads(v) for v in self.client.hgetall(self._writes_key(thread_id, checkpoint_ns, checkpoint_id)).values()
+        )
+        return CheckpointTuple(
+            config=_checkpoint_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed(typed_checkpoint),
+            metadata=metadata,
+            parent_config=(
+                _checkpoint_config(thread_id, checkpoint_ns, parent_checkpoint_id)
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for _, _, task_id, channel, value in writes
+            ],
+        )
+
+    def _checkpoint_ids(self, thread_id: str, checkpoint_ns: str) -> List[str]:
+        ids = [_s(m) for m in self.client.zrevrange(self._idx_key(thread_id, checkpoint_ns), 0, -1)]
+        # 检查点ID本身单调递增，按ID排序避免同一时刻写入时的次序问题
+        return sorted(ids, reverse=True)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            ids = self._checkpoint_ids(thread_id, checkpoint_ns)
+            if not ids:
+                return None
+            checkpoint_id = ids[0]
+        return self._load(thread_id, checkpoint_ns, checkpoint_id)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config:
+            thread_ids = [config["configurable"]["thread_id"]]
+        else:
+            prefix = f"{self.prefix}:ns:"
+            thread_ids = [_s(k)[len(prefix):] for k in self.client.scan_iter(match=f"{prefix}*")]
+        config_ns = config["configurable"].get("checkpoint_ns") if config else None
+        config_id = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+        count = 0
+        for thread_id in thread_ids:
+            for checkpoint_ns in sorted(_s(ns) for ns in self.client.smembers(self._ns_key(thread_id))):
+                if config_ns is not None and checkpoint_ns != config_ns:
+                    continue
+                for checkpoint_id in self._checkpoint_ids(thread_id, checkpoint_ns):
+                    if config_id and checkpoint_id != config_id:
+                        continue
+                    if before_id and checkpoint_id >= before_id:
+                        continue
+                    item = self._load(thread_id, checkpoint_ns, checkpoint_id)
+                    if item is None or not self._match_metadata(item.metadata, filter):
+                        continue
+                    if limit is not None and count >= limit:
+                        return
+                    count += 1
+                    yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = checkpoint["id"]
+        payload = pickle.dumps((
+            self.serde.dumps_typed(checkpoint),
+            get_checkpoint_metadata(config, metadata),
+            config["configurable"].get("checkpoint_id"),
+        ))
+        self.client.set(self._cp_key(thread_id, checkpoint_ns, checkpoint_id), payload)
+        self.client.zadd(self._idx_key(thread_id, checkpoint_ns), {checkpoint_id: time.time()})
+        self.client.sadd(self._ns_key(thread_id), checkpoint_ns)
+        self._prune(thread_id, checkpoint_ns)
+        self._touch(thread_id, checkpoint_ns)
+        self._maybe_evict()
+        return _checkpoint_config(thread_id, checkpoint_ns, checkpoint_id)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        key = self._writes_key(thread_id, checkpoint_ns, checkpoint_id)
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            field = f"{task_id}:{write_idx}"
+            # 排序键 (task_id, idx) 与 SQLite 实现的 pending_writes 顺序一致
+            payload = pickle.dumps((task_id, write_idx, task_id, channel, self.serde.dumps_typed(value)))
+            if write_idx >= 0:
+                self.client.hsetnx(key, field, payload)
+            else:
+                self.client.hset(key, field, payload)
+        if self.ttl_seconds is not None:
+            self.client.expire(key, int(self.ttl_seconds))
+
+    def delete_thread(self, thread_id: str) -> None:
+        for checkpoint_ns in [_s(ns) for ns in self.client.smembers(self._ns_key(thread_id))]:
+            keys = [self._idx_key(thread_id, checkpoint_ns)]
+            for checkpoint_id in self._checkpoint_ids(thread_id, checkpoint_ns):
+                keys.append(self._cp_key(thread_id, checkpoint_ns, checkpoint_id))
+                keys.append(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+            self.client.delete(*keys)
+        self.client.delete(self._ns_key(thread_id))
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        if self.keep_latest is None:
+            return
+        stale = self._checkpoint_ids(thread_id, checkpoint_ns)[self.keep_latest:]
+        if not stale:
+            return
+        self.client.zrem(self._idx_key(thread_id, checkpoint_ns), *stale)
+        keys = []
+        for checkpoint_id in stale:
+            keys.append(self._cp_key(thread_id, checkpoint_ns, checkpoint_id))
+            keys.append(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        self.client.delete(*keys)
+
+    def _touch(self, thread_id: str, checkpoint_ns: str) -> None:
+        """刷新线程所有键的过期时间，由 Redis 负责到期清理"""
+        if self.ttl_seconds is None:
+            return
+        ttl = int(self.ttl_seconds)
+        keys = [self._ns_key(thread_id), self._idx_key(thread_id, checkpoint_ns)]
+        for checkpoint_id in self._checkpoint_ids(thread_id, checkpoint_ns):
+            keys.append(self._cp_key(thread_id, checkpoint_ns, checkpoint_id))
+            keys.append(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        for key in keys:
+            self.client.expire(key, ttl)
+
+    def evict_expired(self) -> int:
+        # 真实 Redis 由 EXPIRE 自行清理；进程内实现需要主动扫描过期键
+        purge = getattr(self.client, "purge_expired", None)
+        if purge is None:
+            return 0
+        ns_prefix = f"{self.prefix}:ns:"
+        return sum(1 for key in purge() if key.startswith(ns_prefix))
+
+
+class MemoryCheckpointSaver(RedisCheckpointSaver):
+    """
+    进程内的检查点存储，支持 keep_latest / ttl_seconds。
+    InMemorySaver 永久保留每个线程的全部检查点；这里复用 RedisCheckpointSaver 的
+    裁剪与过期逻辑，数据保存在进程内的 LocalRedis 中，进程退出即丢失。
+    """
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(client=LocalRedis(), **kwargs)
+
+
+def create_checkpointer(conf: Optional[Dict[str, Any]] = None) -> BaseCheckpointSaver:
+    """根据配置创建检查点存储"""
+    conf = conf or {}
+    backend = conf.get("backend", "memory")
+    options = {
+        "keep_latest": conf.get("keep_latest"),
+        "ttl_seconds": conf.get("ttl_seconds"),
+    }
+    if backend == "memory":
+        if options["keep_latest"] or options["ttl_seconds"]:
+            return MemoryCheckpointSaver(**options)
+        return InMemorySaver()
+    if backend == "sqlite":
+        return SQLiteCheckpointSaver(path=conf.get("path", "data/checkpoints.db"), **options)
+    if backend == "redis":
+        client = None
+        if redis_url := conf.get("redis_url"):
+            try:
+                import redis
+            except ImportError:
+                raise ImportError("redis_url is configured but the `redis` package is not installed")
+            client = redis.Redis.from_url(redis_url)
+        return RedisCheckpointSaver(client=client, prefix=conf.get("prefix", "ckpt"), **options)
+    raise ValueError(f"Checkpointer backend not supported: {backend}")
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """读取 config.yaml 中的 checkpointer 配置创建检查点存储"""
+    config = load_yaml_config(_get_conf_path())
+    return create_checkpointer(config.get("checkpointer", {}))
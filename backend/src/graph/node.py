@@ -1,5 +1,6 @@
 from langgraph.types import Command ,interrupt 
-from src.tools.search_with_image import TavilySearchWithImages
+from langgraph.config import get_stream_writer
+from src.tools.search_with_image import BatchTavilySearchWithImages, TavilySearchWithImages
 from src.llms.llm import get_llm
 from langgraph.prebuilt import create_react_agent
 from langgraph.graph import MessagesState,StateGraph , START , END
@@ -16,7 +17,11 @@ import json
 import logging
 import asyncio
 from langgraph.prebuilt import create_react_agent
-from src.utils.content import ContextManager
+from src.utils.content import ContextManager, get_compression_conf
+from src.utils.summary_cache import get_summary_cache
+from src.utils.tokenizer import get_tokenizer
+from src.graph.scheduler import StepScheduler, ReorderBuffer
+from src.tools.search import TavilySearchAPI, get_search_budget, get_search_conf
 logger = logging.getLogger(__name__)
 # config = {"thread_id"}
 class State(MessagesState):
@@ -59,14 +64,15 @@ def handoff_to_planner(
     # 这个工具不需要返回值，只要被调用就表示需要进入研究计划阶段
     pass 
 
-def coordinate_node(state: State) -> Command:
+async def coordinate_node(state: State) -> Command:
     """
     协调，处理简单的用户查询，对于研究、计划、复杂的任务交给planner处理
     轻问题 → 直接回答
     重问题 → 交给 planner
+    使用 llm.astream，避免阻塞事件循环
     """
     chunks = []
-    for chunk in llm.stream(state["messages"]):
+    async for chunk in llm.astream(state["messages"]):
         delta = getattr(chunk, "content", None)
         if delta:
             # print(delta, end="", flush=True)
@@ -287,9 +293,21 @@ def _extract_links_and_images_from_md(md: str) -> Tuple[List[str], List[str]]:
     return links, images
 
 
-async def _async_add_summary_and_references(report_md: str) -> str:
+def _get_stream_writer():
+    """
+    获取 LangGraph 自定义流写入器（stream_mode="custom"）
+    不在图运行上下文中（例如直接调用节点函数）时返回空操作
+    """
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _: None
+
+
+async def _async_add_summary_and_references(report_md: str, writer=None) -> str:
     """
     异步版本：为研究报告添加总结和引用。
+    writer 不为空时，总结内容以 summary_delta 事件增量推送
     """
     # 使用llm 总结
     prompt = render_prompt_template("summary")
@@ -303,6 +321,8 @@ async def _async_add_summary_and_references(report_md: str) -> str:
         delta = getattr(chunk, "content", None)
         if delta:
             content_chunks.append(delta)
+            if writer:
+                writer({"event": "summary_delta", "delta": delta})
     summary_md = "".join(content_chunks)
     
     # 提取报告中的链接和图片
@@ -320,11 +340,31 @@ async def _async_add_summary_and_references(report_md: str) -> str:
     return report_md
 
 
+def _batch_search_enabled(search_conf: dict) -> bool:
+    """是否注册 batch_search 工具；研究提示词据此决定是否提到该工具"""
+    return bool(search_conf.get("batch_search", True))
+
+
+def _build_search_tools(search_conf: dict, budget: Optional[str] = None) -> list:
+    """
+    按步骤的检索预算创建搜索工具
+    单次搜索与批量搜索共用同一个 API 客户端，便于汇总该步骤的返回体大小
+    """
+    api_wrapper = TavilySearchAPI()
+    overrides = get_search_budget(budget, search_conf)
+    tools = [TavilySearchWithImages(api_wrapper=api_wrapper, **overrides)]
+    # 批量搜索：一次工具调用并发执行多个查询，减少 agent 轮次
+    if _batch_search_enabled(search_conf):
+        tools.append(BatchTavilySearchWithImages(api_wrapper=api_wrapper, **overrides))
+    return tools
+
+
 async def async_research_node(state: State) -> Command:
     """
     异步并行版本：
     - research_agent 与 report_agent 并行
     - report-agent 串行依赖：必须等待前一步的report结果
+    - research 可乱序完成，report 经重排序缓冲区严格按 step_index 合并
     step1.research  ──────┐
                       │  (生成结果传入report队列)
                       ▼
@@ -338,10 +378,33 @@ step2.research  ──────┐        合并report
                           最终汇总
 
     """
-    tools = [TavilySearchWithImages()]
+    search_conf = get_search_conf()
+    # 各步骤的检索统计（查询次数、返回体大小），随 step_researched 事件输出
+    search_metrics = {}
     messages = state.get("messages", []) or []
-    research_context_manager = ContextManager(llm, max_tokens=32768)
-    report_context_manager = ContextManager(llm, max_tokens=163840)
+    # 增量事件：step_started / step_researched / section_merged / summary_delta
+    writer = _get_stream_writer()
+    tokenizer = get_tokenizer()
+    # 各步骤共享同一段历史前缀，摘要缓存让重复压缩不再调用LLM
+    summary_cache = get_summary_cache()
+    compression_conf = get_compression_conf()
+    compression_kwargs = {
+        "tokenizer": tokenizer,
+        "summary_cache": summary_cache,
+        "summary_concurrency": compression_conf.get("concurrency", 4),
+        "summary_retries": compression_conf.get("retries", 2),
+        "summary_backoff": compression_conf.get("backoff_seconds", 1.0),
+        "summary_batch_tokens": compression_conf.get("batch_tokens", 0),
+        "compression_mode": compression_conf.get("mode", "full"),
+        "truncate_tail_ratio": compression_conf.get("truncate_tail_ratio", 0.0),
+    }
+    # 研究步骤可以单独使用抽取式压缩（不调用LLM）
+    research_kwargs = dict(
+        compression_kwargs,
+        compression_mode=compression_conf.get("research_mode") or compression_kwargs["compression_mode"],
+    )
+    research_context_manager = ContextManager(llm, max_tokens=32768, **research_kwargs)
+    report_context_manager = ContextManager(llm, max_tokens=163840, **compression_kwargs)
 
     existing_report = state.get("research_summary", "")
     if not existing_report:
@@ -349,22 +412,27 @@ step2.research  ──────┐        合并report
                           f"## 背景与研究动机\n{state['current_plan'].thought}\n\n"
     report_md = existing_report
 
-    RESEARCH_AGENT_SYSTEM = render_prompt_template("research")
+    RESEARCH_AGENT_SYSTEM = render_prompt_template("research", batch_search=_batch_search_enabled(search_conf))
     REPORT_AGENT_SYSTEM = render_prompt_template("report")
 
     step_results = []
     all_research_messages = []
 
+    # 有界并发调度：并发上限取自 config.yaml 的 search.concurrent_requests
+    scheduler = StepScheduler(
+        max_concurrency=search_conf.get("concurrent_requests", 5),
+        step_timeout=search_conf.get("step_timeout"),
+    )
+
     # 队列与同步锁
     report_queue = asyncio.Queue()
     report_lock = asyncio.Lock()  # 确保report串行执行
 
-    async def research_worker(step_index, step):
-        """执行单个research step并推入report_queue"""
-        nonlocal messages
-        try:
-            logger.info(f"[research] 执行步骤 {step_index}: {step.title}")
-            step_user_prompt = f"""
+    async def research_step(step_index, step):
+        """执行单个research step，返回该步骤的Markdown结果"""
+        logger.info(f"[research] 执行步骤 {step_index}: {step.title}")
+        writer({"event": "step_started", "step_index": step_index, "title": step.title})
+        step_user_prompt = f"""
 当前研究步骤 {step_index}: {step.title}
 描述: {step.description}
 
@@ -373,92 +441,155 @@ step2.research  ──────┐        合并report
 - 正文中使用 Markdown 链接格式 `[描述文字](URL)` 标注引用。
 - **保持 Markdown 格式**: 图片使用标准 Markdown 语法 `![描述文字](图片URL)`。
 """
-            current_messages = messages + [
-                SystemMessage(content=RESEARCH_AGENT_SYSTEM),
-                HumanMessage(content=step_user_prompt)
-            ]
-            current_messages = research_context_manager.compress_messages(current_messages)
+        current_messages = messages + [
+            SystemMessage(content=RESEARCH_AGENT_SYSTEM),
+            HumanMessage(content=step_user_prompt)
+        ]
+        current_messages = await research_context_manager.acompress_messages(
+            current_messages, query=f"{step.title} {step.description}"
+        )
 
-            research_agent = create_react_agent(model=llm, tools=tools)
+        tools = _build_search_tools(search_conf, step.search_budget)
+        research_agent = create_react_agent(model=llm, tools=tools)
+        try:
             result = await research_agent.ainvoke({"messages": current_messages})
-            step_md = result["messages"][-1].content if isinstance(result["messages"][-1], AIMessage) else str(result["messages"][-1])
+        finally:
+            search_metrics[step_index] = tools[0].api_wrapper.metrics_summary()
+        return result["messages"][-1].content if isinstance(result["messages"][-1], AIMessage) else str(result["messages"][-1])
 
-            links, images = _extract_links_and_images_from_md(step_md)
+    async def research_worker(step_index, step):
+        """经调度器执行单个research step并推入report_queue"""
+        try:
+            step_md = await scheduler.run(step_index, lambda: research_step(step_index, step))
 
-            await report_queue.put({
+            links, images = _extract_links_and_images_from_md(step_md)
+            item = {
                 "step_index": step_index,
                 "title": step.title,
                 "description": step.description,
                 "step_md": step_md,
                 "sources": links,
-                "images": images
+                "images": images,
+                "metrics": {**scheduler.get_metric(step_index), "search": search_metrics.get(step_index)},
+            }
+            writer({
+                "event": "step_researched",
+                "step_index": step_index,
+                "title": step.title,
+                "sources": links,
+                "images": images,
+                "metrics": item["metrics"],
+                "error": False,
             })
+            await report_queue.put(item)
 
             logger.info(f"[research] 步骤 {step_index} 完成，已推入report队列")
 
         except Exception as e:
-            logger.exception(f"[research] 步骤 {step_index} 出错: {e}")
-            step_results.append({
+            error = f"步骤执行超时({scheduler.step_timeout}s)" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.exception(f"[research] 步骤 {step_index} 出错: {error}")
+            # 失败的步骤同样推入队列，避免阻塞后续步骤的按序合并
+            item = {
                 "step_index": step_index,
                 "title": step.title,
                 "description": step.description,
-                "result_markdown": f"研究失败: {str(e)}",
+                "result_markdown": f"研究失败: {error}",
                 "sources": [],
                 "images": [],
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "metrics": {**scheduler.get_metric(step_index), "search": search_metrics.get(step_index)},
                 "error": True
+            }
+            writer({
+                "event": "step_researched",
+                "step_index": step_index,
+                "title": step.title,
+                "message": item["result_markdown"],
+                "metrics": item["metrics"],
+                "error": True,
             })
+            await report_queue.put(item)
 
     async def report_worker():
-        """按队列顺序串行整合报告"""
-        nonlocal report_md
+        """
+        按 step_index 顺序串行整合报告：
+        research 结果按完成顺序到达，经重排序缓冲区后严格按步骤顺序合并，
+        每个步骤在其前序步骤全部合并后立即合并，不必等待所有研究结束
+        """
+        reorder_buffer = ReorderBuffer(first_index=1)
         while True:
             item = await report_queue.get()
             if item is None:
                 break  # 结束信号
-            async with report_lock:
-                step_index = item["step_index"]
-                step_md = item["step_md"]
-                logger.info(f"[report] 合并步骤 {step_index}")
+            ready_items = reorder_buffer.push(item["step_index"], item)
+            if len(reorder_buffer):
+                logger.info(f"[report] 步骤 {item['step_index']} 已到达，等待前序步骤 (缓冲 {len(reorder_buffer)} 个)")
+            for ready in ready_items:
+                if ready.get("error"):
+                    step_results.append({
+                        **ready,
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    })
+                    logger.info(f"[report] 步骤 {ready['step_index']} 研究失败，跳过合并")
+                    continue
+                await merge_step(ready)
+
+    async def merge_step(item):
+        """将单个步骤的研究结果合并进报告，调用方保证按 step_index 顺序调用"""
+        nonlocal report_md
+        async with report_lock:
+            step_index = item["step_index"]
+            step_md = item["step_md"]
+            logger.info(f"[report] 合并步骤 {step_index}")
 
-                report_user_prompt = f"""
+            report_user_prompt = f"""
 previous_report: '''{report_md}'''
 latest_step: '''{step_md}'''
 
 请输出增量内容：仅包含最新 step 的 Markdown。
 """
-                report_messages = messages + [
-                    SystemMessage(content=REPORT_AGENT_SYSTEM),
-                    HumanMessage(content=report_user_prompt)
-                ]
-                report_messages = report_context_manager.compress_messages(report_messages)
-
-                # 流式生成增量内容
-                inc_chunks = []
-                async for rchunk in llm.astream(report_messages):
-                    delta = getattr(rchunk, "content", None)
-                    if delta:
-                        inc_chunks.append(delta)
-                increment_md = "".join(inc_chunks)
-                print(f"[report] 步骤 {step_index} 增量内容: {increment_md}")
-                # 检查 increment_md 是否包含 existing_report 的标题+背景
-                existing_header = f"# 研究报告: {state['current_plan'].title}\n\n" \
-                                f"## 背景与研究动机\n{state['current_plan'].thought}\n\n"
-                if increment_md.startswith(existing_header):
-                    report_md = ""  # 清空已有 report_md，避免重复
-                report_md += "\n\n" + increment_md
-                step_results.append({
-                    **item,
-                    "result_markdown": step_md,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "error": False
-                })
-                logger.info(f"[report] 步骤 {step_index} 已合并完成")
-
-    # 创建任务
+            report_messages = messages + [
+                SystemMessage(content=REPORT_AGENT_SYSTEM),
+                HumanMessage(content=report_user_prompt)
+            ]
+            report_messages = await report_context_manager.acompress_messages(report_messages)
+
+            # 流式生成增量内容
+            inc_chunks = []
+            async for rchunk in llm.astream(report_messages):
+                delta = getattr(rchunk, "content", None)
+                if delta:
+                    inc_chunks.append(delta)
+            increment_md = "".join(inc_chunks)
+            print(f"[report] 步骤 {step_index} 增量内容: {increment_md}")
+            # 检查 increment_md 是否包含 existing_report 的标题+背景
+            existing_header = f"# 研究报告: {state['current_plan'].title}\n\n" \
+                            f"## 背景与研究动机\n{state['current_plan'].thought}\n\n"
+            if increment_md.startswith(existing_header):
+                report_md = ""  # 清空已有 report_md，避免重复
+            report_md += "\n\n" + increment_md
+            writer({
+                "event": "section_merged",
+                "step_index": step_index,
+                "title": item["title"],
+                "section_md": increment_md,
+            })
+            step_results.append({
+                **item,
+                "result_markdown": step_md,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "error": False
+            })
+            logger.info(f"[report] 步骤 {step_index} 已合并完成")
+
+    # 创建任务：所有步骤都会执行，同时运行的数量由调度器限制
+    plan_steps = state["current_plan"].steps
+    logger.info(
+        f"[research] 共 {len(plan_steps)} 个步骤，并发上限 {scheduler.max_concurrency}，"
+        f"预计 {scheduler.expected_rounds(len(plan_steps))} 轮"
+    )
     research_tasks = [
         asyncio.create_task(research_worker(i + 1, step))
-        for i, step in enumerate(state["current_plan"].steps[:2])
+        for i, step in enumerate(plan_steps)
     ]
     report_task = asyncio.create_task(report_worker())
 
@@ -468,8 +599,9 @@ latest_step: '''{step_md}'''
     await report_queue.put(None)
     # 等待report完成
     await report_task
+    logger.info(f"[research] 调度统计: {scheduler.summary()}")
 
-    summary = await _async_add_summary_and_references(report_md)
+    summary = await _async_add_summary_and_references(report_md, writer=writer)
     final_report = summary + f"\n\n---\n研究完成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
 
     return Command(
@@ -499,9 +631,9 @@ graph_build.add_edge("generate_plan", "human_feedback")
 graph_build.add_edge("human_feedback", "research_node")
 graph_build.add_edge("research_node", END)
 graph_build.add_edge("coordinate", END)
-# 正常启动
-from langgraph.checkpoint.memory import InMemorySaver
-checkpointer = InMemorySaver() 
+# 正常启动：检查点后端由 config.yaml 的 checkpointer 配置决定
+from src.graph.checkpoint import get_checkpointer
+checkpointer = get_checkpointer()
 graph = graph_build.compile(checkpointer=checkpointer)
 
 # 通过 langgraph dev 启动 ，langgraph API 会自动处理持久化，不需要自定义检查点，否则报错
@@ -0,0 +1,105 @@
+"""
+研究步骤调度器：
+- StepScheduler: 限制同时执行的研究步骤数量，并记录每个步骤的排队与执行耗时
+- ReorderBuffer: 研究结果乱序到达时，按 step_index 顺序释放给报告合并
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StepScheduler:
+    """
+    基于信号量的有界并发调度器
+    - max_concurrency: 同时执行的步骤上限
+    - step_timeout: 单个步骤的执行超时（秒），为空表示不限制；排队时间不计入超时
+    """
+
+    def __init__(self, max_concurrency: int = 5, step_timeout: Optional[float] = None):
+        self.max_concurrency = max(1, int(max_concurrency or 1))
+        self.step_timeout = step_timeout if step_timeout and step_timeout > 0 else None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.metrics: List[Dict[str, Any]] = []
+
+    async def run(self, step_index: int, step_factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        等待空闲槽位后执行步骤，超时抛出 asyncio.TimeoutError
+        step_factory 在拿到槽位后才调用，保证排队期间不会提前发起LLM/搜索请求
+        """
+        submitted_at = time.perf_counter()
+        metric = {"step_index": step_index, "queue_wait": 0.0, "exec_time": 0.0, "status": "queued"}
+        self.metrics.append(metric)
+        async with self._semaphore:
+            started_at = time.perf_counter()
+            metric["queue_wait"] = started_at - submitted_at
+            metric["status"] = "running"
+            try:
+                if self.step_timeout is None:
+                    result = await step_factory()
+                else:
+                    result = await asyncio.wait_for(step_factory(), timeout=self.step_timeout)
+                metric["status"] = "completed"
+                return result
+            except asyncio.TimeoutError:
+                metric["status"] = "timeout"
+                logger.warning(f"[scheduler] 步骤 {step_index} 超时 ({self.step_timeout}s)")
+                raise
+            except Exception:
+                metric["status"] = "failed"
+                raise
+            finally:
+                metric["exec_time"] = time.perf_counter() - started_at
+                logger.info(
+                    f"[scheduler] 步骤 {step_index} {metric['status']}: "
+                    f"排队 {metric['queue_wait']:.2f}s, 执行 {metric['exec_time']:.2f}s"
+                )
+
+    def get_metric(self, step_index: int) -> Optional[Dict[str, Any]]:
+        """获取指定步骤的耗时统计"""
+        return next((dict(m) for m in self.metrics if m["step_index"] == step_index), None)
+
+    def expected_rounds(self, total_steps: int) -> int:
+        """按当前并发上限执行 total_steps 个步骤所需的轮数"""
+        return math.ceil(total_steps / self.max_concurrency) if total_steps else 0
+
+    def summary(self) -> Dict[str, Any]:
+        """汇总所有步骤的排队与执行耗时"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "steps": len(self.metrics),
+            "rounds": self.expected_rounds(len(self.metrics)),
+            "total_queue_wait": sum(m["queue_wait"] for m in self.metrics),
+            "total_exec_time": sum(m["exec_time"] for m in self.metrics),
+            "max_queue_wait": max((m["queue_wait"] for m in self.metrics), default=0.0),
+            "timeouts": sum(1 for m in self.metrics if m["status"] == "timeout"),
+        }
+
+
+class ReorderBuffer:
+    """
+    重排序缓冲区：步骤结果可以以任意顺序 push，
+    只有当前面的步骤都已到达时才按 step_index 顺序释放。
+    """
+
+    def __init__(self, first_index: int = 1):
+        self.next_index = first_index
+        self._pending: Dict[int, Any] = {}
+
+    def push(self, step_index: int, item: Any) -> List[Any]:
+        """放入一个结果，返回因此可以按顺序释放的所有结果（可能为空）"""
+        if step_index < self.next_index or step_index in self._pending:
+            raise ValueError(f"步骤 {step_index} 重复提交")
+        self._pending[step_index] = item
+        ready = []
+        while self.next_index in self._pending:
+            ready.append(self._pending.pop(self.next_index))
+            self.next_index += 1
+        return ready
+
+    def __len__(self) -> int:
+        """尚在等待前序步骤的结果数量"""
+        return len(self._pending)
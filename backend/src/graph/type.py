@@ -1,11 +1,12 @@
 from pydantic import BaseModel
-from typing import List, Optional, Union
+from typing import List, Literal, Optional, Union
 
 from pydantic import Field
 
 class Step(BaseModel):
     title: str = Field(description="步骤标题")
     description: str = Field(description="Specify exactly what data to collect. If the user input contains a link, please retain the full Markdown format when necessary.")
+    search_budget: Optional[Literal["deep", "broad"]] = Field(default=None, description="\"deep\" for steps that dig into one specific question (fewer results with full page content), \"broad\" for steps that survey a wide topic (more short snippets).")
 class Plan(BaseModel):
     locale: str = Field(description="e.g. \"en-US\" or \"zh-CN\", based on the user's language or specific request")
     has_enough_context: bool = Field(description="Indicates whether the user input already contains enough context to answer the question.")
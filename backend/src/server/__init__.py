@@ -0,0 +1,47 @@
+from src.server.state_store import (
+    ResearchStateStore,
+    InMemoryResearchStateStore,
+    SQLiteResearchStateStore,
+    FileResearchStateStore,
+    create_research_state_store,
+    get_research_state_store,
+)
+from src.server.streaming import (
+    TokenBatcher,
+    coalesce_token_events,
+    create_token_batcher,
+    get_sse_conf,
+)
+from src.server.event_log import (
+    EventLog,
+    EventLogRegistry,
+    create_event_log_registry,
+)
+from src.server.run_manager import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_RESEARCH,
+    RunManager,
+    create_run_manager,
+    get_run_conf,
+)
+
+__all__ = [
+    "ResearchStateStore",
+    "InMemoryResearchStateStore",
+    "SQLiteResearchStateStore",
+    "FileResearchStateStore",
+    "create_research_state_store",
+    "get_research_state_store",
+    "TokenBatcher",
+    "coalesce_token_events",
+    "create_token_batcher",
+    "get_sse_conf",
+    "EventLog",
+    "EventLogRegistry",
+    "create_event_log_registry",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_RESEARCH",
+    "RunManager",
+    "create_run_manager",
+    "get_run_conf",
+]
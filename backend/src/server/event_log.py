@@ -0,0 +1,149 @@
+"""
+研究事件日志：
+- EventLog: 每个研究计划一个有界环形缓冲区，事件带有单调递增的 id，
+  断线重连的客户端按 Last-Event-ID 只补发错过的事件，再接着订阅实时事件
+- EventLogRegistry: 按 plan_id 管理事件日志，已结束的日志保留一段时间后清理
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 订阅时请求的事件已被环形缓冲区淘汰，用该事件告知客户端存在缺口
+GAP_EVENT = "replay_gap"
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+class EventLog:
+    """
+    单个研究计划的事件日志
+    - maxlen: 环形缓冲区保留的事件数量上限
+    - 同一计划的多次运行（启动流、确认流）共用一个日志，id 持续递增
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self._events: deque = deque(maxlen=max(1, maxlen))
+        self._next_id = 1
+        self._changed = asyncio.Event()
+        self.closed = False
+        self.updated_at = time.monotonic()
+
+    @property
+    def last_id(self) -> int:
+        """最近一个事件的 id，没有事件时为 0"""
+        return self._next_id - 1
+
+    @property
+    def first_id(self) -> int:
+        """缓冲区中最早事件的 id"""
+        return self._events[0][0] if self._events else self._next_id
+
+    def append(self, event: str, data: Dict[str, Any]) -> int:
+        """追加一个事件并唤醒所有订阅者，返回事件 id"""
+        event_id = self._next_id
+        self._next_id += 1
+        self._events.append((event_id, event, data))
+        self.updated_at = time.monotonic()
+        self._notify()
+        return event_id
+
+    def close(self) -> None:
+        """本次运行结束，订阅者读完剩余事件后退出"""
+        self.closed = True
+        self.updated_at = time.monotonic()
+        self._notify()
+
+    def reopen(self) -> None:
+        """同一计划开始新的运行"""
+        self.closed = False
+        self.updated_at = time.monotonic()
+
+    def since(self, last_id: int) -> Tuple[List[Event], bool]:
+        """返回 id 大于 last_id 的事件，以及中间是否有事件已被淘汰"""
+        if last_id >= self.last_id:
+            return [], False
+        gap = last_id + 1 < self.first_id
+        start = max(0, last_id + 1 - self.first_id)
+        return [self._events[i] for i in range(start, len(self._events))], gap
+
+    async def subscribe(self, last_id: int = 0) -> AsyncIterator[Event]:
+        """先补发 last_id 之后的事件，再持续输出新事件，直到日志关闭"""
+        async for batch in self.subscribe_batches(last_id):
+            for item in batch:
+                yield item
+
+    async def subscribe_batches(self, last_id: int = 0) -> AsyncIterator[List[Event]]:
+        """
+        与 subscribe 相同，但每次输出订阅者尚未读取的全部事件
+        批次大小即该订阅者落后的事件数，调用方可据此对慢客户端做合并等处理
+        """
+        while True:
+            events, gap = self.since(last_id)
+            if gap:
+                events = [(0, GAP_EVENT, {"last_event_id": last_id, "first_available_id": self.first_id})] + events
+            if events:
+                yield events
+                last_id = max(last_id, events[-1][0])
+                continue
+            if self.closed:
+                return
+            await self._changed.wait()
+
+    def _notify(self) -> None:
+        # 唤醒当前所有等待者，之后的等待使用新的 Event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class EventLogRegistry:
+    """
+    按 plan_id 管理事件日志
+    - maxlen: 每个日志的环形缓冲区大小
+    - retention_seconds: 日志关闭后保留的时间，期间断线的客户端仍可重连补发
+    """
+
+    def __init__(self, maxlen: int = 1000, retention_seconds: float = 600):
+        self.maxlen = maxlen
+        self.retention_seconds = retention_seconds
+        self._logs: Dict[str, EventLog] = {}
+
+    def get(self, plan_id: str) -> Optional[EventLog]:
+        self._evict_expired()
+        return self._logs.get(plan_id)
+
+    def open(self, plan_id: str) -> EventLog:
+        """获取（或创建）计划的事件日志并标记为运行中"""
+        self._evict_expired()
+        log = self._logs.get(plan_id)
+        if log is None:
+            log = self._logs[plan_id] = EventLog(self.maxlen)
+        else:
+            log.reopen()
+        return log
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            plan_id for plan_id, log in self._logs.items()
+            if log.closed and now - log.updated_at > self.retention_seconds
+        ]
+        for plan_id in expired:
+            del self._logs[plan_id]
+        if expired:
+            logger.debug(f"[event_log] 清理 {len(expired)} 个过期事件日志")
+
+
+def create_event_log_registry(conf: Optional[Dict[str, Any]] = None) -> EventLogRegistry:
+    """根据 sse 配置创建事件日志注册表"""
+    conf = conf or {}
+    return EventLogRegistry(
+        maxlen=conf.get("event_log_size", 1000),
+        retention_seconds=conf.get("event_log_retention_seconds", 600),
+    )
@@ -0,0 +1,231 @@
+"""
+研究运行管理器：
+图的执行与 HTTP 连接解耦，作为后台任务运行，事件写入计划的事件日志；
+HTTP 端点只负责订阅事件日志，多个客户端可以同时观看同一个计划，断线也不会浪费已消耗的算力。
+- 两个执行池：交互式请求（协调器、生成计划）与研究执行各自有并发上限，
+  研究占满槽位时 /start 等短请求不需要排队等待耗时数分钟的研究
+- 优先级队列：超过上限的运行按优先级（数值越小越优先）、再按提交顺序等待
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from src.config.loader import load_yaml_config
+from src.server.event_log import EventLog, EventLogRegistry
+
+logger = logging.getLogger(__name__)
+
+# 交互式请求（协调器、生成计划）使用单独的执行池；优先级 <= PRIORITY_INTERACTIVE 的运行进入交互池，
+# 其余进入研究池，同一个池内按优先级排队
+PRIORITY_INTERACTIVE = 0
+PRIORITY_RESEARCH = 10
+
+EventFactory = Callable[[], AsyncIterator[Tuple[str, Dict[str, Any]]]]
+# 运行失败或被取消时的回调：(终止状态 "error" / "cancelled", 说明)，用于把终止状态写入研究状态存储
+FailureHook = Callable[[str, str], None]
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+class _SlotPool:
+    """带优先级等待队列的执行槽位池"""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit or 1))
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    @property
+    def full(self) -> bool:
+        return self.active >= self.limit or bool(self.queued)
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 槽位已转交给本任务但随即被取消，交还给下一个等待者
+                self.release()
+            raise
+
+    def release(self) -> None:
+        # 直接把槽位转交给优先级最高的等待者，active 不变
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+
+class RunManager:
+    """
+    后台运行管理器
+    - max_concurrent_runs: 研究池同时执行的图运行上限
+    - max_interactive_runs: 交互池（协调器、生成计划）同时执行的图运行上限
+    - event_logs: 事件日志注册表，每次运行的事件写入对应计划的日志
+    """
+
+    def __init__(self, event_logs: EventLogRegistry, max_concurrent_runs: int = 4, max_interactive_runs: int = 32):
+        self.event_logs = event_logs
+        self._research = _SlotPool(max_concurrent_runs)
+        self._interactive = _SlotPool(max_interactive_runs)
+        self.max_concurrent_runs = self._research.limit
+        self.max_interactive_runs = self._interactive.limit
+        self._runs: Dict[str, asyncio.Task] = {}
+
+    @property
+    def active(self) -> int:
+        """正在执行的运行数量"""
+        return self._research.active + self._interactive.active
+
+    @property
+    def queued(self) -> int:
+        """等待执行槽位的运行数量"""
+        return self._research.queued + self._interactive.queued
+
+    def _pool(self, priority: int) -> _SlotPool:
+        return self._interactive if priority <= PRIORITY_INTERACTIVE else self._research
+
+    def is_running(self, plan_id: str) -> bool:
+        """计划是否有排队中或执行中的后台运行"""
+        return plan_id in self._runs
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_RESEARCH):
+        """占用一个执行槽位；非流式端点直接使用，与同一个池中的后台运行共享并发上限"""
+        pool = self._pool(priority)
+        await pool.acquire(priority)
+        try:
+            yield
+        finally:
+            pool.release()
+
+    @asynccontextmanager
+    async def inline_run(
+        self, plan_id: str, priority: int = PRIORITY_RESEARCH, on_failure: Optional[FailureHook] = None
+    ):
+        """
+        非流式端点在当前请求中执行图：先登记到运行表再占用执行槽位，
+        与同一计划的后台运行互斥（is_running / submit 均能看到它），结束后注销
+        执行失败或被取消时先调用 on_failure 再把异常抛给调用方
+        """
+        if self.is_running(plan_id):
+            raise RuntimeError(f"计划 {plan_id} 已有运行中的任务")
+        self._runs[plan_id] = asyncio.current_task()
+        try:
+            async with self.slot(priority):
+                yield
+        except asyncio.CancelledError:
+            _call_failure_hook(on_failure, plan_id, "cancelled", "研究已取消")
+            raise
+        except Exception as run_e:
+            _call_failure_hook(on_failure, plan_id, "error", str(run_e))
+            raise
+        finally:
+            self._runs.pop(plan_id, None)
+
+    def submit(
+        self,
+        plan_id: str,
+        events: EventFactory,
+        started: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_RESEARCH,
+        on_failure: Optional[FailureHook] = None,
+    ) -> Tuple[EventLog, int]:
+        """
+        提交一次后台运行，立即返回事件日志以及本次运行之前的最后一个事件 id（订阅起点）
+        events 在拿到执行槽位后才调用，排队期间不会发起任何LLM请求
+        运行抛出异常或被取消时，除了写入 error / cancelled 事件，还会调用 on_failure
+        """
+        if self.is_running(plan_id):
+            raise RuntimeError(f"计划 {plan_id} 已有运行中的任务")
+        log = self.event_logs.open(plan_id)
+        after_id = log.last_id
+        log.append("started", {"plan_id": plan_id, **(started or {})})
+        self._runs[plan_id] = asyncio.create_task(self._run(plan_id, log, events, priority, on_failure))
+        return log, after_id
+
+    def cancel(self, plan_id: str) -> bool:
+        """取消计划的后台运行（排队中或执行中）"""
+        task = self._runs.get(plan_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def shutdown(self) -> None:
+        """取消所有后台运行并等待其结束（应用关闭时调用）"""
+        tasks = list(self._runs.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(
+        self,
+        plan_id: str,
+        log: EventLog,
+        events: EventFactory,
+        priority: int,
+        on_failure: Optional[FailureHook],
+    ) -> None:
+        try:
+            pool = self._pool(priority)
+            if pool.full:
+                log.append("queued", {"plan_id": plan_id, "position": pool.queued + 1})
+            async with self.slot(priority):
+                async for event, data in events():
+                    log.append(event, data)
+        except asyncio.CancelledError:
+            log.append("cancelled", {"plan_id": plan_id})
+            _call_failure_hook(on_failure, plan_id, "cancelled", "研究已取消")
+            raise
+        except Exception as run_e:
+            logger.exception(f"[run_manager] 计划 {plan_id} 运行异常: {run_e}")
+            log.append("error", {"plan_id": plan_id, "error": str(run_e)})
+            _call_failure_hook(on_failure, plan_id, "error", str(run_e))
+        finally:
+            log.close()
+            self._runs.pop(plan_id, None)
+            logger.info(f"[run_manager] 计划 {plan_id} 运行结束，执行中 {self.active}，排队 {self.queued}")
+
+
+def _call_failure_hook(on_failure: Optional[FailureHook], plan_id: str, status: str, message: str) -> None:
+    # 回调失败不能影响运行本身的收尾（关闭事件日志、注销运行）
+    if on_failure is None:
+        return
+    try:
+        on_failure(status, message)
+    except Exception as hook_e:
+        logger.warning(f"[run_manager] 计划 {plan_id} 写入终止状态失败: {hook_e}")
+
+
+def create_run_manager(event_logs: EventLogRegistry, conf: Optional[Dict[str, Any]] = None) -> RunManager:
+    """根据 runs 配置创建运行管理器"""
+    conf = conf or {}
+    return RunManager(
+        event_logs,
+        max_concurrent_runs=conf.get("max_concurrent", 4),
+        max_interactive_runs=conf.get("max_interactive", 32),
+    )
+
+
+def get_run_conf() -> Dict[str, Any]:
+    """读取 config.yaml 中的 runs 配置"""
+    return load_yaml_config(_get_conf_path()).get("runs", {}) or {}
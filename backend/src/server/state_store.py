@@ -0,0 +1,387 @@
+"""
+研究状态存储：保存 plan_id 对应的计划元数据（状态、当前阶段、计划、结果等）。
+
+提供三种实现：
+- memory: 进程内 LRU + TTL，限制单个 worker 的内存占用
+- sqlite: SQLite(WAL) 文件，可在同一台机器的多个 uvicorn worker 间共享
+- file:   每个 plan 一个 JSON 文件，适合挂载共享目录
+
+所有实现存取的都是可 JSON 序列化的字典，pydantic 对象在写入时会被转换为 dict。
+过期状态除了读取时跳过外，还由 purge_periodically 在后台定期清理（见 main.py 的 lifespan）。
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，文件存储只保证进程内的原子更新
+    fcntl = None
+
+from src.config.loader import load_yaml_config
+
+logger = logging.getLogger(__name__)
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+def _to_jsonable(data: Dict[str, Any]) -> Dict[str, Any]:
+    """将状态转换为纯 JSON 结构（pydantic/消息对象转为 dict）"""
+    def _default(o: Any):
+        if hasattr(o, "model_dump"):
+            return o.model_dump()
+        if hasattr(o, "dict"):
+            return o.dict()
+        return str(o)
+    return json.loads(json.dumps(data, ensure_ascii=False, default=_default))
+
+
+def version_of(state: Optional[Dict[str, Any]]) -> int:
+    """研究状态的版本号，尚未更新过的状态为 0"""
+    return int((state or {}).get("version", 0))
+
+
+def diff_status(old: Dict[str, Any], new: Dict[str, Any], list_key: str = "step_results") -> Dict[str, Any]:
+    """
+    计算两次状态快照之间的差异：
+    - changes: 值发生变化的字段（不含 list_key）
+    - {list_key}_added: 列表只在末尾追加时，仅返回新增的元素
+    - 列表被改写（非追加）时，整个列表放入 changes
+    """
+    changes = {k: v for k, v in new.items() if k != list_key and old.get(k) != v}
+    diff: Dict[str, Any] = {"changes": changes}
+    old_list = old.get(list_key) or []
+    new_list = new.get(list_key) or []
+    if new_list[:len(old_list)] == old_list:
+        if len(new_list) > len(old_list):
+            diff[f"{list_key}_added"] = new_list[len(old_list):]
+    else:
+        changes[list_key] = new_list
+    return diff
+
+
+class ResearchStateStore(ABC):
+    """研究状态存储接口"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        # ttl_seconds 为空或 <= 0 表示永不过期
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        # 后台清理过期状态的间隔（秒），<= 0 表示不定期清理
+        self.purge_interval: float = 3600
+        # 等待状态变化的订阅者（仅本进程内），每个计划一个 Event
+        self._change_events: Dict[str, asyncio.Event] = {}
+
+    @abstractmethod
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """获取研究状态，不存在或已过期时返回 None"""
+
+    @abstractmethod
+    def set(self, plan_id: str, state: Dict[str, Any]) -> None:
+        """写入（覆盖）研究状态"""
+
+    @abstractmethod
+    def delete(self, plan_id: str) -> None:
+        """删除研究状态"""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """删除所有过期状态，返回删除数量"""
+
+    def update(self, plan_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """
+        合并更新部分字段，返回更新后的状态；plan 不存在时返回 None
+        每次更新版本号 version 加一，并唤醒本进程内等待该计划变化的订阅者
+        """
+        state = self.get(plan_id)
+        if state is None:
+            return None
+        state.update(_to_jsonable(fields))
+        state["version"] = version_of(state) + 1
+        self.set(plan_id, state)
+        self._notify(plan_id)
+        return state
+
+    async def wait_for_change(self, plan_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待计划的版本号不再等于 version，返回最新状态；超时则返回当前状态
+        其他进程写入的变化不会触发通知，由调用方按 timeout 周期重新检查
+        """
+        state = self.get(plan_id)
+        if state is None or version_of(state) != version:
+            return state
+        event = self._change_events.setdefault(plan_id, asyncio.Event())
+        try:
+            async with asyncio.timeout(timeout):
+                await event.wait()
+        except TimeoutError:
+            pass
+        return self.get(plan_id)
+
+    def _notify(self, plan_id: str) -> None:
+        event = self._change_events.pop(plan_id, None)
+        if event is not None:
+            event.set()
+
+    def __contains__(self, plan_id: str) -> bool:
+        return self.get(plan_id) is not None
+
+    def _is_expired(self, updated_at: float, now: Optional[float] = None) -> bool:
+        if self.ttl_seconds is None:
+            return False
+        return (now or time.time()) - updated_at > self.ttl_seconds
+
+
+class InMemoryResearchStateStore(ResearchStateStore):
+    """进程内存储，按 LRU 淘汰并按 TTL 过期"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = None):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._data.get(plan_id)
+            if item is None:
+                return None
+            updated_at, payload = item
+            if self._is_expired(updated_at):
+                del self._data[plan_id]
+                return None
+            self._data.move_to_end(plan_id)
+        # 存储序列化后的字符串，保证返回的是独立副本
+        return json.loads(payload)
+
+    def set(self, plan_id: str, state: Dict[str, Any]) -> None:
+        payload = json.dumps(_to_jsonable(state), ensure_ascii=False)
+        with self._lock:
+            self._data[plan_id] = (time.time(), payload)
+            self._data.move_to_end(plan_id)
+            self._evict()
+
+    def delete(self, plan_id: str) -> None:
+        with self._lock:
+            self._data.pop(plan_id, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            before = len(self._data)
+            self._evict()
+            return before - len(self._data)
+
+    def _evict(self) -> None:
+        # 先清理过期条目，再按 LRU 淘汰超出容量的条目
+        if self.ttl_seconds is not None:
+            now = time.time()
+            expired = [k for k, (ts, _) in self._data.items() if self._is_expired(ts, now)]
+            for key in expired:
+                del self._data[key]
+        while self.max_entries and len(self._data) > self.max_entries:
+            plan_id, _ = self._data.popitem(last=False)
+            logger.debug(f"研究状态被LRU淘汰: {plan_id}")
+
+
+class SQLiteResearchStateStore(ResearchStateStore):
+    """基于 SQLite(WAL) 的存储，可被多个进程共享"""
+
+    def __init__(self, path: str = "data/research_states.db", ttl_seconds: Optional[float] = None):
+        super().__init__(ttl_seconds)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS research_states ("
+            "plan_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM research_states WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+        if row is None or self._is_expired(row[1]):
+            return None
+        return json.loads(row[0])
+
+    def set(self, plan_id: str, state: Dict[str, Any]) -> None:
+        payload = json.dumps(_to_jsonable(state), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO research_states (plan_id, data, updated_at) VALUES (?, ?, ?)",
+                (plan_id, payload, time.time()),
+            )
+            self._purge_expired()
+
+    def update(self, plan_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        # 读改写放在同一个写事务中，避免多进程并发更新时丢失字段
+        fields = _to_jsonable(fields)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data, updated_at FROM research_states WHERE plan_id = ?", (plan_id,)
+                ).fetchone()
+                if row is None or self._is_expired(row[1]):
+                    self._conn.execute("COMMIT")
+                    return None
+                state = json.loads(row[0])
+                state.update(fields)
+                state["version"] = version_of(state) + 1
+                self._conn.execute(
+                    "UPDATE research_states SET data = ?, updated_at = ? WHERE plan_id = ?",
+                    (json.dumps(state, ensure_ascii=False), time.time(), plan_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._notify(plan_id)
+        return state
+
+    def delete(self, plan_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM research_states WHERE plan_id = ?", (plan_id,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_expired()
+
+    def _purge_expired(self) -> int:
+        if self.ttl_seconds is None:
+            return 0
+        return self._conn.execute(
+            "DELETE FROM research_states WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class FileResearchStateStore(ResearchStateStore):
+    """
+    每个 plan 一个 JSON 文件，写入时先写临时文件再原子替换
+    update 的读改写持有目录下 .lock 文件的排他锁（fcntl.flock），多个 worker 并发更新同一个计划时不会丢失字段；
+    没有 fcntl 的平台上只保证单进程内的原子更新。
+    """
+
+    def __init__(self, directory: str = "data/research_states", ttl_seconds: Optional[float] = None):
+        super().__init__(ttl_seconds)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _file(self, plan_id: str) -> Path:
+        # plan_id 来自请求参数，去掉路径分隔符防止越权访问
+        safe_id = "".join(c for c in plan_id if c.isalnum() or c in "-_")
+        return self.directory / f"{safe_id}.json"
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        path = self._file(plan_id)
+        try:
+            if self._is_expired(path.stat().st_mtime):
+                path.unlink(missing_ok=True)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def set(self, plan_id: str, state: Dict[str, Any]) -> None:
+        path = self._file(plan_id)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_to_jsonable(state), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def update(self, plan_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        with self._locked():
+            return super().update(plan_id, **fields)
+
+    def delete(self, plan_id: str) -> None:
+        self._file(plan_id).unlink(missing_ok=True)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # 线程锁保证进程内互斥，flock 保证跨进程互斥（共享目录上的所有 worker 使用同一个锁文件）
+        with self._lock, open(self.directory / ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def purge_expired(self) -> int:
+        if self.ttl_seconds is None:
+            return 0
+        removed = 0
+        now = time.time()
+        for path in self.directory.glob("*.json"):
+            if self._is_expired(path.stat().st_mtime, now):
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+def create_research_state_store(conf: Optional[Dict[str, Any]] = None) -> ResearchStateStore:
+    """根据配置创建研究状态存储"""
+    conf = conf or {}
+    backend = conf.get("backend", "memory")
+    ttl_seconds = conf.get("ttl_seconds")
+    if backend == "memory":
+        store: ResearchStateStore = InMemoryResearchStateStore(
+            max_entries=conf.get("max_entries", 1000), ttl_seconds=ttl_seconds
+        )
+    elif backend == "sqlite":
+        store = SQLiteResearchStateStore(
+            path=conf.get("path", "data/research_states.db"), ttl_seconds=ttl_seconds
+        )
+    elif backend == "file":
+        store = FileResearchStateStore(
+            directory=conf.get("path", "data/research_states"), ttl_seconds=ttl_seconds
+        )
+    else:
+        raise ValueError(f"State store backend not supported: {backend}")
+    store.purge_interval = conf.get("purge_interval", store.purge_interval)
+    return store
+
+
+async def purge_periodically(store: ResearchStateStore) -> None:
+    """每隔 purge_interval 秒清理一次过期状态，在 FastAPI lifespan 中作为后台任务运行直到被取消"""
+    if store.ttl_seconds is None or not store.purge_interval or store.purge_interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(store.purge_interval)
+        try:
+            removed = await asyncio.to_thread(store.purge_expired)
+        except Exception as e:
+            logger.warning(f"清理过期研究状态失败: {e}")
+            continue
+        if removed:
+            logger.info(f"清理过期研究状态 {removed} 个")
+
+
+def get_research_state_store() -> ResearchStateStore:
+    """读取 config.yaml 中的 state_store 配置创建存储"""
+    config = load_yaml_config(_get_conf_path())
+    return create_research_state_store(config.get("state_store", {}))
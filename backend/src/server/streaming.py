@@ -0,0 +1,202 @@
+"""
+SSE 流式输出工具：
+- TokenBatcher: 将 1~3 个字符的 LLM 增量 token 按字节数/时间窗口合并成一帧
+- coalesce_token_events: 在事件流上应用 TokenBatcher
+- subscribe_with_backpressure: 按订阅者的读取速度输出事件日志，落后过多时合并积压的 chunk
+
+合并后的事件写入 EventLog（见 event_log.py），写入不会阻塞，图的执行不受客户端速度影响。
+背压按订阅者处理：每条 SSE 流按客户端的速度读取共享的环形缓冲区，不为单个连接复制事件；
+落后超过 sse.queue_size 个事件时，积压的连续 chunk 合并成一帧写出，帮助慢客户端追上；
+落后超过环形缓冲区（sse.event_log_size）的客户端会收到 replay_gap 事件，而不是拖慢研究。
+"""
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from src.config.loader import load_yaml_config
+from src.server.event_log import Event, EventLog
+
+logger = logging.getLogger(__name__)
+
+# 需要合并的增量事件名
+TOKEN_EVENT = "chunk"
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+class TokenBatcher:
+    """
+    token 增量合并器
+    - max_bytes: 累积的 UTF-8 字节数达到该值时立即输出一帧，<=0 表示每个 token 单独成帧
+    - max_latency: 第一个未输出的 token 最多等待的时间（秒）
+    """
+
+    def __init__(self, max_bytes: int = 256, max_latency: float = 0.03):
+        self.max_bytes = max_bytes
+        self.max_latency = max(0.0, max_latency)
+        self._parts = []
+        self._bytes = 0
+        self._first_at: Optional[float] = None
+        # 统计信息
+        self.tokens = 0
+        self.frames = 0
+
+    def __len__(self) -> int:
+        """尚未输出的字节数"""
+        return self._bytes
+
+    def add(self, delta: str, now: Optional[float] = None) -> Optional[str]:
+        """加入一个增量，达到字节上限时返回需要输出的合并文本"""
+        if not delta:
+            return None
+        if self._first_at is None:
+            self._first_at = time.monotonic() if now is None else now
+        self._parts.append(delta)
+        self._bytes += len(delta.encode("utf-8"))
+        self.tokens += 1
+        if self._bytes >= self.max_bytes:
+            return self.flush()
+        return None
+
+    def time_until_flush(self, now: Optional[float] = None) -> Optional[float]:
+        """距离必须输出还剩多少秒；没有待输出内容时返回 None"""
+        if self._first_at is None:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._first_at + self.max_latency - now)
+
+    def flush(self) -> str:
+        """输出并清空当前累积的内容"""
+        if not self._parts:
+            return ""
+        text = "".join(self._parts)
+        self._parts = []
+        self._bytes = 0
+        self._first_at = None
+        self.frames += 1
+        return text
+
+
+async def coalesce_token_events(
+    events: AsyncIterator[Tuple[str, Dict[str, Any]]],
+    batcher: TokenBatcher,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    合并事件流中连续的 chunk 事件，其余事件原样按顺序输出
+    - 按需拉取上游：同一时刻最多预读一个事件，下游不读取时上游随之暂停
+    - 有待输出的 token 时，等待上游的同时按时间窗口输出，不会因上游停顿而延迟
+    - 非 chunk 事件到达前，先输出已累积的 token，保证事件顺序不变
+    """
+    if batcher.max_bytes <= 0:
+        # 未启用合并：直接透传
+        async for item in events:
+            yield item
+        return
+
+    iterator = events.__aiter__()
+    # 上游的下一个事件；超时等待不能直接取消 __anext__（会终止上游生成器），因此放在任务中
+    pending: Optional[asyncio.Future] = None
+    # 合并帧沿用第一个 chunk 的其余字段（如 plan_id）
+    template: Dict[str, Any] = {}
+
+    def _frame(text: str) -> Tuple[str, Dict[str, Any]]:
+        return TOKEN_EVENT, {**template, "delta": text}
+
+    try:
+        while True:
+            timeout = batcher.time_until_flush()
+            try:
+                if timeout is None and pending is None:
+                    # 没有待输出的 token，直接等待上游，不创建任务
+                    item = await iterator.__anext__()
+                else:
+                    if pending is None:
+                        pending = asyncio.ensure_future(iterator.__anext__())
+                    done, _ = await asyncio.wait([pending], timeout=timeout)
+                    if not done:
+                        yield _frame(batcher.flush())
+                        continue
+                    task, pending = pending, None
+                    item = task.result()
+            except StopAsyncIteration:
+                if len(batcher):
+                    yield _frame(batcher.flush())
+                return
+            except Exception:
+                if len(batcher):
+                    yield _frame(batcher.flush())
+                raise
+
+            event, data = item
+            if event == TOKEN_EVENT:
+                template = {k: v for k, v in data.items() if k != "delta"}
+                text = batcher.add(data.get("delta") or "")
+                if text:
+                    yield _frame(text)
+            else:
+                if len(batcher):
+                    yield _frame(batcher.flush())
+                yield event, data
+    finally:
+        if pending is not None:
+            pending.cancel()
+        logger.debug(f"[sse] 合并 {batcher.tokens} 个 token 为 {batcher.frames} 帧")
+
+
+def merge_token_backlog(events: List[Event]) -> List[Event]:
+    """
+    合并积压事件中连续的 chunk，其余事件原样保留
+    合并帧使用最后一个 chunk 的 id（断线重连时从它之后继续），其余字段沿用第一个 chunk
+    """
+    merged: List[Event] = []
+    run: List[Event] = []
+
+    def _flush_run():
+        if len(run) == 1:
+            merged.append(run[0])
+        elif run:
+            delta = "".join(data.get("delta") or "" for _, _, data in run)
+            merged.append((run[-1][0], TOKEN_EVENT, {**run[0][2], "delta": delta}))
+        run.clear()
+
+    for item in events:
+        if item[1] == TOKEN_EVENT:
+            run.append(item)
+        else:
+            _flush_run()
+            merged.append(item)
+    _flush_run()
+    return merged
+
+
+async def subscribe_with_backpressure(
+    log: EventLog, last_id: int = 0, queue_size: int = 64
+) -> AsyncIterator[Event]:
+    """
+    订阅事件日志，下游（SSE 写出）按客户端速度拉取
+    - 订阅者落后的事件数不超过 queue_size 时逐个输出
+    - 超过时把积压中连续的 chunk 合并后输出，背压越大合并的帧越大，写出的帧数有上限
+    """
+    async for batch in log.subscribe_batches(last_id):
+        if queue_size > 0 and len(batch) > queue_size:
+            batch = merge_token_backlog(batch)
+        for item in batch:
+            yield item
+
+
+def create_token_batcher(conf: Optional[Dict[str, Any]] = None) -> TokenBatcher:
+    """根据配置创建 token 合并器"""
+    conf = conf or {}
+    return TokenBatcher(
+        max_bytes=conf.get("token_flush_bytes", 256),
+        max_latency=conf.get("token_flush_ms", 30) / 1000,
+    )
+
+
+def get_sse_conf() -> Dict[str, Any]:
+    """读取 config.yaml 中的 sse 配置"""
+    return load_yaml_config(_get_conf_path()).get("sse", {}) or {}
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+from aiohttp import web
+
+from src.tools.http_pool import HttpPool
+from src.tools.search_cache import SearchCache
+
+
+def _page(url, score):
+    return {"title": url, "url": url, "content": f"content of {url}", "score": score}
+
+
+# 两个查询的结果有一个重复页面与一张重复图片
+_RESPONSES = {
+    "q1": {
+        "results": [_page("https://a.com", 0.9), _page("https://shared.com", 0.8)],
+        "images": [{"url": "https://img.com/1.png", "description": "图1"}],
+    },
+    "q2": {
+        "results": [_page("https://shared.com", 0.7), _page("https://b.com", 0.95)],
+        "images": [{"url": "https://img.com/1.png", "description": "图1"}],
+    },
+}
+
+
+async def _start_mock_tavily(delay: float = 0.05):
+    """本地模拟 Tavily 服务，记录同时处理中的请求数"""
+    state = {"active": 0, "peak": 0, "queries": []}
+
+    async def search(request):
+        body = await request.json()
+        state["queries"].append(body["query"])
+        if body["query"] not in _RESPONSES:
+            return web.Response(status=500, text="boom")
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(delay)
+        state["active"] -= 1
+        return web.json_response(dict(_RESPONSES[body["query"]], query=body["query"]))
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", state
+
+
+class TestBatchSearch(unittest.TestCase):
+    """测试批量搜索工具"""
+
+    def _run_tool(self, queries, max_queries=5):
+        from src.tools import http_pool, search_cache
+        from src.tools.search_with_image import BatchTavilySearchWithImages
+
+        async def main():
+            runner, url, state = await _start_mock_tavily()
+            conf = {"tavily_api_key": "test-key", "tavily_api_url": url}
+            try:
+                with patch("src.tools.search.get_search_conf", return_value=conf), \
+                        patch("src.tools.search_with_image.get_search_conf", return_value=conf), \
+                        patch.object(http_pool, "_default_pool", HttpPool()), \
+                        patch.object(search_cache, "_default_cache", SearchCache()), \
+                        patch.object(search_cache, "_default_loaded", True):
+                    tool = BatchTavilySearchWithImages(max_queries=max_queries)
+                    output = await tool.ainvoke(
+                        {"args": {"queries": queries}, "type": "tool_call", "id": "1", "name": tool.name}
+                    )
+                    await http_pool.close_http_pool()
+            finally:
+                await runner.cleanup()
+            return output, state
+
+        return asyncio.run(main())
+
+    def test_fan_out_and_merge(self):
+        """测试多个查询并发请求，结果合并去重并按得分排序"""
+        output, state = self._run_tool(["q1", "q2", "q1 "])
+        self.assertEqual(sorted(state["queries"]), ["q1", "q2"])
+        self.assertEqual(state["peak"], 2)
+
+        results = output.artifact["results"]
+        self.assertEqual(len(results), 4)
+        cleaned = json.loads(output.content)
+        pages = [r["url"] for r in cleaned if r["type"] == "page"]
+        images = [r["image_url"] for r in cleaned if r["type"] == "image"]
+        self.assertEqual(pages, ["https://b.com", "https://a.com", "https://shared.com"])
+        self.assertEqual(images, ["https://img.com/1.png"])
+
+    def test_partial_failure(self):
+        """测试部分查询失败时保留其余结果"""
+        output, _ = self._run_tool(["q1", "broken"])
+        self.assertEqual(output.artifact["failed"], ["broken"])
+        self.assertEqual(len(output.artifact["results"]), 2)
+
+    def test_max_queries(self):
+        """测试超过上限的查询被忽略"""
+        output, state = self._run_tool(["q1", "q2"], max_queries=1)
+        self.assertEqual(state["queries"], ["q1"])
+        self.assertEqual(output.artifact["queries"], ["q1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from src.utils.bm25 import BM25Index, tokenize
+
+
+class TestBM25(unittest.TestCase):
+    """测试本地词法检索"""
+
+    def test_tokenize(self):
+        """测试英文按单词、中文按相邻两字切分"""
+        self.assertEqual(tokenize("Deep Research v2"), ["deep", "research", "v2"])
+        self.assertEqual(tokenize("大模型"), ["大模", "模型"])
+        self.assertEqual(sorted(tokenize("研 LLM 大模型")), sorted(["研", "llm", "大模", "模型"]))
+
+    def test_scores(self):
+        """测试相关文档得分更高，未出现的查询词不影响得分"""
+        docs = ["量子计算的最新进展", "区块链与加密货币", "量子纠错码的进展与挑战"]
+        index = BM25Index([tokenize(d) for d in docs])
+        scores = index.scores(tokenize("量子计算进展 unknown"))
+        self.assertEqual(max(range(3), key=lambda i: scores[i]), 0)
+        self.assertEqual(scores[1], 0)
+        self.assertGreater(scores[2], 0)
+        self.assertEqual(BM25Index([]).scores(["x"]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from typing import List
+from unittest.mock import patch
+
+from typing_extensions import Annotated, TypedDict
+import operator
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Command, interrupt
+
+from src.graph.checkpoint import (
+    LocalRedis,
+    MemoryCheckpointSaver,
+    RedisCheckpointSaver,
+    SQLiteCheckpointSaver,
+    create_checkpointer,
+)
+
+
+class _State(TypedDict):
+    items: Annotated[List[str], operator.add]
+
+
+def _build_graph(checkpointer):
+    """构建与研究流程相同形态的小图：计划 -> 人工确认(中断) -> 执行"""
+    async def plan(state: _State):
+        return {"items": ["plan"]}
+
+    def feedback(state: _State):
+        answer = interrupt("confirm?")
+        return {"items": [f"feedback:{answer['user_confirm']}"]}
+
+    async def research(state: _State):
+        return {"items": ["research"]}
+
+    builder = StateGraph(_State)
+    builder.add_node("plan", plan)
+    builder.add_node("feedback", feedback)
+    builder.add_node("research", research)
+    builder.add_edge(START, "plan")
+    builder.add_edge("plan", "feedback")
+    builder.add_edge("feedback", "research")
+    builder.add_edge("research", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+async def _run_until_interrupt(graph, thread_id):
+    config = {"configurable": {"thread_id": thread_id}}
+    async for _ in graph.astream({"items": []}, config):
+        pass
+    return config
+
+
+async def _resume(graph, config):
+    async for _ in graph.astream(Command(resume={"user_confirm": "confirm"}), config):
+        pass
+    return (await graph.aget_state(config)).values
+
+
+class _SaverContract:
+    """各检查点后端共同的行为测试"""
+
+    def make_saver(self, **kwargs):
+        raise NotImplementedError
+
+    def test_resume_from_another_instance(self):
+        """测试中断后由另一个实例（模拟另一个worker）恢复执行"""
+        config = asyncio.run(_run_until_interrupt(_build_graph(self.make_saver()), "t1"))
+        values = asyncio.run(_resume(_build_graph(self.make_saver()), config))
+        self.assertEqual(values["items"], ["plan", "feedback:confirm", "research"])
+
+    def test_keep_latest_prunes_history(self):
+        """测试每个线程只保留最新的N个检查点"""
+        saver = self.make_saver(keep_latest=2)
+        graph = _build_graph(saver)
+        config = asyncio.run(_run_until_interrupt(graph, "t1"))
+        values = asyncio.run(_resume(graph, config))
+        self.assertEqual(values["items"], ["plan", "feedback:confirm", "research"])
+        self.assertEqual(len(list(saver.list({"configurable": {"thread_id": "t1"}}))), 2)
+
+    def test_delete_thread(self):
+        """测试删除线程的全部检查点"""
+        saver = self.make_saver()
+        asyncio.run(_run_until_interrupt(_build_graph(saver), "t1"))
+        saver.delete_thread("t1")
+        self.assertIsNone(saver.get_tuple({"configurable": {"thread_id": "t1"}}))
+
+
+class TestSQLiteCheckpointSaver(_SaverContract, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_saver(self, **kwargs):
+        return SQLiteCheckpointSaver(os.path.join(self.tmp.name, "checkpoints.db"), **kwargs)
+
+    def test_ttl_eviction(self):
+        """测试超过TTL未更新的线程被清理"""
+        saver = self.make_saver(ttl_seconds=0.05)
+        asyncio.run(_run_until_interrupt(_build_graph(saver), "old"))
+        time.sleep(0.1)
+        self.assertEqual(saver.evict_expired(), 1)
+        self.assertIsNone(saver.get_tuple({"configurable": {"thread_id": "old"}}))
+
+
+class TestRedisCheckpointSaver(_SaverContract, unittest.TestCase):
+    def setUp(self):
+        # 同一个 LocalRedis 客户端在不同实例间共享，模拟连接同一个 Redis
+        self.client = LocalRedis()
+
+    def make_saver(self, **kwargs):
+        return RedisCheckpointSaver(client=self.client, **kwargs)
+
+    def test_ttl_expiry(self):
+        """测试线程的键随TTL过期"""
+        saver = self.make_saver(ttl_seconds=1)
+        asyncio.run(_run_until_interrupt(_build_graph(saver), "old"))
+        self.assertIsNotNone(saver.get_tuple({"configurable": {"thread_id": "old"}}))
+        time.sleep(1.1)
+        self.assertIsNone(saver.get_tuple({"configurable": {"thread_id": "old"}}))
+
+    def test_purge_never_accessed_threads(self):
+        """测试过期后不再被访问的线程在定期清理时释放内存"""
+        saver = self.make_saver(ttl_seconds=60)
+        asyncio.run(_run_until_interrupt(_build_graph(saver), "old"))
+        asyncio.run(_run_until_interrupt(_build_graph(saver), "other"))
+        self.assertGreater(len(self.client._data), 0)
+        with patch("src.graph.checkpoint.time.time", return_value=time.time() + 61):
+            self.assertEqual(saver.evict_expired(), 2)
+        self.assertEqual(self.client._data, {})
+        self.assertEqual(self.client._expire_at, {})
+
+    def test_periodic_sweep_on_put(self):
+        """测试写入新检查点时按 evict_interval 定期清理过期线程"""
+        saver = self.make_saver(ttl_seconds=60, evict_interval=0)
+        asyncio.run(_run_until_interrupt(_build_graph(saver), "old"))
+        with patch("src.graph.checkpoint.time.time", return_value=time.time() + 61):
+            asyncio.run(_run_until_interrupt(_build_graph(saver), "new"))
+            self.assertFalse(any(":old" in key for key in self.client._data))
+            self.assertIsNotNone(saver.get_tuple({"configurable": {"thread_id": "new"}}))
+
+
+class TestMemoryCheckpointSaver(unittest.TestCase):
+    def test_keep_latest_and_ttl(self):
+        """测试内存后端同样按 keep_latest 裁剪、按 TTL 清理"""
+        saver = MemoryCheckpointSaver(keep_latest=2, ttl_seconds=60)
+        graph = _build_graph(saver)
+        config = asyncio.run(_run_until_interrupt(graph, "t1"))
+        values = asyncio.run(_resume(graph, config))
+        self.assertEqual(values["items"], ["plan", "feedback:confirm", "research"])
+        self.assertEqual(len(list(saver.list({"configurable": {"thread_id": "t1"}}))), 2)
+        with patch("src.graph.checkpoint.time.time", return_value=time.time() + 61):
+            self.assertEqual(saver.evict_expired(), 1)
+        self.assertIsNone(saver.get_tuple({"configurable": {"thread_id": "t1"}}))
+
+
+class TestCreateCheckpointer(unittest.TestCase):
+    def test_backends(self):
+        """测试按配置创建检查点存储"""
+        self.assertIsInstance(create_checkpointer({"backend": "redis"}), RedisCheckpointSaver)
+        self.assertIsInstance(create_checkpointer({"backend": "memory", "keep_latest": 5}), MemoryCheckpointSaver)
+        self.assertIsInstance(create_checkpointer({"backend": "memory"}), InMemorySaver)
+        with self.assertRaises(ValueError):
+            create_checkpointer({"backend": "postgres"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 import asyncio
-from unittest.mock import Mock, AsyncMock
-from src.utils.content import ContextManager
+from unittest.mock import Mock, AsyncMock, patch
+from src.utils.content import BlockSummaries, ContextManager
 from src.llms.llm import get_llm
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 
@@ -136,6 +136,257 @@ class TestContextManager(unittest.TestCase):
         compressed_tokens = self.context_manager.count_tokens(compressed)
         self.assertLess(compressed_tokens, original_tokens)
     
+    def _long_messages(self, tag=""):
+        long_text = f"这是一个很长的消息内容{tag}" * 100
+        return [
+            SystemMessage(content="短消息"),
+            HumanMessage(content="短消息"),
+            AIMessage(content=long_text),
+            HumanMessage(content=long_text),
+            AIMessage(content=long_text),
+        ]
+
+    def test_acompress_messages_in_running_loop(self):
+        """测试在事件循环中异步压缩，结果与同步版本一致"""
+        self.mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content="这是对话的语义总结"))
+        messages = self._long_messages()
+
+        async def main():
+            # 事件循环中不能调用同步版本
+            with self.assertRaises(RuntimeError):
+                self.context_manager.compress_messages(messages)
+            return await self.context_manager.acompress_messages(messages)
+
+        compressed = asyncio.run(main())
+        expected = self.context_manager.compress_messages(messages)
+        self.assertEqual([m.content for m in compressed], [m.content for m in expected])
+        self.assertLess(self.context_manager.count_tokens(compressed), self.context_manager.count_tokens(messages))
+
+    def test_acompress_messages_overlaps(self):
+        """测试多个步骤的压缩在同一事件循环中并发执行，不阻塞其他任务"""
+        async def slow_summary(_):
+            await asyncio.sleep(0.2)
+            return AIMessage(content="总结")
+
+        self.mock_llm.ainvoke = AsyncMock(side_effect=slow_summary)
+        # 两次压缩共 6 个块，并发上限足够时所有块同时总结
+        manager = ContextManager(self.mock_llm, max_tokens=1000, summary_concurrency=8)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.02)
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await asyncio.gather(
+                manager.acompress_messages(self._long_messages("a")),
+                manager.acompress_messages(self._long_messages("b")),
+                ticker(),
+            )
+            return loop.time() - start
+
+        elapsed = asyncio.run(main())
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(len(ticks), 5)
+
+    def test_summary_concurrency_limit(self):
+        """测试对话块总结的并发上限"""
+        running = []
+        peak = []
+
+        async def track(_):
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+            return AIMessage(content="总结")
+
+        self.mock_llm.ainvoke = AsyncMock(side_effect=track)
+        manager = ContextManager(self.mock_llm, max_tokens=1000, summary_concurrency=2)
+        blocks = [[HumanMessage(content=f"问题{i}"), AIMessage(content=f"回答{i}")] for i in range(6)]
+
+        async def main():
+            return await asyncio.gather(*[manager._async_summarize_dialogue_block(b) for b in blocks])
+
+        asyncio.run(main())
+        self.assertEqual(self.mock_llm.ainvoke.await_count, 6)
+        self.assertEqual(max(peak), 2)
+
+    def test_summary_retry_with_backoff(self):
+        """测试总结失败后退避重试，重试用尽才退回占位符"""
+        self.mock_llm.ainvoke = AsyncMock(side_effect=[RuntimeError("429"), AIMessage(content="总结")])
+        manager = ContextManager(self.mock_llm, max_tokens=1000, summary_retries=1, summary_backoff=0.001)
+        block = [HumanMessage(content="问题"), AIMessage(content="回答")]
+        result = asyncio.run(manager._async_summarize_dialogue_block(block))
+        self.assertEqual(result.content, "总结")
+
+        self.mock_llm.ainvoke = AsyncMock(side_effect=RuntimeError("429"))
+        result = asyncio.run(manager._async_summarize_dialogue_block(block))
+        self.assertTrue(result.content.startswith("[压缩失败]"))
+        self.assertEqual(self.mock_llm.ainvoke.await_count, 2)
+
+    def test_batched_block_summaries(self):
+        """测试多个小对话块合并成一次结构化总结请求"""
+        struct_llm = Mock()
+        struct_llm.ainvoke = AsyncMock(side_effect=lambda _: BlockSummaries(summaries=["总结1", "总结2", "总结3"]))
+        self.mock_llm.with_structured_output = Mock(return_value=struct_llm)
+        manager = ContextManager(self.mock_llm, max_tokens=1000, summary_batch_tokens=1000)
+        blocks = [[HumanMessage(content=f"问题{i}"), AIMessage(content=f"回答{i}")] for i in range(3)]
+
+        results = asyncio.run(manager._summarize_blocks_batched(blocks))
+        self.assertEqual([m.content for m in results], ["总结1", "总结2", "总结3"])
+        self.assertEqual(struct_llm.ainvoke.await_count, 1)
+        self.mock_llm.ainvoke.assert_not_called()
+
+        # 返回的总结数量不对时退回逐块总结
+        struct_llm.ainvoke = AsyncMock(return_value=BlockSummaries(summaries=["只有一条"]))
+        self.mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content="单块总结"))
+        results = asyncio.run(manager._summarize_blocks_batched(blocks))
+        self.assertEqual([m.content for m in results], ["单块总结"] * 3)
+        self.assertEqual(self.mock_llm.ainvoke.await_count, 3)
+
+    def _incremental_manager(self):
+        self.mock_llm.ainvoke = AsyncMock(return_value=AIMessage(content="总结"))
+        return ContextManager(self.mock_llm, max_tokens=1000, compression_mode="incremental", recent_tokens=100)
+
+    def _dialogue(self, start, count):
+        long_text = "这是一个很长的消息内容" * 60
+        return [
+            (HumanMessage if i % 2 == 0 else AIMessage)(content=f"{i}:{long_text}")
+            for i in range(start, start + count)
+        ]
+
+    def test_incremental_compression_only_new_messages(self):
+        """测试增量模式只总结上次压缩之后新增的消息"""
+        manager = self._incremental_manager()
+        head = [SystemMessage(content="系统提示"), HumanMessage(content="研究问题")]
+        history = head + self._dialogue(0, 4)
+        step = [HumanMessage(content="当前步骤")]
+
+        compressed = asyncio.run(manager.acompress_messages(history + step))
+        first_calls = self.mock_llm.ainvoke.await_count
+        # 每个 Human/AI 对话回合是一个块
+        self.assertEqual(first_calls, 2)
+        # 头消息 + 滚动摘要 + 原样保留的最近消息
+        self.assertEqual(compressed[:2], head)
+        self.assertTrue(compressed[2].additional_kwargs["rolling_summary"])
+        self.assertEqual(compressed[-1].content, "当前步骤")
+        self.assertEqual(manager.complete_summary_idx, 4)
+
+        # 相同的历史、不同的步骤提示：不需要任何LLM调用
+        asyncio.run(manager.acompress_messages(history + [HumanMessage(content="另一个步骤")]))
+        self.assertEqual(self.mock_llm.ainvoke.await_count, first_calls)
+
+        # 追加两条消息：只总结新增的部分
+        history += self._dialogue(4, 2)
+        compressed = asyncio.run(manager.acompress_messages(history + step))
+        self.assertEqual(self.mock_llm.ainvoke.await_count, first_calls + 1)
+        self.assertEqual(compressed[2].content, "\n\n".join(["总结"] * 3))
+        self.assertEqual(manager.compress_count, 3)
+
+    def test_incremental_compression_resets_on_rewrite(self):
+        """测试历史被改写时丢弃滚动摘要重新总结"""
+        manager = self._incremental_manager()
+        head = [SystemMessage(content="系统提示"), HumanMessage(content="研究问题")]
+        asyncio.run(manager.acompress_messages(head + self._dialogue(0, 4) + [HumanMessage(content="步骤")]))
+        calls = self.mock_llm.ainvoke.await_count
+
+        rewritten = head + self._dialogue(10, 4) + [HumanMessage(content="步骤")]
+        asyncio.run(manager.acompress_messages(rewritten))
+        self.assertEqual(self.mock_llm.ainvoke.await_count, calls + 2)
+        self.assertEqual(manager.compress_count, 1)
+
+    def test_incremental_compression_interleaved_histories(self):
+        """测试并行步骤共用同一个实例时，各自的滚动摘要检查点互不覆盖"""
+        manager = self._incremental_manager()
+        head = [SystemMessage(content="系统提示"), HumanMessage(content="研究问题")]
+        step = [HumanMessage(content="步骤")]
+        first = head + self._dialogue(0, 4)
+        second = head + self._dialogue(10, 4)
+
+        async def main():
+            await asyncio.gather(manager.acompress_messages(first + step), manager.acompress_messages(second + step))
+
+        asyncio.run(main())
+        calls = self.mock_llm.ainvoke.await_count
+        self.assertEqual(calls, 4)
+
+        # 两段历史各自追加消息：都只总结新增的部分
+        asyncio.run(manager.acompress_messages(first + self._dialogue(4, 2) + step))
+        asyncio.run(manager.acompress_messages(second + self._dialogue(14, 2) + step))
+        self.assertEqual(self.mock_llm.ainvoke.await_count, calls + 2)
+        self.assertEqual(manager.compress_count, 2)
+
+    def test_incremental_compression_failure_keeps_checkpoint(self):
+        """测试块总结失败时不推进滚动摘要检查点"""
+        manager = self._incremental_manager()
+        manager.summary_retries = 0
+        self.mock_llm.ainvoke = AsyncMock(side_effect=RuntimeError("429"))
+        head = [SystemMessage(content="系统提示"), HumanMessage(content="研究问题")]
+        asyncio.run(manager.acompress_messages(head + self._dialogue(0, 4) + [HumanMessage(content="步骤")]))
+        self.assertEqual(len(manager._rolling), 0)
+        self.assertEqual(manager.complete_summary_idx, 0)
+
+    def test_extractive_compression(self):
+        """测试抽取式压缩按相关度挑选消息，不调用LLM，工具调用成对保留"""
+        manager = ContextManager(self.mock_llm, max_tokens=300, compression_mode="extractive")
+        filler = "无关的闲聊内容" * 20
+        tool_call = {"id": "call_1", "name": "search", "args": {"query": "量子计算 进展"}}
+        messages = [
+            SystemMessage(content="系统提示"),
+            HumanMessage(content="研究问题"),
+            HumanMessage(content=filler + "1"),
+            AIMessage(content="", tool_calls=[tool_call]),
+            ToolMessage(content="量子计算 最新进展：纠错码突破" * 3, tool_call_id="call_1"),
+            AIMessage(content=filler + "2"),
+            HumanMessage(content=filler + "3"),
+            SystemMessage(content="研究步骤提示"),
+            HumanMessage(content="总结量子计算的最新进展"),
+        ]
+
+        compressed = manager.compress_messages(messages)
+        self.mock_llm.ainvoke.assert_not_called()
+        self.assertLessEqual(manager.count_tokens(compressed), 300)
+        self.assertEqual(compressed[:2], messages[:2])
+        self.assertEqual(compressed[-2:], messages[-2:])
+        # 相关的工具调用及其结果成对保留，且保持原有顺序
+        self.assertIn(messages[3], compressed)
+        self.assertEqual(compressed.index(messages[4]), compressed.index(messages[3]) + 1)
+        self.assertLess(len(compressed), len(messages))
+
+    def test_extractive_compression_explicit_query(self):
+        """测试显式传入查询"""
+        manager = ContextManager(self.mock_llm, max_tokens=60, compression_mode="extractive")
+        messages = [
+            HumanMessage(content="问题"),
+            AIMessage(content="回答"),
+            AIMessage(content="关于深度学习的内容" * 3),
+            AIMessage(content="关于区块链的内容" * 3),
+            HumanMessage(content="下一步"),
+        ]
+        compressed = asyncio.run(manager.acompress_messages(messages, query="区块链"))
+        self.assertIn(messages[3], compressed)
+        self.assertNotIn(messages[2], compressed)
+
+    def test_extractive_compression_oversized_pinned(self):
+        """测试固定保留的系统提示与最后一条消息超出预算时被截断，结果不超过 max_tokens"""
+        manager = ContextManager(self.mock_llm, max_tokens=120, compression_mode="extractive")
+        messages = [
+            SystemMessage(content="系统提示"),
+            HumanMessage(content="研究问题"),
+            AIMessage(content="回答"),
+            SystemMessage(content="很长的研究步骤提示" * 30),
+            HumanMessage(content="当前步骤的任务描述" * 20),
+        ]
+        compressed = manager.compress_messages(messages)
+        self.assertLessEqual(manager.count_tokens(compressed), 120)
+        self.assertEqual(compressed[:2], messages[:2])
+        self.assertIsInstance(compressed[-1], HumanMessage)
+        self.assertTrue(messages[-1].content.startswith(compressed[-1].content))
+
     def test_compress_messages_preserve_prestore_messages(self):
         """测试保留预设消息的功能"""
         # 设置较小的max_tokens但保留2条消息
@@ -207,6 +458,46 @@ class TestContextManager(unittest.TestCase):
         self.assertEqual(len(truncated.content), 5)
         self.assertIsInstance(truncated, HumanMessage)
     
+    def test_truncate_message_content_token_budget(self):
+        """测试 ASCII 文本按 token 预算截断，且不深拷贝其他字段"""
+        tool_calls = {"tool_calls": [{"id": "1", "function": {"name": "search", "arguments": "x" * 1000}}]}
+        original = AIMessage(content="abcd" * 100, additional_kwargs=tool_calls)
+        truncated = self.context_manager._truncate_message_content(original, 10)
+
+        self.assertEqual(self.context_manager._count_text_tokens(truncated.content), 10)
+        self.assertEqual(truncated.content, original.content[:len(truncated.content)])
+        self.assertEqual(len(truncated.content), 43)
+        self.assertIs(truncated.additional_kwargs, original.additional_kwargs)
+        self.assertEqual(len(original.content), 400)
+
+    def test_truncate_message_content_head_and_tail(self):
+        """测试同时保留开头与结尾"""
+        from src.utils.content import TRUNCATION_MARKER
+        manager = ContextManager(self.mock_llm, max_tokens=1000, truncate_tail_ratio=0.5)
+        content = "开头" + "中间内容" * 50 + "结尾"
+        truncated = manager._truncate_message_content(HumanMessage(content=content), 40)
+
+        self.assertLessEqual(manager._count_text_tokens(truncated.content), 40)
+        head, tail = truncated.content.split(TRUNCATION_MARKER)
+        self.assertTrue(content.startswith(head) and head.startswith("开头"))
+        self.assertTrue(content.endswith(tail) and tail.endswith("结尾"))
+        self.assertEqual(len(tail), 20)
+
+    def test_truncate_multimodal_content(self):
+        """测试多模态内容按元素的 token 数截断，放不下的文本元素截取前缀"""
+        image = {"type": "image_url", "image_url": {"url": "https://a.com/1.png"}}
+        content = [{"type": "text", "text": "第一段文字"}, image, {"type": "text", "text": "第二段很长的文字" * 10}]
+        message = HumanMessage(content=content)
+        image_tokens = self.context_manager._count_part_tokens(image)
+        budget = 5 + image_tokens + 4
+        truncated = self.context_manager._truncate_message_content(message, budget)
+
+        self.assertEqual(truncated.content, content[:2] + [{"type": "text", "text": "第二段很"}])
+        self.assertEqual(self.context_manager._count_content_tokens(truncated.content), budget)
+        # 放不下的非文本元素及之后的元素丢弃
+        self.assertEqual(self.context_manager._truncate_message_content(message, 6).content, content[:1])
+        self.assertGreater(self.context_manager._count_one_message(message), 5 + image_tokens + 80)
+
     def test_group_dialogue_blocks(self):
         """测试对话块分组功能"""
         messages = [
@@ -250,6 +541,45 @@ class TestContextManager(unittest.TestCase):
         self.assertEqual(result.content, "这是对话的总结")
         self.mock_llm.ainvoke.assert_called_once()
     
+    def test_count_text_tokens_matches_char_loop(self):
+        """测试按字节统计的结果与逐字符统计一致"""
+        def reference(text):
+            english = sum(1 for ch in text if ord(ch) < 128)
+            return english // 4 + (len(text) - english)
+
+        samples = [
+            "", "abc", "hello world, this is ascii", "你好，这是一个测试消息",
+            "混合 mixed 文本 text 🚀 emoji", "é" * 7 + "abcd", "\n\t" * 9 + "中",
+        ]
+        for text in samples:
+            self.assertEqual(self.context_manager._count_text_tokens(text), reference(text), text)
+
+    def test_message_token_cache(self):
+        """测试重复统计同一段历史时只计算新增消息"""
+        messages = [HumanMessage(content=f"消息{i}", id=f"m{i}") for i in range(5)]
+        first = self.context_manager.count_tokens(messages)
+
+        with patch.object(self.context_manager, "_count_one_message_uncached",
+                          wraps=self.context_manager._count_one_message_uncached) as spy:
+            messages.append(AIMessage(content="新的回复", id="m5"))
+            second = self.context_manager.count_tokens(messages)
+            self.assertEqual(spy.call_count, 1)
+        self.assertEqual(second, first + self.context_manager._count_one_message_uncached(messages[-1]))
+
+        # 内容变化（如被截断）时不会命中旧的缓存
+        changed = HumanMessage(content="消息0被修改了", id="m0")
+        self.assertEqual(
+            self.context_manager._count_one_message(changed),
+            self.context_manager._count_one_message_uncached(changed),
+        )
+
+    def test_message_token_cache_bounded(self):
+        """测试缓存按 LRU 淘汰"""
+        manager = ContextManager(self.mock_llm, max_tokens=100, token_cache_size=3)
+        for i in range(10):
+            manager._count_one_message(HumanMessage(content=f"消息{i}", id=f"m{i}"))
+        self.assertEqual(len(manager._token_cache), 3)
+
     def test_message_weight_calculation(self):
         """测试消息权重计算"""
         human_msg = HumanMessage(content="test")
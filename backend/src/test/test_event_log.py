@@ -0,0 +1,71 @@
+import asyncio
+import time
+import unittest
+
+from src.server.event_log import GAP_EVENT, EventLog, EventLogRegistry
+
+
+async def _drain(log: EventLog, last_id: int = 0):
+    return [item async for item in log.subscribe(last_id)]
+
+
+class TestEventLog(unittest.TestCase):
+    """测试研究事件日志"""
+
+    def test_replay_after_last_id(self):
+        """测试按 Last-Event-ID 只补发之后的事件"""
+        log = EventLog(maxlen=10)
+        for i in range(5):
+            log.append("chunk", {"i": i})
+        log.close()
+        events = asyncio.run(_drain(log, last_id=3))
+        self.assertEqual([(eid, data["i"]) for eid, _, data in events], [(4, 3), (5, 4)])
+
+    def test_gap_when_evicted(self):
+        """测试请求的事件已被环形缓冲区淘汰时先推送缺口事件"""
+        log = EventLog(maxlen=3)
+        for i in range(6):
+            log.append("chunk", {"i": i})
+        log.close()
+        events = asyncio.run(_drain(log, last_id=1))
+        self.assertEqual(events[0], (0, GAP_EVENT, {"last_event_id": 1, "first_available_id": 4}))
+        self.assertEqual([eid for eid, _, _ in events[1:]], [4, 5, 6])
+
+    def test_live_subscribe(self):
+        """测试补发完成后继续接收实时事件，日志关闭后结束"""
+        async def main():
+            log = EventLog()
+            log.append("started", {})
+            task = asyncio.create_task(_drain(log))
+            await asyncio.sleep(0.01)
+            log.append("plan", {})
+            await asyncio.sleep(0.01)
+            log.append("done", {})
+            log.close()
+            return await asyncio.wait_for(task, timeout=1)
+
+        events = asyncio.run(main())
+        self.assertEqual([(eid, name) for eid, name, _ in events], [(1, "started"), (2, "plan"), (3, "done")])
+
+    def test_ids_continue_across_runs(self):
+        """测试同一计划的多次运行共用递增的事件 id"""
+        registry = EventLogRegistry()
+        log = registry.open("p1")
+        log.append("done", {})
+        log.close()
+        self.assertIs(registry.open("p1"), log)
+        self.assertFalse(log.closed)
+        self.assertEqual(log.append("started", {}), 2)
+
+    def test_registry_retention(self):
+        """测试已关闭的日志超过保留时间后被清理，运行中的日志保留"""
+        registry = EventLogRegistry(retention_seconds=0.01)
+        registry.open("closed").close()
+        registry.open("running")
+        time.sleep(0.02)
+        self.assertIsNone(registry.get("closed"))
+        self.assertIsNotNone(registry.get("running"))
+
+
+if __name__ == "__main__":
+    unittest.main()
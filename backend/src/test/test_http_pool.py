@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from aiohttp import web
+
+from src.tools.http_pool import HttpPool
+
+
+async def _start_mock_tavily(delay: float = 0.0):
+    """本地模拟 Tavily 服务，记录每个请求来自哪个客户端连接"""
+    peers = []
+
+    async def search(request):
+        peers.append(request.transport.get_extra_info("peername"))
+        body = await request.json()
+        if delay:
+            await asyncio.sleep(delay)
+        return web.json_response({"query": body["query"], "results": [], "images": []})
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", peers
+
+
+class TestHttpPool(unittest.TestCase):
+    """测试搜索请求的共享连接池"""
+
+    def test_async_session_reuses_connections(self):
+        """测试多次请求复用同一个会话与 keep-alive 连接"""
+        async def main():
+            runner, url, peers = await _start_mock_tavily()
+            pool = HttpPool()
+            try:
+                for i in range(5):
+                    async with pool.session().post(f"{url}/search", json={"query": str(i)}) as resp:
+                        self.assertEqual((await resp.json())["query"], str(i))
+                session = pool.session()
+            finally:
+                await pool.close()
+                await runner.cleanup()
+            self.assertTrue(session.closed)
+            return peers
+
+        peers = asyncio.run(main())
+        self.assertEqual(len(peers), 5)
+        self.assertEqual(len(set(peers)), 1)
+
+    def test_session_per_event_loop(self):
+        """测试不同事件循环各自创建会话（同步脚本多次 asyncio.run）"""
+        pool = HttpPool()
+
+        async def get_session():
+            return pool.session()
+
+        first = asyncio.run(get_session())
+        second = asyncio.run(get_session())
+        self.assertIsNot(first, second)
+        asyncio.run(pool.close())
+
+    def test_stale_session_closed_when_loop_changes(self):
+        """测试事件循环变化时旧会话被关闭，而不是直接丢弃"""
+        async def request(url):
+            session = pool.session()
+            async with session.post(f"{url}/search", json={"query": "q"}) as resp:
+                await resp.json()
+            return session
+
+        async def get_session():
+            return pool.session()
+
+        server_loop = asyncio.new_event_loop()
+        runner, url, _ = server_loop.run_until_complete(_start_mock_tavily())
+        server_thread = threading.Thread(target=server_loop.run_forever, daemon=True)
+        server_thread.start()
+        pool = HttpPool()
+        try:
+            # 旧循环已停止（未关闭）：同步关闭连接器
+            stopped = asyncio.new_event_loop()
+            old = stopped.run_until_complete(request(url))
+            asyncio.run(get_session())
+            self.assertTrue(old.closed)
+            self.assertTrue(old.connector is None)
+            # 连接的关闭回调已排入旧循环，旧循环再运行一次即释放套接字
+            stopped.run_until_complete(asyncio.sleep(0))
+            stopped.close()
+
+            # 旧循环仍在其他线程中运行：交给旧循环关闭
+            other = asyncio.new_event_loop()
+            other_thread = threading.Thread(target=other.run_forever, daemon=True)
+            other_thread.start()
+            old = asyncio.run_coroutine_threadsafe(request(url), other).result(5)
+            asyncio.run(get_session())
+            for _ in range(100):
+                if old.closed:
+                    break
+                time.sleep(0.01)
+            self.assertTrue(old.closed)
+            other.call_soon_threadsafe(other.stop)
+            other_thread.join()
+            other.close()
+            asyncio.run(pool.close())
+        finally:
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), server_loop).result(5)
+            server_loop.call_soon_threadsafe(server_loop.stop)
+            server_thread.join()
+            server_loop.close()
+
+    def test_sync_session_shared(self):
+        """测试同步路径共享 requests 会话"""
+        pool = HttpPool()
+        self.assertIs(pool.sync_session(), pool.sync_session())
+        asyncio.run(pool.close())
+        self.assertIsNone(pool._sync_session)
+
+    def test_sync_session_created_once_across_threads(self):
+        """测试多个线程同时首次获取同步会话时只创建一个"""
+        pool = HttpPool()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sessions = list(executor.map(lambda _: pool.sync_session(), range(8)))
+        self.assertEqual(len({id(s) for s in sessions}), 1)
+        asyncio.run(pool.close())
+
+    def test_tavily_search_uses_pool(self):
+        """测试 TavilySearchAPI 通过共享连接池访问配置的地址"""
+        from src.tools import http_pool
+        from src.tools.search import TavilySearchAPI
+
+        async def main():
+            runner, url, peers = await _start_mock_tavily()
+            conf = {"tavily_api_key": "test-key", "tavily_api_url": url}
+            try:
+                with patch("src.tools.search.get_search_conf", return_value=conf), \
+                        patch.object(http_pool, "_default_pool", HttpPool()):
+                    api = TavilySearchAPI()
+                    results = [await api.async_raw_results(f"问题{i}") for i in range(3)]
+                    await http_pool.close_http_pool()
+            finally:
+                await runner.cleanup()
+            return results, peers
+
+        results, peers = asyncio.run(main())
+        self.assertEqual([r["query"] for r in results], ["问题0", "问题1", "问题2"])
+        self.assertEqual(len(set(peers)), 1)
+
+    def test_tavily_sync_search_uses_pool(self):
+        """测试同步搜索通过共享的 requests 会话访问，并使用连接池配置的超时"""
+        import requests
+
+        from src.tools import http_pool, search_cache
+        from src.tools.search import TavilySearchAPI
+
+        async def main():
+            fast, fast_url, peers = await _start_mock_tavily()
+            slow, slow_url, _ = await _start_mock_tavily(delay=1)
+            pool = HttpPool(timeout=0.2)
+            try:
+                with patch.object(http_pool, "_default_pool", pool), \
+                        patch.object(search_cache, "_default_cache", None), \
+                        patch.object(search_cache, "_default_loaded", True):
+                    conf = {"tavily_api_key": "test-key", "tavily_api_url": fast_url}
+                    with patch("src.tools.search.get_search_conf", return_value=conf):
+                        api = TavilySearchAPI()
+                        results = [await asyncio.to_thread(api.raw_results, f"问题{i}") for i in range(3)]
+                    conf = {"tavily_api_key": "test-key", "tavily_api_url": slow_url}
+                    with patch("src.tools.search.get_search_conf", return_value=conf):
+                        api = TavilySearchAPI()
+                        started_at = time.perf_counter()
+                        with self.assertRaises(requests.exceptions.Timeout):
+                            await asyncio.to_thread(api.raw_results, "慢查询")
+                        elapsed = time.perf_counter() - started_at
+                    await pool.close()
+            finally:
+                await fast.cleanup()
+                await slow.cleanup()
+            return results, peers, elapsed
+
+        results, peers, elapsed = asyncio.run(main())
+        self.assertEqual([r["query"] for r in results], ["问题0", "问题1", "问题2"])
+        self.assertEqual(len(set(peers)), 1)
+        self.assertLess(elapsed, 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
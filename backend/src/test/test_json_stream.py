@@ -0,0 +1,163 @@
+import asyncio
+import json
+import random
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+from aiohttp import web
+
+from src.tools.http_pool import HttpPool
+from src.tools.json_stream import TruncatingJSONFilter
+
+_LIMITS = {"content": 10, "raw_content": 20, "description": 5}
+_DOC = {
+    "query": "问题",
+    "results": [
+        {
+            "title": 'quote " and \\ backslash',
+            "url": "https://a.com",
+            "content": "中文内容" * 20 + "\n\té😀" * 5,
+            "raw_content": "x" * 1000,
+            "score": 0.9,
+            "nested": {"items": ["y" * 100], "content": None},
+        },
+        {"title": "short", "url": "https://b.com", "content": "short", "score": 0.5},
+    ],
+    "images": [{"url": "https://img.com/1.png", "description": "d" * 30}],
+    "response_time": 1.5,
+}
+
+
+def _filter_in_chunks(data: bytes, sizes):
+    stream_filter = TruncatingJSONFilter(_LIMITS)
+    parts, i = [], 0
+    for size in sizes:
+        parts.append(stream_filter.feed(data[i:i + size]))
+        i += size
+    parts.append(stream_filter.feed(data[i:]))
+    parts.append(stream_filter.close())
+    return json.loads("".join(parts)), stream_filter
+
+
+class TestTruncatingJSONFilter(unittest.TestCase):
+    """测试流式截断 JSON 过滤器"""
+
+    def _expected(self):
+        expected = json.loads(json.dumps(_DOC))
+        first = expected["results"][0]
+        first["content"] = first["content"][:10] + "..."
+        first["raw_content"] = first["raw_content"][:20] + "..."
+        expected["images"][0]["description"] = "ddddd..."
+        return expected
+
+    def test_truncates_configured_fields(self):
+        """测试只截断指定字段的字符串值，其余内容保持不变"""
+        data = json.dumps(_DOC, ensure_ascii=False).encode("utf-8")
+        result, stream_filter = _filter_in_chunks(data, [])
+        self.assertEqual(result, self._expected())
+        self.assertEqual(stream_filter.truncated, 3)
+        self.assertEqual(stream_filter.bytes_in, len(data))
+
+    def test_arbitrary_chunk_boundaries(self):
+        """测试任意分块（切在 UTF-8 多字节字符或转义序列中间）结果一致"""
+        rng = random.Random(0)
+        for ensure_ascii in (True, False):
+            data = json.dumps(_DOC, ensure_ascii=ensure_ascii).encode("utf-8")
+            for _ in range(50):
+                sizes = [rng.randint(1, 7) for _ in range(len(data) // 4)]
+                result, _ = _filter_in_chunks(data, sizes)
+                self.assertEqual(result, self._expected())
+
+    def test_surrogate_pair_not_split(self):
+        """测试截断不会拆开 \\uD83D\\uDE00 这样的 UTF-16 代理对（拆开后无法编码为 UTF-8）"""
+        raw = b'{"content": "ab\\ud83d\\ude00cd"}'
+        for limit, expected in [(2, "ab..."), (3, "ab\U0001f600..."), (4, "ab\U0001f600c...")]:
+            for size in range(1, len(raw)):
+                stream_filter = TruncatingJSONFilter({"content": limit})
+                parts = [stream_filter.feed(raw[i:i + size]) for i in range(0, len(raw), size)]
+                value = json.loads("".join(parts) + stream_filter.close())["content"]
+                self.assertEqual(value, expected)
+                value.encode("utf-8")
+
+        # 孤立的高位代理出现在响应体末尾附近时也能正常输出
+        stream_filter = TruncatingJSONFilter({"content": 10})
+        out = stream_filter.feed(b'{"content": "a\\ud83d"}') + stream_filter.close()
+        self.assertEqual(out, '{"content": "a\\ud83d"}')
+        self.assertEqual(stream_filter.truncated, 0)
+
+    def test_idempotent_with_processor(self):
+        """测试截断结果再经过 SearchResultProcessor 时不变"""
+        from src.tools.search_result_processor import SearchResultProcessor
+
+        page = {"type": "page", "url": "https://a.com", "content": "z" * 100, "raw_content": "w" * 100}
+        processor = SearchResultProcessor(min_score_threshold=0, max_content_length_per_page=10)
+        direct = processor.process_results([page])
+
+        stream_filter = TruncatingJSONFilter({"content": 10, "raw_content": 20})
+        filtered = json.loads(stream_filter.feed(json.dumps(page)) + stream_filter.close())
+        self.assertEqual(processor.process_results([filtered]), direct)
+
+    def test_tavily_response_memory_bounded(self):
+        """测试异步搜索流式截断大响应，峰值内存远小于网页全文"""
+        from src.tools import http_pool, search_cache
+        from src.tools.search import TavilySearchAPI
+
+        page_size = 2 * 1024 * 1024
+
+        async def search(request):
+            # 分块写出 5 个 2MB raw_content 的结果，服务端不在内存中拼接完整响应
+            response = web.StreamResponse(headers={"Content-Type": "application/json"})
+            await response.prepare(request)
+            await response.write(b'{"query": "q", "images": [], "results": [')
+            for i in range(5):
+                prefix = f'{{"title": "{i}", "url": "https://{i}.com", "score": 0.9, "content": "c", "raw_content": "'
+                await response.write(("," if i else "").encode() + prefix.encode())
+                for _ in range(page_size // 65536):
+                    await response.write(b"r" * 65536)
+                await response.write(b'"}')
+            await response.write(b"]}")
+            await response.write_eof()
+            return response
+
+        async def main():
+            app = web.Application()
+            app.router.add_post("/search", search)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            conf = {
+                "tavily_api_key": "test-key",
+                "tavily_api_url": f"http://127.0.0.1:{port}",
+                "max_content_length_per_page": 2000,
+            }
+            try:
+                with patch("src.tools.search.get_search_conf", return_value=conf), \
+                        patch.object(http_pool, "_default_pool", HttpPool()), \
+                        patch.object(search_cache, "_default_cache", None), \
+                        patch.object(search_cache, "_default_loaded", True):
+                    api = TavilySearchAPI()
+                    tracemalloc.start()
+                    try:
+                        result = await api.async_raw_results("q", 5, include_raw_content=True)
+                        peak = tracemalloc.get_traced_memory()[1]
+                    finally:
+                        tracemalloc.stop()
+                    await http_pool.close_http_pool()
+            finally:
+                await runner.cleanup()
+            return api, result, peak
+
+        api, result, peak = asyncio.run(main())
+        self.assertEqual(len(result["results"]), 5)
+        self.assertTrue(all(r["raw_content"] == "r" * 4000 + "..." for r in result["results"]))
+        metric = api.metrics[0]
+        self.assertGreater(metric["wire_bytes"], 5 * page_size)
+        self.assertLess(metric["payload_bytes"], 32 * 1024)
+        self.assertLess(peak, page_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from src.server.event_log import EventLogRegistry
+from src.server.run_manager import PRIORITY_INTERACTIVE, PRIORITY_RESEARCH, RunManager
+
+
+def _steps(name, n=2, delay=0.02, on_start=None):
+    """构造一个产出 n 个事件的运行"""
+    async def events():
+        if on_start:
+            on_start(name)
+        for i in range(n):
+            await asyncio.sleep(delay)
+            yield "step", {"name": name, "i": i}
+    return events
+
+
+async def _drain(log, last_id=0):
+    return [(event, data) async for _, event, data in log.subscribe(last_id)]
+
+
+class TestRunManager(unittest.TestCase):
+    """测试后台运行管理器"""
+
+    def test_concurrency_cap(self):
+        """测试同时执行的运行数不超过全局上限"""
+        async def main():
+            manager = RunManager(EventLogRegistry(), max_concurrent_runs=2)
+            peak = 0
+
+            def on_start(_):
+                nonlocal peak
+                peak = max(peak, manager.active)
+
+            logs = [manager.submit(f"p{i}", _steps(f"p{i}", on_start=on_start))[0] for i in range(5)]
+            await asyncio.gather(*[_drain(log) for log in logs])
+            return peak, manager.active
+
+        peak, active = asyncio.run(main())
+        self.assertEqual(peak, 2)
+        self.assertEqual(active, 0)
+
+    def test_priority_order(self):
+        """测试排队的运行按优先级执行，同优先级按提交顺序"""
+        async def main():
+            manager = RunManager(EventLogRegistry(), max_concurrent_runs=1)
+            order = []
+            manager.submit("running", _steps("running", on_start=order.append))
+            await asyncio.sleep(0)
+            manager.submit("low", _steps("low", on_start=order.append), priority=20)
+            manager.submit("high1", _steps("high1", on_start=order.append), priority=PRIORITY_RESEARCH)
+            manager.submit("high2", _steps("high2", on_start=order.append), priority=PRIORITY_RESEARCH)
+            await asyncio.gather(*[
+                _drain(manager.event_logs.get(p)) for p in ["running", "low", "high1", "high2"]
+            ])
+            return order
+
+        self.assertEqual(asyncio.run(main()), ["running", "high1", "high2", "low"])
+
+    def test_multiple_subscribers(self):
+        """测试多个客户端订阅同一个计划得到相同的事件，运行只执行一次"""
+        async def main():
+            manager = RunManager(EventLogRegistry())
+            started = []
+            log, after_id = manager.submit("p1", _steps("p1", on_start=started.append))
+            results = await asyncio.gather(_drain(log, after_id), _drain(log, after_id))
+            return results, started
+
+        (a, b), started = asyncio.run(main())
+        self.assertEqual(a, b)
+        self.assertEqual([event for event, _ in a], ["started", "step", "step"])
+        self.assertEqual(started, ["p1"])
+
+    def test_duplicate_submit(self):
+        """测试同一计划已有运行时拒绝重复提交"""
+        async def main():
+            manager = RunManager(EventLogRegistry())
+            log, _ = manager.submit("p1", _steps("p1"))
+            with self.assertRaises(RuntimeError):
+                manager.submit("p1", _steps("p1"))
+            await _drain(log)
+            self.assertFalse(manager.is_running("p1"))
+
+        asyncio.run(main())
+
+    def test_cancel_queued(self):
+        """测试取消排队中的运行不会占用槽位，后续运行照常执行"""
+        async def main():
+            manager = RunManager(EventLogRegistry(), max_concurrent_runs=1)
+            started = []
+            manager.submit("a", _steps("a", on_start=started.append))
+            manager.submit("b", _steps("b", on_start=started.append))
+            manager.submit("c", _steps("c", on_start=started.append))
+            await asyncio.sleep(0)
+            self.assertTrue(manager.cancel("b"))
+            events_b = await _drain(manager.event_logs.get("b"))
+            await _drain(manager.event_logs.get("c"))
+            return started, [event for event, _ in events_b], manager.active
+
+        started, events_b, active = asyncio.run(main())
+        self.assertEqual(started, ["a", "c"])
+        self.assertEqual(events_b, ["started", "queued", "cancelled"])
+        self.assertEqual(active, 0)
+
+    def test_slot_shared_with_runs(self):
+        """测试非流式端点使用的槽位与后台运行共享上限"""
+        async def main():
+            manager = RunManager(EventLogRegistry(), max_concurrent_runs=1)
+            order = []
+            async with manager.slot():
+                log, _ = manager.submit("p1", _steps("p1", on_start=order.append))
+                await asyncio.sleep(0.05)
+                order.append("slot_released")
+            await _drain(log)
+            return order
+
+        self.assertEqual(asyncio.run(main()), ["slot_released", "p1"])
+
+    def test_interactive_pool_not_blocked_by_research(self):
+        """测试研究池占满时，交互式运行使用单独的池，不需要排队"""
+        async def main():
+            manager = RunManager(EventLogRegistry(), max_concurrent_runs=1, max_interactive_runs=2)
+            order = []
+            async with manager.slot(PRIORITY_RESEARCH):
+                research_log, _ = manager.submit("research", _steps("research", on_start=order.append))
+                log, _ = manager.submit(
+                    "start", _steps("start", on_start=order.append), priority=PRIORITY_INTERACTIVE
+                )
+                events = [event for event, _ in await _drain(log)]
+                order.append("slot_released")
+            await _drain(research_log)
+            return order, events
+
+        order, events = asyncio.run(main())
+        self.assertEqual(order, ["start", "slot_released", "research"])
+        self.assertNotIn("queued", events)
+
+    def test_failure_hook(self):
+        """测试运行出错或被取消时调用 on_failure 写入终止状态，正常结束时不调用"""
+        async def failing():
+            yield "step", {"i": 0}
+            raise RuntimeError("boom")
+
+        async def main():
+            manager = RunManager(EventLogRegistry(), max_concurrent_runs=1)
+            failures = []
+            logs = {
+                "ok": manager.submit("ok", _steps("ok"), on_failure=lambda *a: failures.append(("ok", *a)))[0],
+                "bad": manager.submit("bad", failing, on_failure=lambda *a: failures.append(("bad", *a)))[0],
+                "cancel": manager.submit(
+                    "cancel", _steps("cancel"), on_failure=lambda *a: failures.append(("cancel", *a))
+                )[0],
+            }
+            await asyncio.sleep(0)
+            manager.cancel("cancel")
+            for log in logs.values():
+                await _drain(log)
+            with self.assertRaises(RuntimeError):
+                async with manager.inline_run("inline", on_failure=lambda *a: failures.append(("inline", *a))):
+                    raise RuntimeError("inline boom")
+            return failures
+
+        self.assertEqual(sorted(asyncio.run(main())), [
+            ("bad", "error", "boom"),
+            ("cancel", "cancelled", "研究已取消"),
+            ("inline", "error", "inline boom"),
+        ])
+
+    def test_inline_run_excludes_background_run(self):
+        """测试非流式端点执行期间，同一计划不能再提交后台运行"""
+        async def main():
+            manager = RunManager(EventLogRegistry())
+            async with manager.inline_run("p1"):
+                self.assertTrue(manager.is_running("p1"))
+                self.assertEqual(manager.active, 1)
+                with self.assertRaises(RuntimeError):
+                    manager.submit("p1", _steps("p1"))
+                with self.assertRaises(RuntimeError):
+                    async with manager.inline_run("p1"):
+                        pass
+            self.assertFalse(manager.is_running("p1"))
+            self.assertEqual(manager.active, 0)
+
+        asyncio.run(main())
+
+
+class TestStartWhileResearchBusy(unittest.TestCase):
+    """测试研究槽位全部被占用时 /api/research/start 仍能完成"""
+
+    def test_start_completes(self):
+        """测试 /start 使用交互池，研究池占满时不排队"""
+        import httpx
+
+        from benchmarks.fake_llm import install_fake_llm
+
+        install_fake_llm(latency=0.01)
+        import main as app_main
+
+        async def run():
+            manager = RunManager(EventLogRegistry(), max_concurrent_runs=1)
+            transport = httpx.ASGITransport(app=app_main.app)
+            with patch.object(app_main, "run_manager", manager):
+                async with manager.slot(PRIORITY_RESEARCH), \
+                        httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await asyncio.wait_for(
+                        client.post("/api/research/start", json={"topic": "问题", "locale": "zh-CN"}), timeout=10
+                    )
+
+        resp = asyncio.run(run())
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNotNone(resp.json()["plan_id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
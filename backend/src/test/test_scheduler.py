@@ -0,0 +1,105 @@
+import asyncio
+import time
+import unittest
+
+from src.graph.scheduler import ReorderBuffer, StepScheduler
+
+
+class TestStepScheduler(unittest.TestCase):
+    """测试研究步骤调度器"""
+
+    def test_max_in_flight(self):
+        """测试同时执行的步骤数不超过并发上限，且所有步骤都会执行"""
+        scheduler = StepScheduler(max_concurrency=3)
+        in_flight = 0
+        peak = 0
+
+        async def step(i):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return i
+
+        async def main():
+            return await asyncio.gather(*[
+                scheduler.run(i, lambda i=i: step(i)) for i in range(1, 9)
+            ])
+
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, list(range(1, 9)))
+        self.assertEqual(peak, 3)
+        # 8个步骤、并发3，应为3轮
+        self.assertEqual(scheduler.expected_rounds(8), 3)
+        self.assertLess(elapsed, 0.05 * 3 + 0.1)
+
+    def test_queue_wait_and_exec_time(self):
+        """测试排队时间与执行时间分开统计"""
+        scheduler = StepScheduler(max_concurrency=1)
+
+        async def step():
+            await asyncio.sleep(0.05)
+
+        async def main():
+            await asyncio.gather(scheduler.run(1, step), scheduler.run(2, step))
+
+        asyncio.run(main())
+        first, second = scheduler.get_metric(1), scheduler.get_metric(2)
+        self.assertLess(first["queue_wait"], 0.02)
+        self.assertGreaterEqual(second["queue_wait"], 0.04)
+        self.assertGreaterEqual(second["exec_time"], 0.04)
+        self.assertEqual(scheduler.summary()["steps"], 2)
+
+    def test_step_timeout(self):
+        """测试步骤超时，且排队时间不计入超时"""
+        scheduler = StepScheduler(max_concurrency=1, step_timeout=0.08)
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        async def fast():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        async def main():
+            return await asyncio.gather(
+                scheduler.run(1, fast),
+                scheduler.run(2, fast),
+                scheduler.run(3, slow),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+        self.assertEqual(results[:2], ["ok", "ok"])
+        self.assertIsInstance(results[2], asyncio.TimeoutError)
+        self.assertEqual(scheduler.get_metric(3)["status"], "timeout")
+        self.assertEqual(scheduler.summary()["timeouts"], 1)
+
+
+class TestReorderBuffer(unittest.TestCase):
+    """测试重排序缓冲区"""
+
+    def test_release_in_order(self):
+        """测试乱序到达的结果按步骤顺序释放，且前序到齐后立即释放"""
+        buffer = ReorderBuffer(first_index=1)
+        self.assertEqual(buffer.push(3, "c"), [])
+        self.assertEqual(buffer.push(2, "b"), [])
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.push(1, "a"), ["a", "b", "c"])
+        self.assertEqual(buffer.push(4, "d"), ["d"])
+        self.assertEqual(len(buffer), 0)
+
+    def test_duplicate_rejected(self):
+        """测试重复提交同一步骤"""
+        buffer = ReorderBuffer(first_index=1)
+        buffer.push(1, "a")
+        with self.assertRaises(ValueError):
+            buffer.push(1, "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from aiohttp import web
+
+from src.tools.http_pool import HttpPool
+from src.tools.search import get_search_budget
+
+
+async def _start_mock_tavily():
+    """本地模拟 Tavily 服务，记录收到的请求体，按 max_results 返回结果"""
+    bodies = []
+
+    async def search(request):
+        body = await request.json()
+        bodies.append(body)
+        results = [
+            {"title": str(i), "url": f"https://{i}.com", "content": "x" * 100, "score": 0.9}
+            for i in range(body["max_results"])
+        ]
+        return web.json_response({"query": body["query"], "results": results, "images": []})
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", bodies
+
+
+class TestTavilySearchAPI(unittest.TestCase):
+    """测试 TavilySearchAPI 的请求参数与返回体统计"""
+
+    def test_sync_and_async_send_same_params(self):
+        """测试同步与异步路径发送相同的请求体（max_results 不再被写死）"""
+        from src.tools import http_pool, search_cache
+        from src.tools.search import TavilySearchAPI
+
+        async def main():
+            runner, url, bodies = await _start_mock_tavily()
+            conf = {"tavily_api_key": "test-key", "tavily_api_url": url}
+            try:
+                with patch("src.tools.search.get_search_conf", return_value=conf), \
+                        patch.object(http_pool, "_default_pool", HttpPool()), \
+                        patch.object(search_cache, "_default_cache", None), \
+                        patch.object(search_cache, "_default_loaded", True):
+                    api = TavilySearchAPI()
+                    sync_result = await asyncio.to_thread(api.raw_results, "问题", 7)
+                    async_result = await api.async_raw_results("问题", 7)
+                    await http_pool.close_http_pool()
+            finally:
+                await runner.cleanup()
+            return api, bodies, sync_result, async_result
+
+        api, bodies, sync_result, async_result = asyncio.run(main())
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(bodies[0]["max_results"], 7)
+        self.assertEqual(sync_result, async_result)
+
+        metrics = api.metrics
+        self.assertEqual([m["results"] for m in metrics], [7, 7])
+        self.assertEqual(metrics[0]["payload_bytes"], metrics[1]["payload_bytes"])
+        self.assertGreater(metrics[0]["payload_bytes"], 700)
+        summary = api.metrics_summary()
+        self.assertEqual(summary["queries"], 2)
+        self.assertEqual(summary["cached"], 0)
+        self.assertEqual(summary["payload_bytes"], metrics[0]["payload_bytes"] * 2)
+
+    def test_search_budget(self):
+        """测试按步骤类型选择检索预算"""
+        conf = {
+            "default_budget": "broad",
+            "budgets": {
+                "deep": {"max_results": 3, "include_raw_content": True, "unknown": 1},
+                "broad": {"max_results": 8, "include_raw_content": False},
+            },
+        }
+        self.assertEqual(get_search_budget("deep", conf), {"max_results": 3, "include_raw_content": True})
+        self.assertEqual(get_search_budget(None, conf), {"max_results": 8, "include_raw_content": False})
+        self.assertEqual(get_search_budget("other", conf), {"max_results": 8, "include_raw_content": False})
+        self.assertEqual(get_search_budget("deep", {}), {})
+
+    def test_build_search_tools(self):
+        """测试研究步骤的搜索工具使用预算参数并共享同一个客户端"""
+        from src.graph.node import _build_search_tools
+
+        conf = {"tavily_api_key": "test-key", "budgets": {"deep": {"max_results": 3, "include_raw_content": True}}}
+        with patch("src.tools.search.get_search_conf", return_value=conf), \
+                patch("src.tools.search_with_image.get_search_conf", return_value=conf):
+            tools = _build_search_tools(conf, "deep")
+        self.assertEqual([t.name for t in tools], ["tavily_search_results_json", "batch_search"])
+        self.assertTrue(all(t.max_results == 3 and t.include_raw_content for t in tools))
+        self.assertIs(tools[0].api_wrapper, tools[1].api_wrapper)
+
+    def test_research_prompt_mentions_batch_search_only_when_registered(self):
+        """测试研究提示词只在注册了 batch_search 工具时提到它"""
+        from src.graph.node import _batch_search_enabled
+        from src.prompts.template import render_prompt_template
+
+        for conf, expected in [({}, True), ({"batch_search": False}, False)]:
+            prompt = render_prompt_template("research", batch_search=_batch_search_enabled(conf))
+            self.assertEqual("batch_search" in prompt, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
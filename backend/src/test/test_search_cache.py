@@ -0,0 +1,199 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from aiohttp import web
+
+from src.tools.http_pool import HttpPool
+from src.tools.search_cache import SearchCache, create_search_cache, normalize_query, search_key
+
+
+async def _start_mock_tavily(delay: float = 0.0):
+    """本地模拟 Tavily 服务，记录收到的查询"""
+    queries = []
+
+    async def search(request):
+        body = await request.json()
+        queries.append(body["query"])
+        if delay:
+            await asyncio.sleep(delay)
+        return web.json_response({"query": body["query"], "results": [], "images": []})
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", queries
+
+
+class TestSearchCache(unittest.TestCase):
+    """测试搜索结果缓存"""
+
+    def test_normalize_query(self):
+        """测试查询归一化：大小写、空白、全角字符与结尾标点"""
+        self.assertEqual(normalize_query("  Deep   Research?  "), "deep research")
+        self.assertEqual(normalize_query("ＬＬＭ 最新进展？"), "llm 最新进展")
+        self.assertEqual(normalize_query("大模型。"), normalize_query("大模型"))
+
+    def test_search_key(self):
+        """测试缓存键：忽略 api_key 与列表顺序，区分其余参数"""
+        base = {"api_key": "a", "query": "LLM", "max_results": 5, "include_domains": ["a.com", "b.com"]}
+        same = {"api_key": "b", "query": "llm ", "max_results": 5, "include_domains": ["b.com", "a.com"]}
+        other = dict(base, max_results=3)
+        self.assertEqual(search_key(base), search_key(same))
+        self.assertNotEqual(search_key(base), search_key(other))
+
+    def test_lru_and_ttl(self):
+        """测试内存 LRU 淘汰与 TTL 过期"""
+        cache = SearchCache(max_entries=2, ttl_seconds=10)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+
+        with patch("src.utils.ttl_cache.time.time", return_value=cache._memory["a"][1] + 11):
+            self.assertIsNone(cache.get("a"))
+        self.assertNotIn("a", cache._memory)
+
+    def test_disk_tier(self):
+        """测试 SQLite 磁盘层跨实例复用，过期条目不返回"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "search.db")
+            first = SearchCache(path=path, ttl_seconds=60)
+            first.set("k", '{"results": []}')
+            first.close()
+
+            second = SearchCache(path=path, ttl_seconds=60)
+            self.assertEqual(second.get("k"), '{"results": []}')
+            self.assertEqual(second.disk_hits, 1)
+            second.close()
+
+            expired = SearchCache(path=path, ttl_seconds=0)
+            with patch("src.utils.ttl_cache.time.time", return_value=4102444800):
+                self.assertIsNone(expired.get("k"))
+            expired.close()
+
+    def test_expiry_sweep_uses_index(self):
+        """测试写入时清理过期条目走 created_at 索引，不扫描全表"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = SearchCache(path=os.path.join(tmpdir, "search.db"), ttl_seconds=60)
+            plan = cache._conn.execute(
+                f"EXPLAIN QUERY PLAN DELETE FROM {cache._table} WHERE created_at < ?", (0,)
+            ).fetchall()
+            cache.close()
+        self.assertTrue(any("created_at" in row[-1] and "INDEX" in row[-1] for row in plan), plan)
+
+    def test_single_flight(self):
+        """测试并发的相同查询只请求一次，失败不写入缓存"""
+        cache = SearchCache()
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        async def main():
+            results = await asyncio.gather(*[cache.get_or_create("k", factory) for _ in range(5)])
+            with self.assertRaises(RuntimeError):
+                await cache.get_or_create("bad", failing)
+            return results
+
+        self.assertEqual(asyncio.run(main()), ["ok"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats(), {"hits": 0, "disk_hits": 0, "misses": 2, "shared": 4})
+        self.assertIsNone(cache.get("bad"))
+
+    def test_sync_single_flight(self):
+        """测试多个线程同时请求相同查询时只调用一次 factory，失败不写入缓存"""
+        cache = SearchCache()
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.05)
+            return "ok"
+
+        def failing():
+            time.sleep(0.05)
+            raise RuntimeError("boom")
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(lambda _: cache.get_or_set("k", factory), range(5)))
+            self.assertEqual((cache.misses, cache.hits + cache.shared), (1, 4))
+            failures = [pool.submit(cache.get_or_set, "bad", failing) for _ in range(2)]
+            for future in failures:
+                with self.assertRaises(RuntimeError):
+                    future.result()
+
+        self.assertEqual(results, ["ok"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertIsNone(cache.get("bad"))
+
+    def test_cache_key_includes_truncation_limit(self):
+        """测试截断上限不同的配置不共用缓存条目"""
+        from src.tools.search import TavilySearchAPI
+
+        params = {"query": "问题", "max_results": 5}
+        keys = []
+        for limit in (1000, 2000, 2000):
+            conf = {"tavily_api_key": "test-key", "max_content_length_per_page": limit}
+            with patch("src.tools.search.get_search_conf", return_value=conf):
+                keys.append(TavilySearchAPI()._cache_key(params))
+        self.assertNotEqual(keys[0], keys[1])
+        self.assertEqual(keys[1], keys[2])
+
+    def test_create_disabled(self):
+        """测试 enabled 为 false 时不创建缓存"""
+        self.assertIsNone(create_search_cache({"enabled": False}))
+        self.assertIsInstance(create_search_cache({}), SearchCache)
+
+    def test_tavily_search_uses_cache(self):
+        """测试 TavilySearchAPI 对归一化后相同的查询只访问一次 Tavily"""
+        from src.tools import http_pool, search_cache
+        from src.tools.search import TavilySearchAPI
+
+        cache = SearchCache()
+
+        async def main():
+            runner, url, queries = await _start_mock_tavily(delay=0.05)
+            conf = {"tavily_api_key": "test-key", "tavily_api_url": url}
+            try:
+                with patch("src.tools.search.get_search_conf", return_value=conf), \
+                        patch.object(http_pool, "_default_pool", HttpPool()), \
+                        patch.object(search_cache, "_default_cache", cache), \
+                        patch.object(search_cache, "_default_loaded", True):
+                    api = TavilySearchAPI()
+                    results = await asyncio.gather(
+                        api.async_raw_results("大模型 进展"),
+                        api.async_raw_results("大模型  进展？"),
+                        api.async_raw_results("其他问题"),
+                    )
+                    again = await api.async_raw_results("大模型 进展")
+                    await http_pool.close_http_pool()
+            finally:
+                await runner.cleanup()
+            return results, again, queries
+
+        results, again, queries = asyncio.run(main())
+        self.assertEqual(sorted(queries), ["其他问题", "大模型 进展"])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(again, results[0])
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.shared, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from src.graph.type import Plan, Step
+from src.server.state_store import (
+    FileResearchStateStore,
+    InMemoryResearchStateStore,
+    SQLiteResearchStateStore,
+    create_research_state_store,
+    diff_status,
+    purge_periodically,
+    version_of,
+)
+
+
+def _update_many(directory: str, worker: int, times: int) -> None:
+    store = FileResearchStateStore(directory)
+    for i in range(times):
+        store.update("p1", **{f"w{worker}": i})
+
+
+class _StoreContract:
+    """各存储实现共同的行为测试"""
+
+    def make_store(self, ttl_seconds=None):
+        raise NotImplementedError
+
+    def test_set_get_update_delete(self):
+        """测试基本的读写、合并更新与删除"""
+        store = self.make_store()
+        store.set("p1", {"status": "coordinate", "config": {"configurable": {"thread_id": "p1"}}})
+        self.assertIn("p1", store)
+        state = store.update("p1", status="plan_generated", current_stage="generate_plan")
+        self.assertEqual(state["status"], "plan_generated")
+        self.assertEqual(store.get("p1")["current_stage"], "generate_plan")
+        self.assertEqual(store.get("p1")["config"]["configurable"]["thread_id"], "p1")
+        store.delete("p1")
+        self.assertIsNone(store.get("p1"))
+        self.assertIsNone(store.update("p1", status="completed"))
+
+    def test_pydantic_values_serialized(self):
+        """测试pydantic对象被转换为dict存储"""
+        store = self.make_store()
+        plan = Plan(locale="zh-CN", has_enough_context=False, thought="t", title="标题",
+                    steps=[Step(title="s1", description="d1")])
+        store.set("p1", {"status": "plan_generated"})
+        store.update("p1", current_plan=plan)
+        self.assertEqual(store.get("p1")["current_plan"]["steps"][0]["title"], "s1")
+
+    def test_ttl_expiry(self):
+        """测试过期的状态不可见"""
+        store = self.make_store(ttl_seconds=0.05)
+        store.set("p1", {"status": "coordinate"})
+        self.assertIsNotNone(store.get("p1"))
+        time.sleep(0.1)
+        self.assertIsNone(store.get("p1"))
+
+    def test_purge_expired(self):
+        """测试 purge_expired 删除过期状态并返回删除数量"""
+        store = self.make_store(ttl_seconds=0.05)
+        store.set("p1", {"status": "coordinate"})
+        store.set("p2", {"status": "coordinate"})
+        time.sleep(0.1)
+        self.assertEqual(store.purge_expired(), 2)
+        store.set("p3", {"status": "coordinate"})
+        self.assertEqual(store.purge_expired(), 0)
+        self.assertIsNotNone(store.get("p3"))
+
+    def test_purge_periodically(self):
+        """测试后台任务按 purge_interval 定期清理"""
+        store = self.make_store(ttl_seconds=0.02)
+        store.purge_interval = 0.05
+        calls = []
+        purge = store.purge_expired
+        store.purge_expired = lambda: calls.append(1) or purge()
+
+        async def main():
+            task = asyncio.create_task(purge_periodically(store))
+            await asyncio.sleep(0.18)
+            task.cancel()
+
+        asyncio.run(main())
+        self.assertGreaterEqual(len(calls), 2)
+
+    def test_version_and_wait_for_change(self):
+        """测试每次更新版本号加一，并唤醒等待变化的订阅者"""
+        store = self.make_store()
+        store.set("p1", {"status": "coordinate"})
+        self.assertEqual(version_of(store.get("p1")), 0)
+
+        async def main():
+            waiter = asyncio.create_task(store.wait_for_change("p1", 0, timeout=5))
+            await asyncio.sleep(0.01)
+            store.update("p1", status="plan_generated")
+            return await waiter
+
+        start = time.perf_counter()
+        state = asyncio.run(main())
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual((state["status"], version_of(state)), ("plan_generated", 1))
+        # 版本号已变化时立即返回，未变化时超时返回当前状态
+        self.assertEqual(version_of(asyncio.run(store.wait_for_change("p1", 0, timeout=5))), 1)
+        self.assertEqual(version_of(asyncio.run(store.wait_for_change("p1", 1, timeout=0.01))), 1)
+
+
+class TestInMemoryResearchStateStore(_StoreContract, unittest.TestCase):
+    def make_store(self, ttl_seconds=None):
+        return InMemoryResearchStateStore(max_entries=10, ttl_seconds=ttl_seconds)
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未访问的状态"""
+        store = InMemoryResearchStateStore(max_entries=2)
+        store.set("a", {"status": "1"})
+        store.set("b", {"status": "2"})
+        store.get("a")
+        store.set("c", {"status": "3"})
+        self.assertIsNone(store.get("b"))
+        self.assertIsNotNone(store.get("a"))
+        self.assertEqual(len(store), 2)
+
+    def test_get_returns_copy(self):
+        """测试返回的状态修改不会影响存储"""
+        store = self.make_store()
+        store.set("p1", {"status": "coordinate"})
+        store.get("p1")["status"] = "changed"
+        self.assertEqual(store.get("p1")["status"], "coordinate")
+
+
+class TestSQLiteResearchStateStore(_StoreContract, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_store(self, ttl_seconds=None):
+        return SQLiteResearchStateStore(os.path.join(self.tmp.name, "states.db"), ttl_seconds=ttl_seconds)
+
+    def test_shared_between_instances(self):
+        """测试不同实例（模拟不同worker）共享同一数据库"""
+        writer = self.make_store()
+        reader = self.make_store()
+        writer.set("p1", {"status": "awaiting_confirmation"})
+        self.assertEqual(reader.get("p1")["status"], "awaiting_confirmation")
+
+
+class TestFileResearchStateStore(_StoreContract, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_store(self, ttl_seconds=None):
+        return FileResearchStateStore(self.tmp.name, ttl_seconds=ttl_seconds)
+
+    def test_plan_id_sanitized(self):
+        """测试plan_id中的路径字符被过滤"""
+        store = self.make_store()
+        store.set("../p1", {"status": "coordinate"})
+        self.assertEqual(os.listdir(self.tmp.name), ["p1.json"])
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "需要 fork")
+    def test_concurrent_updates_across_processes(self):
+        """测试多个进程并发 update 同一个计划时不会丢失更新"""
+        self.make_store().set("p1", {"status": "researching"})
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_update_many, args=(self.tmp.name, i, 30)) for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        state = self.make_store().get("p1")
+        self.assertEqual(version_of(state), 4 * 30)
+        self.assertEqual([state[f"w{i}"] for i in range(4)], [29] * 4)
+
+
+class TestDiffStatus(unittest.TestCase):
+    def test_changed_fields_and_appended_steps(self):
+        """测试只返回变化的字段与新增的步骤结果"""
+        old = {"status": "researching", "research_summary": None, "step_results": [{"i": 1}]}
+        new = {"status": "researching", "research_summary": None, "step_results": [{"i": 1}, {"i": 2}]}
+        self.assertEqual(diff_status(old, new), {"changes": {}, "step_results_added": [{"i": 2}]})
+
+    def test_rewritten_list(self):
+        """测试列表被改写时整体放入 changes"""
+        old = {"status": "researching", "step_results": [{"i": 1}]}
+        new = {"status": "completed", "step_results": [{"i": 1, "md": "x"}]}
+        self.assertEqual(
+            diff_status(old, new),
+            {"changes": {"status": "completed", "step_results": [{"i": 1, "md": "x"}]}},
+        )
+
+
+class TestWatchResearchStatus(unittest.TestCase):
+    """测试 /api/research/status/{plan_id}/watch 状态推送"""
+
+    def test_failed_run_closes_stream(self):
+        """测试后台运行失败后推送 error 状态并结束状态流"""
+        import httpx
+
+        from benchmarks.fake_llm import install_fake_llm
+        from src.server.event_log import EventLogRegistry
+        from src.server.run_manager import RunManager
+
+        install_fake_llm(latency=0.01)
+        import main as app_main
+
+        async def failing():
+            await asyncio.sleep(0.05)
+            yield "step", {"i": 0}
+            raise RuntimeError("boom")
+
+        async def run():
+            store = InMemoryResearchStateStore(max_entries=10)
+            store.set("p1", {"status": "researching"})
+            manager = RunManager(EventLogRegistry())
+            transport = httpx.ASGITransport(app=app_main.app)
+            with patch.object(app_main, "research_states", store), patch.object(app_main, "run_manager", manager):
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    manager.submit("p1", failing, on_failure=app_main._failure_recorder("p1"))
+                    resp = await asyncio.wait_for(client.get("/api/research/status/p1/watch"), timeout=10)
+            return resp
+
+        resp = asyncio.run(run())
+        self.assertEqual(resp.status_code, 200)
+        events = [line for line in resp.text.splitlines() if line.startswith("event:")]
+        self.assertEqual(events, ["event: snapshot", "event: diff"])
+        # 尚未更新过的状态版本号为 0，快照也要带上 id，重连时才不会重复推送快照
+        self.assertTrue(resp.text.startswith("id: 0\nevent: snapshot\n"))
+        last = json.loads(resp.text.strip().splitlines()[-1][len("data: "):])
+        self.assertEqual(last["changes"]["status"], "error")
+        self.assertEqual(last["changes"]["error"], "boom")
+
+
+class TestCreateResearchStateStore(unittest.TestCase):
+    def test_backends(self):
+        """测试按配置创建存储"""
+        self.assertIsInstance(create_research_state_store({}), InMemoryResearchStateStore)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = create_research_state_store({"backend": "sqlite", "path": os.path.join(tmp, "s.db")})
+            self.assertIsInstance(store, SQLiteResearchStateStore)
+            store.close()
+        with self.assertRaises(ValueError):
+            create_research_state_store({"backend": "redis"})
+
+
+if __name__ == "__main__":
+    unittest.main()
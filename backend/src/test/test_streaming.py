@@ -0,0 +1,187 @@
+import asyncio
+import unittest
+
+from src.server.event_log import EventLog
+from src.server.streaming import TokenBatcher, coalesce_token_events, subscribe_with_backpressure
+
+
+async def _collect(events, batcher):
+    return [item async for item in coalesce_token_events(events, batcher)]
+
+
+class TestTokenBatcher(unittest.TestCase):
+    """测试 token 合并器"""
+
+    def test_flush_by_bytes(self):
+        """测试累积字节数达到上限时输出（中文按 UTF-8 字节计）"""
+        batcher = TokenBatcher(max_bytes=6, max_latency=1)
+        self.assertIsNone(batcher.add("研", now=0))
+        self.assertEqual(batcher.add("究", now=0), "研究")
+        self.assertEqual(len(batcher), 0)
+        self.assertEqual((batcher.tokens, batcher.frames), (2, 1))
+
+    def test_time_until_flush(self):
+        """测试时间窗口从第一个未输出的 token 开始计算"""
+        batcher = TokenBatcher(max_bytes=256, max_latency=0.03)
+        self.assertIsNone(batcher.time_until_flush(now=0))
+        batcher.add("a", now=10.0)
+        batcher.add("b", now=10.02)
+        self.assertAlmostEqual(batcher.time_until_flush(now=10.02), 0.01)
+        self.assertEqual(batcher.time_until_flush(now=11), 0.0)
+        self.assertEqual(batcher.flush(), "ab")
+        self.assertIsNone(batcher.time_until_flush())
+
+    def test_zero_bytes_disables_batching(self):
+        """测试 max_bytes=0 时每个 token 单独成帧"""
+        batcher = TokenBatcher(max_bytes=0)
+        self.assertEqual(batcher.add("a"), "a")
+        self.assertEqual(batcher.add("b"), "b")
+        self.assertIsNone(batcher.add(""))
+
+
+class TestCoalesceTokenEvents(unittest.TestCase):
+    """测试事件流上的 token 合并"""
+
+    def test_order_preserved(self):
+        """测试非 chunk 事件前会先输出已累积的 token"""
+        async def events():
+            for delta in ["你", "好", "！"]:
+                yield "chunk", {"plan_id": "p", "delta": delta}
+            yield "plan", {"plan_id": "p"}
+            yield "chunk", {"plan_id": "p", "delta": "x"}
+            yield "done", {"plan_id": "p"}
+
+        frames = asyncio.run(_collect(events(), TokenBatcher(max_bytes=256, max_latency=10)))
+        self.assertEqual(frames, [
+            ("chunk", {"plan_id": "p", "delta": "你好！"}),
+            ("plan", {"plan_id": "p"}),
+            ("chunk", {"plan_id": "p", "delta": "x"}),
+            ("done", {"plan_id": "p"}),
+        ])
+
+    def test_flush_by_latency(self):
+        """测试上游停顿超过时间窗口时输出已累积的 token"""
+        async def events():
+            yield "chunk", {"delta": "a"}
+            yield "chunk", {"delta": "b"}
+            await asyncio.sleep(0.1)
+            yield "chunk", {"delta": "c"}
+
+        frames = asyncio.run(_collect(events(), TokenBatcher(max_bytes=256, max_latency=0.02)))
+        self.assertEqual([data["delta"] for _, data in frames], ["ab", "c"])
+
+    def test_pulls_upstream_lazily(self):
+        """测试下游不读取时，上游最多被预读一个事件"""
+        produced = 0
+
+        async def events():
+            nonlocal produced
+            for i in range(100):
+                produced += 1
+                yield "chunk", {"delta": str(i)}
+
+        async def main():
+            stream = coalesce_token_events(events(), TokenBatcher(max_bytes=2, max_latency=10))
+            first = await stream.__anext__()
+            await asyncio.sleep(0.05)
+            await stream.aclose()
+            return first
+
+        self.assertEqual(asyncio.run(main()), ("chunk", {"delta": "01"}))
+        self.assertLessEqual(produced, 3)
+
+    def test_upstream_error(self):
+        """测试上游异常会在输出已累积的 token 后抛出"""
+        async def events():
+            yield "chunk", {"delta": "a"}
+            raise RuntimeError("boom")
+
+        async def main():
+            frames = []
+            with self.assertRaises(RuntimeError):
+                async for item in coalesce_token_events(events(), TokenBatcher(max_latency=10)):
+                    frames.append(item)
+            return frames
+
+        self.assertEqual(asyncio.run(main()), [("chunk", {"delta": "a"})])
+
+
+class TestSubscribeWithBackpressure(unittest.TestCase):
+    """测试按订阅者的背压：落后过多时合并积压的 chunk"""
+
+    def _log(self):
+        log = EventLog()
+        log.append("started", {"plan_id": "p"})
+        for ch in "abcde":
+            log.append("chunk", {"plan_id": "p", "delta": ch})
+        log.append("plan", {"plan_id": "p"})
+        log.append("chunk", {"plan_id": "p", "delta": "f"})
+        log.close()
+        return log
+
+    async def _drain(self, log, last_id=0, queue_size=64):
+        return [item async for item in subscribe_with_backpressure(log, last_id, queue_size)]
+
+    def test_within_queue_size(self):
+        """测试落后不超过 queue_size 时逐个输出"""
+        log = self._log()
+        self.assertEqual(asyncio.run(self._drain(log, queue_size=8)), list(log.since(0)[0]))
+
+    def test_backlog_merged(self):
+        """测试落后超过 queue_size 时合并连续的 chunk，id 取最后一个 chunk，便于断线续传"""
+        events = asyncio.run(self._drain(self._log(), queue_size=4))
+        self.assertEqual(events, [
+            (1, "started", {"plan_id": "p"}),
+            (6, "chunk", {"plan_id": "p", "delta": "abcde"}),
+            (7, "plan", {"plan_id": "p"}),
+            (8, "chunk", {"plan_id": "p", "delta": "f"}),
+        ])
+        resumed = asyncio.run(self._drain(self._log(), last_id=6, queue_size=1))
+        self.assertEqual([event_id for event_id, _, _ in resumed], [7, 8])
+
+    def test_slow_subscriber_does_not_block_others(self):
+        """测试慢订阅者追赶时合并积压，快订阅者仍逐个收到实时事件"""
+        async def main():
+            log = EventLog()
+            fast, slow = [], []
+
+            async def reader(out, delay):
+                async for item in subscribe_with_backpressure(log, 0, queue_size=2):
+                    out.append(item)
+                    await asyncio.sleep(delay)
+
+            readers = [asyncio.create_task(reader(fast, 0)), asyncio.create_task(reader(slow, 0.05))]
+            for i in range(20):
+                log.append("chunk", {"delta": str(i % 10)})
+                await asyncio.sleep(0.005)
+            log.close()
+            await asyncio.gather(*readers)
+            return fast, slow
+
+        fast, slow = asyncio.run(main())
+        self.assertEqual(len(fast), 20)
+        self.assertLess(len(slow), 20)
+        self.assertEqual("".join(data["delta"] for _, _, data in slow), "01234567890123456789")
+        self.assertEqual(slow[-1][0], 20)
+
+
+class TestSseBenchmarkSmoke(unittest.TestCase):
+    """冒烟测试：SSE 基准测试与 main._sse_response 的签名保持一致"""
+
+    def test_bench_sse_tokens_runs(self):
+        """测试基准测试能跑通，合并后帧数少于逐 token 输出"""
+        import contextlib
+        import io
+
+        from benchmarks import bench_sse_tokens
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(bench_sse_tokens.run(2, 50, 1000, 256, 30))
+        per_token, coalesced = [r for name, r in results.items() if not name.startswith("token源")]
+        # 每条流 50 个 chunk 帧 + 1 个 done 帧
+        self.assertEqual(per_token["frames"], 2 * 51)
+        self.assertLess(coalesced["frames"], per_token["frames"])
+
+
+if __name__ == "__main__":
+    unittest.main()
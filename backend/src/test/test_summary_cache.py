@@ -0,0 +1,130 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.utils.content import ContextManager
+from src.utils.summary_cache import SummaryCache, block_key
+
+
+class TestSummaryCache(unittest.TestCase):
+    """测试对话块摘要缓存"""
+
+    def test_block_key_ignores_metadata(self):
+        """测试缓存键只取决于消息类型与内容"""
+        a = [HumanMessage(content="问题", id="1"), AIMessage(content="回答", id="2")]
+        b = [HumanMessage(content="问题", id="x"), AIMessage(content="回答")]
+        self.assertEqual(block_key(a), block_key(b))
+        self.assertNotEqual(block_key(a), block_key(a, namespace="other-model"))
+        self.assertNotEqual(block_key(a), block_key([AIMessage(content="问题"), AIMessage(content="回答")]))
+
+    def test_memory_lru(self):
+        """测试内存层按 LRU 淘汰"""
+        cache = SummaryCache(max_entries=2)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        self.assertEqual(cache.get("a"), "A")
+        cache.set("c", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+
+    def test_disk_tier(self):
+        """测试磁盘层跨实例复用"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "summaries.db")
+            cache = SummaryCache(path=path)
+            cache.set("k", "摘要")
+            cache.close()
+
+            reopened = SummaryCache(path=path)
+            self.assertEqual(reopened.get("k"), "摘要")
+            self.assertEqual(reopened.disk_hits, 1)
+            self.assertEqual(reopened.get("k"), "摘要")
+            self.assertEqual(reopened.hits, 1)
+            reopened.close()
+
+            expired = SummaryCache(path=path, ttl_seconds=-1)
+            self.assertIsNone(expired.get("k"))
+            expired.close()
+
+    def test_single_flight(self):
+        """测试并发请求同一个块时只调用一次 factory"""
+        cache = SummaryCache()
+        factory = AsyncMock()
+
+        async def slow():
+            await factory()
+            await asyncio.sleep(0.05)
+            return "摘要"
+
+        async def main():
+            return await asyncio.gather(*[cache.get_or_create("k", slow) for _ in range(3)])
+
+        self.assertEqual(asyncio.run(main()), ["摘要"] * 3)
+        self.assertEqual(factory.await_count, 1)
+        self.assertEqual((cache.misses, cache.shared), (1, 2))
+
+    def test_failure_not_cached(self):
+        """测试生成失败时不写入缓存，等待者收到同一个异常"""
+        cache = SummaryCache()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("LLM 不可用")
+
+        async def main():
+            return await asyncio.gather(
+                cache.get_or_create("k", failing), cache.get_or_create("k", failing), return_exceptions=True
+            )
+
+        results = asyncio.run(main())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertIsNone(cache.get("k"))
+
+
+class TestContextManagerSummaryCache(unittest.TestCase):
+    """测试 ContextManager 复用摘要缓存"""
+
+    def test_repeated_compression_without_llm_calls(self):
+        """测试重复压缩未变化的历史时不再调用LLM"""
+        llm = Mock()
+        llm.ainvoke = AsyncMock(return_value=AIMessage(content="总结"))
+        cache = SummaryCache()
+        long_text = "这是一个很长的消息内容" * 100
+        history = [
+            SystemMessage(content="系统提示"),
+            HumanMessage(content="研究问题"),
+            AIMessage(content=long_text),
+            HumanMessage(content=long_text),
+            AIMessage(content=long_text),
+        ]
+
+        async def compress(manager, step):
+            return await manager.acompress_messages(history + [HumanMessage(content=f"步骤{step}")])
+
+        async def main():
+            # 多个步骤并发压缩同一段历史前缀
+            research = ContextManager(llm, max_tokens=1000, summary_cache=cache)
+            await asyncio.gather(*[compress(research, i) for i in range(3)])
+            first_calls = llm.ainvoke.await_count
+            # 新的一次运行（新的 ContextManager）
+            await compress(ContextManager(llm, max_tokens=1000, summary_cache=cache), 9)
+            return first_calls
+
+        first_calls = asyncio.run(main())
+        # 历史被分成 [AI] [Human] [AI, 步骤] 三个块：前两个块只总结一次，
+        # 最后一个块包含各不相同的步骤消息，每个步骤各总结一次
+        self.assertEqual(first_calls, 2 + 3)
+        self.assertEqual(llm.ainvoke.await_count, 2 + 3 + 1)
+
+        # 完全相同的历史再次压缩，不产生任何LLM调用
+        manager = ContextManager(llm, max_tokens=1000, summary_cache=cache)
+        asyncio.run(compress(manager, 9))
+        self.assertEqual(llm.ainvoke.await_count, 2 + 3 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
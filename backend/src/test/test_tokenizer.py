@@ -0,0 +1,93 @@
+import base64
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from langchain_core.messages import AIMessage
+
+from src.utils.content import ContextManager
+from src.utils.tokenizer import BPETokenizer, HeuristicTokenizer, Tokenizer, create_tokenizer
+
+# 测试用小词表：256 个单字节 + 少量合并
+_MERGES = [b"th", b"the", b" the", b"in", b"ing", "研".encode()[:2], "研".encode(), "究".encode()[:2], "究".encode()]
+
+
+def _write_vocab(path, merges=_MERGES, skip_byte=None):
+    tokens = [bytes([b]) for b in range(256) if b != skip_byte] + list(merges)
+    with open(path, "wb") as f:
+        for rank, token in enumerate(tokens):
+            f.write(base64.b64encode(token) + b" " + str(rank).encode() + b"\n")
+
+
+class TestBPETokenizer(unittest.TestCase):
+    """测试本地词表的字节级 BPE 计数器"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.vocab_path = os.path.join(self.tmpdir.name, "tiny.tiktoken")
+        _write_vocab(self.vocab_path)
+        self.tokenizer = BPETokenizer(self.vocab_path, use_tiktoken=False)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_merges(self):
+        """测试按 rank 合并相邻片段"""
+        ranks = self.tokenizer.ranks
+        self.assertEqual(self.tokenizer.encode("the"), [ranks[b"the"]])
+        self.assertEqual(self.tokenizer.encode(" the"), [ranks[b" the"]])
+        self.assertEqual(self.tokenizer.encode("thing"), [ranks[b"th"], ranks[b"ing"]])
+        self.assertEqual(self.tokenizer.count("研究"), 2)
+        self.assertEqual(self.tokenizer.count("研究报告"), 2 + len("报告".encode()))
+        self.assertEqual(self.tokenizer.count(""), 0)
+
+    def test_chunk_cache(self):
+        """测试预分词片段的 LRU 缓存"""
+        tokenizer = BPETokenizer(self.vocab_path, cache_size=2, use_tiktoken=False)
+        tokenizer.count("the thing the")
+        self.assertEqual(len(tokenizer._cache), 2)
+        self.assertIn(" the", tokenizer._cache)
+
+    def test_matches_tiktoken(self):
+        """测试纯 Python 实现与 tiktoken 原生实现结果一致"""
+        accelerated = BPETokenizer(self.vocab_path)
+        if accelerated.backend != "tiktoken":
+            self.skipTest("tiktoken 未安装")
+        rng = random.Random(0)
+        alphabet = "the thing 研究报告 in,.\n123'sΩ🚀"
+        for _ in range(50):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+            self.assertEqual(self.tokenizer.encode(text), accelerated.encode(text), text)
+
+    def test_missing_single_byte(self):
+        """测试词表缺少单字节 token 时拒绝加载"""
+        path = os.path.join(self.tmpdir.name, "broken.tiktoken")
+        _write_vocab(path, skip_byte=0)
+        with self.assertRaises(ValueError):
+            BPETokenizer(path)
+
+    def test_create_tokenizer_fallback(self):
+        """测试词表不存在时回退到估算"""
+        tokenizer = create_tokenizer({"backend": "bpe", "vocab_path": os.path.join(self.tmpdir.name, "none")})
+        self.assertIsInstance(tokenizer, HeuristicTokenizer)
+        tokenizer = create_tokenizer({"backend": "bpe", "vocab_path": self.vocab_path})
+        self.assertIsInstance(tokenizer, BPETokenizer)
+
+    def test_tokenizer_is_abstract(self):
+        """测试 Tokenizer 接口必须实现 count"""
+        with self.assertRaises(TypeError):
+            Tokenizer()
+
+    def test_context_manager_exact_count(self):
+        """测试使用真实分词时不再乘以保守权重"""
+        message = AIMessage(content="the thing " * 20)
+        estimated = ContextManager(Mock(), max_tokens=100)._count_one_message(message)
+        exact = ContextManager(Mock(), max_tokens=100, tokenizer=self.tokenizer)._count_one_message(message)
+        self.assertEqual(exact, self.tokenizer.count(message.content) + self.tokenizer.count("ai"))
+        self.assertNotEqual(exact, estimated)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+搜索请求的共享 HTTP 连接池：
+- 异步：进程内共享的 aiohttp.ClientSession（连接数上限、keep-alive、DNS 缓存），
+  每次搜索不再重新建立 DNS/TCP/TLS 连接
+- 同步：共享的 requests.Session（urllib3 连接池）
+- 随 FastAPI lifespan 关闭
+"""
+import asyncio
+import logging
+import ssl
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config.loader import load_yaml_config
+
+logger = logging.getLogger(__name__)
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+class HttpPool:
+    """
+    HTTP 连接池
+    - limit / limit_per_host: 总连接数与单个主机的连接数上限
+    - keepalive_timeout: 空闲连接的保持时间（秒）
+    - dns_cache_ttl: DNS 解析结果的缓存时间（秒）
+    - timeout: 单次请求的总超时（秒）；requests 不支持总超时，同步请求用它作为连接与每次读取的超时
+    - ssl_context: 自定义 TLS 配置（例如信任自签名证书），None 使用系统默认
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        keepalive_timeout: float = 30,
+        dns_cache_ttl: int = 300,
+        timeout: float = 60,
+        ssl_context: Union[ssl.SSLContext, bool, None] = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_session: Optional[requests.Session] = None
+        self._sync_lock = threading.Lock()
+
+    def session(self) -> aiohttp.ClientSession:
+        """
+        当前事件循环共享的 aiohttp 会话
+        aiohttp 会话绑定创建它的事件循环；脚本中多次 asyncio.run 时按循环重新创建
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                logger.debug("[http_pool] 事件循环已变化，关闭旧会话并重新创建 aiohttp 会话")
+                self._close_stale_session()
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                ssl=self.ssl_context if self.ssl_context is not None else True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._loop = loop
+        return self._session
+
+    def _close_stale_session(self) -> None:
+        """
+        关闭绑定在旧事件循环上的会话，释放其 keep-alive 连接
+        旧循环仍在其他线程中运行时交给旧循环关闭；已停止时无法再 await，直接同步关闭连接器
+        （循环已关闭时 aiohttp 只标记连接器关闭，底层连接随旧循环一起释放）
+        """
+        session, loop = self._session, self._loop
+        self._session = None
+        self._loop = None
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        connector = session.connector
+        session.detach()
+        if connector is not None:
+            # close() 返回只能在旧循环上 await 的对象；_close() 同步关闭所有连接，与连接器析构时的处理一致
+            connector._close()
+
+    def sync_session(self) -> requests.Session:
+        """
+        同步请求共享的 requests 会话，可在多个线程中同时使用（如批量搜索的线程池）：
+        会话创建后不再修改 adapter / headers 等配置，urllib3 连接池按线程安全的方式分配连接，
+        每个线程的请求各自占用一个连接；只有首次创建需要加锁，避免并发时创建出多个会话
+        """
+        if self._sync_session is None:
+            with self._sync_lock:
+                if self._sync_session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.limit_per_host, pool_maxsize=self.limit_per_host)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    if isinstance(self.ssl_context, bool):
+                        session.verify = self.ssl_context
+                    self._sync_session = session
+        return self._sync_session
+
+    async def close(self) -> None:
+        """关闭连接池（应用关闭时调用）"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+
+
+def create_http_pool(conf: Optional[Dict[str, Any]] = None) -> HttpPool:
+    """根据 http_pool 配置创建连接池"""
+    conf = conf or {}
+    return HttpPool(
+        limit=conf.get("limit", 100),
+        limit_per_host=conf.get("limit_per_host", 20),
+        keepalive_timeout=conf.get("keepalive_timeout", 30),
+        dns_cache_ttl=conf.get("dns_cache_ttl", 300),
+        timeout=conf.get("timeout", 60),
+    )
+
+
+_default_pool: Optional[HttpPool] = None
+
+
+def get_http_pool() -> HttpPool:
+    """读取 config.yaml 中的 http_pool 配置，返回进程内共享的连接池"""
+    global _default_pool
+    if _default_pool is None:
+        conf = load_yaml_config(_get_conf_path()).get("http_pool", {}) or {}
+        _default_pool = create_http_pool(conf)
+    return _default_pool
+
+
+async def close_http_pool() -> None:
+    """关闭进程内共享的连接池"""
+    global _default_pool
+    if _default_pool is not None:
+        await _default_pool.close()
+        _default_pool = None
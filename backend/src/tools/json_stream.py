@@ -0,0 +1,167 @@
+"""
+流式截断 JSON：
+Tavily 在 include_raw_content=True 时经常返回数 MB 的网页全文，而 SearchResultProcessor
+最终只保留前 max_content_length_per_page 个字符。TruncatingJSONFilter 边接收边扫描响应体，
+把指定字段（content / raw_content 等）的字符串值截断后原样输出合法 JSON，
+峰值内存只取决于截断上限，而不是网页大小。
+- 逐块 feed 字节或文本，返回可以输出的 JSON 片段
+- 字符串内部用正则跳到下一个引号/反斜杠；超出上限后直接跳到结束引号，长文本的扫描在 C 层完成
+- 转义序列（含 UTF-16 代理对）作为整体计数，不会被截断在中间；跨块的转义序列缓存到下一块
+"""
+import codecs
+import re
+from typing import Dict, List, Optional, Union
+
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+# 字符串内容（含完整的转义序列），停在结束引号、块末尾或不完整的转义序列处
+_STRING_BODY_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*')
+_HIGH_SURROGATE_RE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}")
+_LOW_SURROGATE_RE = re.compile(r"\\u[dD][c-fC-F][0-9a-fA-F]{2}")
+# 字符串之外除结构字符外的片段（空白、数字、true/false/null）
+_PLAIN_RE = re.compile(r'[^"{}\[\]:,]+')
+
+
+class TruncatingJSONFilter:
+    """
+    截断指定字段字符串值的流式 JSON 过滤器
+    - limits: 字段名 -> 保留的最大字符数，对任意层级对象中的该字段生效
+    - marker: 被截断的字符串末尾追加的标记
+    截断结果为 value[:limit] + marker，与 SearchResultProcessor 的截断方式一致，
+    后续再次截断时结果不变。
+    """
+
+    def __init__(self, limits: Dict[str, int], marker: str = "..."):
+        self.limits = limits
+        self.marker = marker
+        self.bytes_in = 0
+        self.truncated = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._stack: List[str] = []
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._key_parts: List[str] = []
+        self._limit: Optional[int] = None
+        self._count = 0
+        self._pending = ""
+        self._closing = False
+
+    def feed(self, chunk: Union[bytes, str]) -> str:
+        """输入一块响应体，返回过滤后可以输出的 JSON 片段"""
+        if isinstance(chunk, bytes):
+            self.bytes_in += len(chunk)
+            chunk = self._decoder.decode(chunk)
+        else:
+            self.bytes_in += len(chunk.encode("utf-8"))
+        return self._process(chunk)
+
+    def close(self) -> str:
+        """输入结束，输出剩余片段"""
+        self._closing = True
+        out = self._process(self._decoder.decode(b"", final=True))
+        if self._pending:
+            # 响应体在转义序列中间结束，原样输出交给 json.loads 报错
+            out += self._pending
+            self._pending = ""
+        return out
+
+    def _process(self, text: str) -> str:
+        if self._pending:
+            text = self._pending + text
+            self._pending = ""
+        out: List[str] = []
+        i, n = 0, len(text)
+        while i < n:
+            if self._in_string:
+                i = self._scan_string(text, i, out)
+                continue
+            c = text[i]
+            if c == '"':
+                in_object = bool(self._stack) and self._stack[-1] == "{"
+                self._in_string = True
+                self._string_is_key = in_object and self._expect_key
+                self._limit = None
+                if in_object and not self._string_is_key:
+                    self._limit = self.limits.get(self._last_key)
+                self._count = 0
+                self._key_parts = []
+                out.append(c)
+                i += 1
+            elif c in "{[":
+                self._stack.append(c)
+                self._expect_key = c == "{"
+                out.append(c)
+                i += 1
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                self._expect_key = False
+                out.append(c)
+                i += 1
+            elif c == ":":
+                self._expect_key = False
+                out.append(c)
+                i += 1
+            elif c == ",":
+                self._expect_key = bool(self._stack) and self._stack[-1] == "{"
+                out.append(c)
+                i += 1
+            else:
+                m = _PLAIN_RE.match(text, i)
+                out.append(m.group())
+                i = m.end()
+        return "".join(out)
+
+    def _scan_string(self, text: str, i: int, out: List[str]) -> int:
+        """扫描字符串内部，返回新的位置；遇到不完整的转义序列时缓存剩余文本"""
+        if self._limit is None or self._count > self._limit:
+            # 不截断或已超出上限：不再需要逐个计数，一次跳过到结束引号
+            end = _STRING_BODY_RE.match(text, i).end()
+            if self._limit is None:
+                segment = text[i:end]
+                out.append(segment)
+                if self._string_is_key:
+                    self._key_parts.append(segment)
+            if end == len(text):
+                return end
+            # 停在结束引号或块末尾不完整的转义序列处，交给下面处理
+            i = end
+        m = _STRING_SPECIAL_RE.search(text, i)
+        end = m.start() if m else len(text)
+        if end > i:
+            self._emit(text[i:end], end - i, out)
+        if m is None:
+            return len(text)
+        if m.group() == '"':
+            if self._limit is not None and self._count > self._limit:
+                out.append(self.marker)
+                self.truncated += 1
+            if self._string_is_key:
+                self._last_key = "".join(self._key_parts)
+            self._in_string = False
+            out.append('"')
+            return end + 1
+        # 转义序列：\x 或 \uXXXX，作为一个字符计数；UTF-16 代理对 \uD8xx\uDCxx 作为整体，不会被截断拆开
+        size = 6 if text[end + 1:end + 2] == "u" else 2
+        if size == 6 and _HIGH_SURROGATE_RE.match(text, end) and not (self._closing and end + 12 > len(text)):
+            size = 12
+        if end + size > len(text):
+            self._pending = text[end:]
+            return len(text)
+        if size == 12 and not _LOW_SURROGATE_RE.match(text, end + 6):
+            # 孤立的高位代理，单独处理
+            size = 6
+        self._emit(text[end:end + size], 1, out)
+        return end + size
+
+    def _emit(self, segment: str, chars: int, out: List[str]) -> None:
+        if self._string_is_key:
+            self._key_parts.append(segment)
+        if self._limit is None:
+            out.append(segment)
+        elif self._count < self._limit:
+            room = self._limit - self._count
+            # 转义序列（chars == 1）整体输出，普通文本按剩余字符数截取
+            out.append(segment if chars == 1 else segment[:room])
+        self._count += chars
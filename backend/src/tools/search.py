@@ -3,17 +3,45 @@ from langchain_tavily.tavily_search import TavilySearchAPIWrapper
 from langchain_tavily._utilities import TAVILY_API_URL
 import requests
 import json
+import logging
+import time
 from typing import Optional, List, Dict, Any
-import aiohttp
 from pydantic import PrivateAttr
 from src.tools.search_result_processor import SearchResultProcessor
+from src.tools.http_pool import get_http_pool
+from src.tools.json_stream import TruncatingJSONFilter
+from src.tools.search_cache import get_search_cache, search_key
+
+logger = logging.getLogger(__name__)
+
+# 检索预算可覆盖的工具参数
+_BUDGET_KEYS = ("max_results", "search_depth", "include_raw_content", "include_images")
+# 流式读取响应体的分块大小
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
 def get_search_conf() :
     config = load_yaml_config("config.yaml")
     search_conf = config.get("search", {})
     return search_conf
 
+
+def get_search_budget(kind: Optional[str] = None, search_conf: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    按步骤类型取检索预算（search.budgets），返回搜索工具的参数覆盖
+    - deep: 少量结果 + raw_content，适合深入单一问题的步骤
+    - broad: 更多摘要片段，不带 raw_content，适合覆盖面广的步骤
+    kind 为空或未配置时使用 search.default_budget；都没有配置时返回空字典（沿用工具默认值）
+    """
+    search_conf = get_search_conf() if search_conf is None else search_conf
+    budgets = search_conf.get("budgets") or {}
+    budget = budgets.get(kind or "") or budgets.get(search_conf.get("default_budget") or "") or {}
+    return {key: budget[key] for key in _BUDGET_KEYS if key in budget}
+
+
 class TavilySearchAPI(TavilySearchAPIWrapper):
     _search_conf: dict = PrivateAttr()
+    _metrics: list = PrivateAttr()
     def __init__(self, **kwargs):
         search_conf = get_search_conf()
         api_key = search_conf.get("tavily_api_key")
@@ -21,6 +49,97 @@ class TavilySearchAPI(TavilySearchAPIWrapper):
         super().__init__(tavily_api_key=api_key, **kwargs)
 
         self._search_conf = search_conf
+        # 每次查询的返回体大小统计
+        self._metrics = []
+
+    @property
+    def metrics(self) -> List[Dict[str, Any]]:
+        """每次查询的参数、结果数量与返回体大小"""
+        return list(self._metrics)
+
+    def metrics_summary(self) -> Dict[str, Any]:
+        """汇总查询次数、缓存命中与返回体大小"""
+        return {
+            "queries": len(self._metrics),
+            "cached": sum(1 for m in self._metrics if m["cached"]),
+            "results": sum(m["results"] for m in self._metrics),
+            "payload_bytes": sum(m["payload_bytes"] for m in self._metrics),
+            "wire_bytes": sum(m["wire_bytes"] for m in self._metrics),
+        }
+
+    def _stream_filter(self) -> TruncatingJSONFilter:
+        """
+        按 max_content_length_per_page 边读取边截断长字段，与 SearchResultProcessor 的上限一致：
+        content / 图片描述保留 limit 个字符，raw_content 保留 2 * limit 个字符；未配置上限时不截断
+        """
+        limit = self._search_conf.get("max_content_length_per_page")
+        limits = {}
+        if limit and limit > 0:
+            limits = {"content": limit, "description": limit, "raw_content": limit * 2}
+        return TruncatingJSONFilter(limits)
+
+    def _cache_key(self, params: Dict[str, Any]) -> str:
+        """缓存的是截断后的返回体，截断上限也要参与缓存键"""
+        limit = self._search_conf.get("max_content_length_per_page")
+        return search_key(dict(params, max_content_length_per_page=limit))
+
+    def _build_params(
+        self,
+        query: str,
+        max_results: Optional[int],
+        search_depth: Optional[str],
+        include_domains: Optional[List[str]],
+        exclude_domains: Optional[List[str]],
+        include_answer: Optional[bool],
+        include_raw_content: Optional[bool],
+        include_images: Optional[bool],
+        include_image_descriptions: Optional[bool],
+    ) -> Dict[str, Any]:
+        """同步与异步请求共用的请求体"""
+        return {
+            "api_key": self._search_conf["tavily_api_key"],
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains or [],
+            "exclude_domains": exclude_domains or [],
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+            "include_image_descriptions": include_image_descriptions,
+        }
+
+    def _record(self, params: Dict[str, Any], text: str, elapsed: float, wire_bytes: Optional[int]) -> Dict:
+        """
+        解析返回体并记录本次查询的统计
+        payload_bytes 为截断后的返回体大小，wire_bytes 为读取的原始响应体字节数（命中缓存时为 None）
+        """
+        results = json.loads(text)
+        cached = wire_bytes is None
+        metric = {
+            "query": params["query"],
+            "max_results": params["max_results"],
+            "include_raw_content": params["include_raw_content"],
+            "results": len(results.get("results") or []),
+            "images": len(results.get("images") or []),
+            "payload_bytes": len(text.encode("utf-8")),
+            "wire_bytes": wire_bytes or 0,
+            "elapsed": elapsed,
+            "cached": cached,
+        }
+        self._metrics.append(metric)
+        logger.info(
+            f"[search] {metric['query']!r}: {metric['results']} 条结果, "
+            f"{metric['payload_bytes'] / 1024:.1f}KB (读取 {metric['wire_bytes'] / 1024:.1f}KB), "
+            f"{elapsed:.2f}s{' (缓存)' if cached else ''}"
+        )
+        return results
+
+    @property
+    def _api_url(self) -> str:
+        # 允许在配置中覆盖 Tavily 地址（代理或本地模拟服务）
+        return self._search_conf.get("tavily_api_url") or TAVILY_API_URL
+
     def raw_results(
         self,
         query: str,
@@ -33,25 +152,39 @@ class TavilySearchAPI(TavilySearchAPIWrapper):
         include_images: Optional[bool] = True,
         include_image_descriptions: Optional[bool] = True,
     ) -> Dict:
-        params = {
-            "api_key": self._search_conf["tavily_api_key"],
-            "query": query,
-            "max_results": 2,
-            "search_depth": search_depth,
-            "include_domains": include_domains,
-            "exclude_domains": exclude_domains,
-            "include_answer": include_answer,
-            "include_raw_content": include_raw_content,
-            "include_images": include_images,
-            "include_image_descriptions": include_image_descriptions,
-        }
-        response = requests.post(
-            # type: ignore
-            f"{TAVILY_API_URL}/search",
-            json=params,
+        params = self._build_params(
+            query, max_results, search_depth, include_domains, exclude_domains,
+            include_answer, include_raw_content, include_images, include_image_descriptions,
         )
-        response.raise_for_status()
-        return response.json()
+        started_at = time.perf_counter()
+        wire_bytes = None
+
+        def fetch() -> str:
+            nonlocal wire_bytes
+            # 共享连接池，复用 keep-alive 连接；流式读取并截断长字段
+            # requests 会话没有默认超时，按连接池配置为建立连接与每次读取设置超时
+            pool = get_http_pool()
+            with pool.sync_session().post(
+                # type: ignore
+                f"{self._api_url}/search",
+                json=params,
+                stream=True,
+                timeout=pool.timeout,
+            ) as response:
+                response.raise_for_status()
+                stream_filter = self._stream_filter()
+                parts = [stream_filter.feed(chunk) for chunk in response.iter_content(_STREAM_CHUNK_SIZE)]
+                parts.append(stream_filter.close())
+            wire_bytes = stream_filter.bytes_in
+            return "".join(parts)
+
+        # 与异步路径共用缓存键；其他线程正在请求相同查询时等待那次请求
+        cache = get_search_cache()
+        if cache is None:
+            text = fetch()
+        else:
+            text = cache.get_or_set(self._cache_key(params), fetch)
+        return self._record(params, text, time.perf_counter() - started_at, wire_bytes=wire_bytes)
 
     async def async_raw_results(
         self,
@@ -65,31 +198,42 @@ class TavilySearchAPI(TavilySearchAPIWrapper):
         include_images: Optional[bool] = True,
         include_image_descriptions: Optional[bool] = True,
     ) -> Dict:
+        params = self._build_params(
+            query, max_results, search_depth, include_domains, exclude_domains,
+            include_answer, include_raw_content, include_images, include_image_descriptions,
+        )
+        started_at = time.perf_counter()
+        wire_bytes = None
+
         async def fetch() -> str:
-            params = {
-                "api_key": self._search_conf["tavily_api_key"],
-                "query": query,
-                "max_results": max_results,
-                "search_depth": search_depth,
-                "include_domains": include_domains,
-                "exclude_domains": exclude_domains,
-                "include_answer": include_answer,
-                "include_raw_content": include_raw_content,
-                "include_images": include_images,
-                "include_image_descriptions": include_image_descriptions,
-            }
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    # type: ignore
-                    f"{TAVILY_API_URL}/search",
-                    json=params,
-                ) as response:
-                    if response.status != 200:
-                        raise requests.exceptions.HTTPError(
-                            f"HTTP error {response.status}: {response.text}"
-                        )
-                    return await response.text()
-        return json.loads(await fetch())
+            nonlocal wire_bytes
+            # 进程内共享的会话，复用 DNS 缓存与 keep-alive 连接
+            session = get_http_pool().session()
+            async with session.post(
+                # type: ignore
+                f"{self._api_url}/search",
+                json=params,
+            ) as response:
+                if response.status != 200:
+                    raise requests.exceptions.HTTPError(
+                        f"HTTP error {response.status}: {await response.text()}"
+                    )
+                # 边读取边截断长字段，不在内存中保留完整的网页全文
+                stream_filter = self._stream_filter()
+                parts = []
+                async for chunk in response.content.iter_chunked(_STREAM_CHUNK_SIZE):
+                    parts.append(stream_filter.feed(chunk))
+                parts.append(stream_filter.close())
+                wire_bytes = stream_filter.bytes_in
+                return "".join(parts)
+
+        # 相同的查询（归一化后）在 TTL 内直接复用结果，并发的相同查询只请求一次
+        cache = get_search_cache()
+        if cache is None:
+            text = await fetch()
+        else:
+            text = await cache.get_or_create(self._cache_key(params), fetch)
+        return self._record(params, text, time.perf_counter() - started_at, wire_bytes=wire_bytes)
 
     def clean_results_with_images(
         self, raw_results: Dict[str, List[Dict]]
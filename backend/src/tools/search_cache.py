@@ -0,0 +1,87 @@
+"""
+搜索结果缓存：
+并行的研究步骤经常发出几乎相同的查询，每次都是一次付费的 Tavily 请求。
+以归一化后的查询 + 搜索参数为键缓存原始响应（JSON 文本）：
+- 内存 LRU + SQLite(WAL) 两级缓存，条目带 TTL，相同查询并发请求时只调用一次（见 TTLCache）
+"""
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.config.loader import load_yaml_config
+from src.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# 不参与缓存键的参数（凭据与缓存内容无关）
+_IGNORED_PARAMS = {"api_key"}
+_SPACES_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = "?？!！.。,，;；:： "
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+def normalize_query(query: str) -> str:
+    """查询归一化：全角转半角、小写、合并空白、去掉结尾标点"""
+    query = unicodedata.normalize("NFKC", query or "").lower()
+    query = _SPACES_RE.sub(" ", query).strip()
+    return query.rstrip(_TRAILING_PUNCT)
+
+
+def search_key(params: Dict[str, Any]) -> str:
+    """缓存键：归一化查询 + 其余搜索参数（列表参数按集合处理，顺序无关）"""
+    normalized = {}
+    for name, value in params.items():
+        if name in _IGNORED_PARAMS:
+            continue
+        if name == "query":
+            value = normalize_query(value)
+        elif isinstance(value, (list, tuple)):
+            value = sorted(value)
+        normalized[name] = value
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchCache(TTLCache):
+    """
+    搜索结果缓存
+    - max_entries: 内存 LRU 的条目上限
+    - ttl_seconds: 条目的有效期，None 表示不过期
+    - path: SQLite 文件路径，为空时只使用内存
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600, path: Optional[str] = None):
+        super().__init__(max_entries, ttl_seconds, path, table="search_results", column="response")
+
+
+def create_search_cache(conf: Optional[Dict[str, Any]] = None) -> Optional[SearchCache]:
+    """根据 search_cache 配置创建搜索缓存，enabled 为 false 时返回 None"""
+    conf = conf or {}
+    if not conf.get("enabled", True):
+        return None
+    return SearchCache(
+        max_entries=conf.get("max_entries", 1024),
+        ttl_seconds=conf.get("ttl_seconds", 3600),
+        path=conf.get("path") or None,
+    )
+
+
+_default_cache: Optional[SearchCache] = None
+_default_loaded = False
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """读取 config.yaml 中的 search_cache 配置，返回进程内共享的搜索缓存（未启用时为 None）"""
+    global _default_cache, _default_loaded
+    if not _default_loaded:
+        conf = load_yaml_config(_get_conf_path()).get("search_cache", {}) or {}
+        _default_cache = create_search_cache(conf)
+        _default_loaded = True
+    return _default_cache
@@ -1,8 +1,10 @@
 
 from inspect import cleandoc
+import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Type, Union
 
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -11,10 +13,11 @@ from langchain.callbacks.manager import (
 
 # from langchain_tavily.tavily_search import TavilySearch
 from langchain_community.tools.tavily_search.tool import TavilySearchResults
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from src.tools.search import (
     TavilySearchAPI,
+    get_search_conf,
 )
 
 logger = logging.getLogger(__name__)
@@ -155,3 +158,106 @@ class TavilySearchWithImages(TavilySearchResults):  # type: ignore[override, ove
             self.include_image_descriptions,
         )
         return self._process_results(raw_results)
+
+
+class BatchSearchInput(BaseModel):
+    """Input for the batch search tool."""
+
+    queries: List[str] = Field(
+        description="a list of distinct search queries to look up in one call"
+    )
+
+
+class BatchTavilySearchWithImages(TavilySearchWithImages):  # type: ignore[override, override]
+    """
+    批量搜索工具：一次工具调用接收多个查询，经共享连接池并发请求 Tavily，
+    合并后统一交给 SearchResultProcessor 去重、过滤与排序。
+    一个需要多次搜索的研究步骤只需一轮 agent 交互，而不是每个查询一轮。
+    """
+
+    name: str = "batch_search"
+    description: str = (
+        "A search engine that runs several queries at once. "
+        "Useful when a research step needs information from multiple angles. "
+        "Input should be a list of distinct search queries. "
+        "Returns merged, deduplicated web pages and images."
+    )
+    args_schema: Type[BaseModel] = BatchSearchInput
+
+    max_queries: int = Field(
+        default_factory=lambda: get_search_conf().get("batch_max_queries", 5)
+    )
+    """单次调用最多执行的查询数，多余的查询被忽略"""
+
+    def _dedup_queries(self, queries: List[str]) -> List[str]:
+        """去掉空查询与重复查询，并按 max_queries 截断"""
+        unique = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+        if len(unique) > self.max_queries:
+            logger.warning(f"[batch_search] 查询数 {len(unique)} 超过上限 {self.max_queries}，多余查询被忽略")
+        return unique[: self.max_queries]
+
+    def _search_args(self) -> tuple:
+        return (
+            self.max_results,
+            self.search_depth,
+            self.include_domains,
+            self.exclude_domains,
+            self.include_answer,
+            self.include_raw_content,
+            self.include_images,
+            self.include_image_descriptions,
+        )
+
+    def _merge_results(
+        self, queries: List[str], responses: List[Union[Dict, BaseException]]
+    ) -> Tuple[Union[List[Dict[str, str]], str], Dict]:
+        """合并各查询的原始结果；部分查询失败时保留其余结果，全部失败时抛出第一个异常"""
+        merged: Dict = {"queries": queries, "results": [], "images": [], "failed": []}
+        for query, response in zip(queries, responses):
+            if isinstance(response, BaseException):
+                logger.warning(f"[batch_search] 查询失败: {query}: {response}")
+                merged["failed"].append(query)
+                continue
+            merged["results"].extend(response.get("results") or [])
+            merged["images"].extend(response.get("images") or [])
+        if queries and len(merged["failed"]) == len(queries):
+            raise next(r for r in responses if isinstance(r, BaseException))
+        return self._process_results(merged)
+
+    def _run(
+        self,
+        queries: List[str],
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> Tuple[Union[List[Dict[str, str]], str], Dict]:
+        """Use the tool."""
+        queries = self._dedup_queries(queries)
+        if not queries:
+            return [], {"queries": [], "results": [], "images": [], "failed": []}
+        args = self._search_args()
+
+        def search(query: str) -> Union[Dict, BaseException]:
+            try:
+                return self.api_wrapper.raw_results(query, *args)
+            except Exception as e:
+                return e
+
+        # 各线程共用连接池中的同一个 requests 会话（创建后只读，连接分配是线程安全的，见 HttpPool.sync_session）
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            responses = list(executor.map(search, queries))
+        return self._merge_results(queries, responses)
+
+    async def _arun(
+        self,
+        queries: List[str],
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Tuple[Union[List[Dict[str, str]], str], Dict]:
+        """Use the tool asynchronously."""
+        queries = self._dedup_queries(queries)
+        if not queries:
+            return [], {"queries": [], "results": [], "images": [], "failed": []}
+        args = self._search_args()
+        responses = await asyncio.gather(
+            *[self.api_wrapper.async_raw_results(query, *args) for query in queries],
+            return_exceptions=True,
+        )
+        return self._merge_results(queries, responses)
@@ -0,0 +1,61 @@
+"""
+本地词法检索（BM25）：
+用于在不调用 LLM 的情况下，按与当前查询的相关度给上下文消息排序。
+- 英文/数字按单词切分并转为小写
+- 中文等 CJK 文本没有空格，按相邻两字（bigram）切分，单字片段保留单字
+"""
+import math
+import re
+from collections import Counter
+from typing import List, Sequence
+
+_CJK = r"\u3400-\u9fff\uf900-\ufaff"
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+# 零宽前瞻在 C 层一次取出所有重叠的两字组合
+_CJK_BIGRAM_RE = re.compile(rf"(?=([{_CJK}]{{2}}))")
+_CJK_SINGLE_RE = re.compile(rf"(?<![{_CJK}])[{_CJK}](?![{_CJK}])")
+
+
+def tokenize(text: str) -> List[str]:
+    """切分为检索词（词袋，不保证顺序）"""
+    text = text.lower()
+    terms = _WORD_RE.findall(text)
+    if not text.isascii():
+        terms += _CJK_BIGRAM_RE.findall(text)
+        terms += _CJK_SINGLE_RE.findall(text)
+    return terms
+
+
+class BM25Index:
+    """
+    BM25 索引
+    - documents: 已切分的文档列表，也可以直接传入词频 Counter（调用方缓存切分结果时使用）
+    - k1: 词频饱和参数
+    - b: 文档长度归一化参数
+    """
+
+    def __init__(self, documents: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._tfs = [doc if isinstance(doc, Counter) else Counter(doc) for doc in documents]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        df: Counter = Counter()
+        for tf in self._tfs:
+            df.update(tf.keys())
+        n = len(self._tfs)
+        self._idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query: Sequence[str]) -> List[float]:
+        """每篇文档与查询的相关度得分"""
+        terms = [t for t in set(query) if t in self._idf]
+        results = []
+        for tf, length in zip(self._tfs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
@@ -1,6 +1,6 @@
 # src/utils/token_manager.py
 from ast import comprehension
-from typing import List
+from typing import List, NamedTuple, Optional, Union
 from langchain_core.messages import (
     BaseMessage,
     HumanMessage,
@@ -9,10 +9,16 @@ from langchain_core.messages import (
     SystemMessage,
 )
 import logging
-import copy
 import asyncio
+import random
+from collections import Counter, OrderedDict
+from pathlib import Path
 from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field
 from src.config.loader import load_yaml_config
+from src.utils.bm25 import BM25Index, tokenize
+from src.utils.summary_cache import SummaryCache, block_key
+from src.utils.tokenizer import HeuristicTokenizer, Tokenizer
 
 logger = logging.getLogger(__name__)
 
@@ -23,14 +29,121 @@ def get_search_config():
     return search_config
 import json
 
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+def get_compression_conf() -> dict:
+    """读取 config.yaml 中的 context_compression 配置"""
+    return load_yaml_config(_get_conf_path()).get("context_compression", {}) or {}
+
+# 同时保留开头与结尾时，两段之间的截断标记
+TRUNCATION_MARKER = "\n\n...[内容已截断]...\n\n"
+
+# incremental 模式下保留的滚动摘要检查点数量（并行的研究步骤各自的历史前缀各占一个）
+MAX_ROLLING_CHECKPOINTS = 16
+
+
+class RollingCheckpoint(NamedTuple):
+    """滚动摘要检查点：摘要文本、已覆盖部分中保留的系统消息、覆盖的消息条数与累计压缩次数"""
+    summary: str
+    kept: List[BaseMessage]
+    covered: int
+    count: int
+
+# 对话块语义压缩的提示词
+BLOCK_SUMMARY_PROMPT = """
+        请对以下内容进行压缩总结，保留核心信息和对话要点，同时保持语义连贯性。
+        对话内容：
+        {dialogue_text}
+        
+        请用简洁的语言总结这段文本的主要内容。
+        """
+
+# 多个小对话块合并成一次请求时的提示词，要求按顺序返回每块的总结
+BATCH_SUMMARY_PROMPT = """
+        请分别对以下 {count} 段对话进行压缩总结，保留核心信息和对话要点，同时保持语义连贯性。
+        每段对话单独总结，按顺序返回 {count} 条总结，不要合并或遗漏任何一段。
+        {blocks_text}
+        """
+
+
+# 滚动摘要过长时，合并为一份更精炼的总结
+CONDENSE_SUMMARY_PROMPT = """
+        以下是此前对话按时间顺序的分段总结，请合并为一份更精炼的总结，保留核心信息和对话要点，同时保持语义连贯性。
+        分段总结：
+        {summary}
+        
+        请用简洁的语言输出合并后的总结。
+        """
+
+
+def _part_text(part: Union[str, dict]) -> Optional[str]:
+    """多模态内容元素中的文本：字符串元素或 {"type": "text", "text": ...}，其余元素返回 None"""
+    if isinstance(part, str):
+        return part
+    if isinstance(part, dict) and part.get("type") == "text" and isinstance(part.get("text"), str):
+        return part["text"]
+    return None
+
+
+class BlockSummaries(BaseModel):
+    """批量压缩的结构化输出：与输入对话块一一对应的总结"""
+    summaries: List[str] = Field(description="按输入顺序排列的每段对话的总结")
+
+
 class ContextManager:
-    def __init__(self, llm, max_tokens=32768, prestore_messages_count: int = 2):
+    def __init__(
+        self,
+        llm,
+        max_tokens=32768,
+        prestore_messages_count: int = 2,
+        token_cache_size: int = 16384,
+        tokenizer: Optional[Tokenizer] = None,
+        summary_cache: Optional[SummaryCache] = None,
+        summary_concurrency: int = 4,
+        summary_retries: int = 2,
+        summary_backoff: float = 1.0,
+        summary_batch_tokens: int = 0,
+        compression_mode: str = "full",
+        recent_tokens: Optional[int] = None,
+        truncate_tail_ratio: float = 0.0,
+    ):
         self.llm = llm
+        # 截断超长消息时保留在末尾的 token 比例，0 表示只保留开头
+        self.truncate_tail_ratio = min(max(truncate_tail_ratio, 0.0), 1.0)
+        # full: 每次压缩都重新总结全部历史；incremental: 维护滚动摘要，只总结上次压缩之后新增的消息；
+        # extractive: 按 BM25 相关度从历史中挑选消息放入预算，不调用LLM
+        if compression_mode not in ("full", "incremental", "extractive"):
+            raise ValueError(f"未知的压缩模式: {compression_mode}")
+        self.compression_mode = compression_mode
+        # incremental 模式下末尾原样保留的最近消息的 token 预算（默认 max_tokens 的 1/4）
+        self.recent_tokens = max_tokens // 4 if recent_tokens is None else recent_tokens
+        # 对话块总结的LLM调用控制：并发上限、失败重试次数与指数退避的初始等待（秒）
+        self.summary_concurrency = max(1, summary_concurrency)
+        self.summary_retries = max(0, summary_retries)
+        self.summary_backoff = summary_backoff
+        # >0 时把多个小对话块合并成一次结构化总结请求，每次请求的块总 token 不超过该值
+        self.summary_batch_tokens = summary_batch_tokens
+        self._summary_sem: Optional[tuple] = None
+        # 对话块摘要缓存，为 None 时每次压缩都调用LLM
+        self.summary_cache = summary_cache
+        # token 计数器，默认使用保守估算；传入 BPE 计数器时按真实分词统计
+        self.tokenizer = tokenizer or HeuristicTokenizer()
         # 保存前几条消息，这是重要message，不能被删除
         self.prestore_messages_count = prestore_messages_count
         self.compress_count = 0           # 当前连续裁剪次数
         self.complete_summary_idx = 0           # 最近一次压缩的语义摘要索引
+        # 滚动摘要检查点（incremental 模式），以已覆盖消息前缀的指纹为键；
+        # 同一个实例被并行的研究步骤共用，每段历史各自命中自己的检查点，互不覆盖
+        self._rolling: "OrderedDict[str, RollingCheckpoint]" = OrderedDict()
         self.max_tokens = max_tokens
+        # 单条消息的 token 数缓存（LRU），重复统计同一段历史时只需计算新增消息
+        self.token_cache_size = token_cache_size
+        self._token_cache: "OrderedDict[tuple, int]" = OrderedDict()
+        # 单条消息的检索词频缓存（extractive 模式）
+        self._terms_cache: "OrderedDict[tuple, Counter]" = OrderedDict()
 
     def _message_weight(self, message: BaseMessage) -> float:
         # 根据类型返回权重，值越大表示越“昂贵”（越容易被删）
@@ -44,9 +157,9 @@ class ContextManager:
 
     def _count_text_tokens(self, text: str) -> int:
         """
-        Count tokens in text with different calculations for English and non-English characters.
-        English characters: 4 characters ≈ 1 token
-        Non-English characters (e.g., Chinese): 1 character ≈ 1 token
+        Count tokens in text with the configured tokenizer.
+        Default (heuristic): English characters 4 characters ≈ 1 token,
+        non-English characters (e.g., Chinese) 1 character ≈ 1 token
 
         Args:
             text: Text to count tokens for
@@ -54,24 +167,7 @@ class ContextManager:
         Returns:
             Number of tokens
         """
-        if not text:
-            return 0
-
-        english_chars = 0
-        non_english_chars = 0
-
-        for char in text:
-            # Check if character is ASCII (English letters, digits, punctuation)
-            if ord(char) < 128:
-                english_chars += 1
-            else:
-                non_english_chars += 1
-
-        # Calculate tokens: English at 4 chars/token, others at 1 char/token
-        english_tokens = english_chars // 4
-        non_english_tokens = non_english_chars
-
-        return english_tokens + non_english_tokens
+        return self.tokenizer.count(text)
 
     def count_tokens(self, messages: list[BaseMessage]) -> int:
         """
@@ -83,18 +179,53 @@ class ContextManager:
         return total_length
     
     def _count_one_message(self, message: BaseMessage) -> int:
+        """
+        计算一条消息的token长度（带缓存）
+        """
+        key = self._token_cache_key(message)
+        if key is None:
+            return self._count_one_message_uncached(message)
+        cached = self._token_cache.get(key)
+        if cached is not None:
+            self._token_cache.move_to_end(key)
+            return cached
+        count = self._count_one_message_uncached(message)
+        self._token_cache[key] = count
+        if len(self._token_cache) > self.token_cache_size:
+            self._token_cache.popitem(last=False)
+        return count
+
+    def _token_cache_key(self, message: BaseMessage):
+        """
+        消息的缓存键：类型 + 消息 id + 内容
+        内容字符串的哈希值由 Python 缓存，重复查询同一条消息几乎没有开销；
+        没有 id 且带 additional_kwargs 的消息无法可靠区分，不缓存
+        """
+        if not self.token_cache_size:
+            return None
+        message_id = getattr(message, "id", None)
+        if message_id is None and getattr(message, "additional_kwargs", None):
+            return None
+        content = getattr(message, "content", None)
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        return message.__class__.__name__, message_id, content
+
+    def _count_one_message_uncached(self, message: BaseMessage) -> int:
         """
         计算一条消息的token长度
         """
         total_token = 0
         # Count tokens in content field
         if hasattr(message, "content") and message.content:
-            total_token += self._count_text_tokens(message.content)
+            total_token += self._count_content_tokens(message.content)
         
         if hasattr(message, "type") and message.type:
             total_token += self._count_text_tokens(message.type)
         
-        total_token = int(total_token*self._message_weight(message))
+        # 估算不精确时按消息类型放大；真实分词无需额外的保守系数
+        if not self.tokenizer.exact:
+            total_token = int(total_token*self._message_weight(message))
         
         if hasattr(message,"additional_kwargs") and message.additional_kwargs:
             total_token += self._count_text_tokens(json.dumps(message.additional_kwargs, ensure_ascii=False))
@@ -111,29 +242,60 @@ class ContextManager:
         return self.count_tokens(messages) > self.max_tokens
 
 
-    def compress_messages(self, messages: list) -> list:
+    def compress_messages(self, messages: list, query: Optional[str] = None) -> list:
+        """
+        压缩上下文（同步版本，供脚本使用；在事件循环中请使用 acompress_messages）
+        query: extractive 模式下用于排序的查询，默认取最后一条用户消息
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._acompress_messages(messages, query))
+        raise RuntimeError("compress_messages 不能在运行中的事件循环内调用，请使用 acompress_messages")
+
+    async def acompress_messages(self, messages: list, query: Optional[str] = None) -> list:
+        """
+        异步压缩上下文：直接在当前事件循环中并行总结各对话块，
+        等待 LLM 期间其他研究步骤可以继续执行
+        query: extractive 模式下用于排序的查询，默认取最后一条用户消息
+        """
+        return await self._acompress_messages(messages, query)
+
+    async def _acompress_messages(self, messages: list, query: Optional[str] = None) -> list:
         """
-        压缩上下文
+        压缩上下文，同步与异步版本共用
         """
-        # 检查是否需要压缩
-        if not self.is_over_limit(messages):
+        # 检查是否需要压缩（只统计一次，日志复用该结果）
+        total_tokens = self.count_tokens(messages)
+        if total_tokens <= self.max_tokens:
             return messages
-        logger.info(f"上下文超出token限制，当前token长度: {self.count_tokens(messages)}")
-        # 进行压缩
-        compressed_messages = self._compress_messages(messages)
+        logger.info(f"上下文超出token限制，当前token长度: {total_tokens}")
+        # 1.保留指定长度的头消息，以保留系统提示和用户输入
+        prefix_messages, truncated = self._split_prefix_messages(messages)
+        if truncated:
+            compressed_messages = prefix_messages
+        elif self.compression_mode == "extractive":
+            compressed_messages = prefix_messages + self._extractive_pack(messages, len(prefix_messages), query)
+        else:
+            # 2. 语义压缩头消息之后的部分，再与头消息合并
+            suffix_messages = await self._asummarize_suffix(messages[len(prefix_messages):])
+            compressed_messages = prefix_messages + suffix_messages
 
-        logger.info(f"压缩前token长度: {self.count_tokens(messages)}")
+        logger.info(f"压缩前token长度: {total_tokens}")
         logger.info(f"压缩后token长度: {self.count_tokens(compressed_messages)}")
-        
+
         return compressed_messages
-    
+
     def _truncate_message_content(
         self, message: BaseMessage, max_tokens: int
     ) -> BaseMessage:
         """
-        Truncate message content while preserving all other attributes by copying the original message
-        and only modifying its content attribute.
-        
+        Truncate message content to at most max_tokens tokens (as counted by the tokenizer).
+        The returned message is a shallow model_copy with only content replaced,
+        so large additional_kwargs / tool calls are shared instead of deep-copied.
+        With truncate_tail_ratio > 0, the head and the tail of the content are kept
+        and joined by TRUNCATION_MARKER.
+
         Args:
             message: The message to truncate
             max_tokens: Maximum number of tokens to keep
@@ -141,22 +303,94 @@ class ContextManager:
         Returns:
             New message instance with truncated content
         """
+        content = message.content
+        if not isinstance(content, str):
+            # 多模态内容（列表）按元素的 token 数截断
+            return message.model_copy(update={"content": self._truncate_content_parts(content, max_tokens)})
+        if self._count_text_tokens(content) <= max_tokens:
+            return message.model_copy()
 
-        # Create a deep copy of the original message to preserve all attributes
-        truncated_message = copy.deepcopy(message)
+        tail_budget = int(max_tokens * self.truncate_tail_ratio)
+        marker_tokens = self._count_text_tokens(TRUNCATION_MARKER)
+        head_budget = max_tokens - tail_budget - marker_tokens
+        if tail_budget <= 0 or head_budget <= 0:
+            return message.model_copy(update={"content": content[:self._fit_prefix(content, max_tokens)]})
 
-        # Truncate only the content attribute
-        truncated_message.content = message.content[:max_tokens]
-        
-        return truncated_message
+        head = content[:self._fit_prefix(content, head_budget)]
+        tail_len = self._fit_suffix(content, tail_budget)
+        tail = content[len(content) - tail_len:] if tail_len else ""
+        return message.model_copy(update={"content": head + TRUNCATION_MARKER + tail})
+
+    def _count_content_tokens(self, content: Union[str, list]) -> int:
+        """
+        消息内容的 token 数；多模态内容（列表）按元素累加
+        """
+        if isinstance(content, str):
+            return self._count_text_tokens(content)
+        return sum(self._count_part_tokens(part) for part in content)
+
+    def _count_part_tokens(self, part: Union[str, dict]) -> int:
+        """
+        多模态内容中一个元素的 token 数：文本元素按文本计算，其余元素（图片等）按其 JSON 计算
+        """
+        text = _part_text(part)
+        if text is not None:
+            return self._count_text_tokens(text)
+        return self._count_text_tokens(json.dumps(part, ensure_ascii=False))
 
-    def _compress_messages(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+    def _truncate_content_parts(self, parts: list, max_tokens: int) -> list:
+        """
+        按元素累加 token 数截断多模态内容：放不下的文本元素截取前缀，放不下的其他元素及之后的元素丢弃
         """
-        压缩上下文
+        kept = []
+        remaining = max_tokens
+        for part in parts:
+            cost = self._count_part_tokens(part)
+            if cost <= remaining:
+                kept.append(part)
+                remaining -= cost
+                continue
+            text = _part_text(part)
+            if text is not None and remaining > 0:
+                text = text[:self._fit_prefix(text, remaining)]
+                if text:
+                    kept.append(text if isinstance(part, str) else {**part, "text": text})
+            break
+        return kept
+
+    def _fit_prefix(self, text: str, max_tokens: int) -> int:
+        """
+        二分查找 token 数不超过 max_tokens 的最长前缀长度（字符数）
+        """
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._count_text_tokens(text[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def _fit_suffix(self, text: str, max_tokens: int) -> int:
+        """
+        二分查找 token 数不超过 max_tokens 的最长后缀长度（字符数）
+        """
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._count_text_tokens(text[len(text) - mid:]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def _split_prefix_messages(self, messages: list[BaseMessage]) -> tuple[list[BaseMessage], bool]:
+        """
+        保留指定长度的头消息，以保留系统提示和用户输入
+        返回 (头消息, 是否因预算耗尽而截断)；截断时不再需要压缩后续消息
         """
         available_token = self.max_tokens
         prefix_messages = []
-        # 1.保留指定长度的头消息，以保留系统提示和用户输入
         for i in range(min(self.prestore_messages_count, len(messages))):
             cur_token_cnt = self._count_one_message(messages[i])
             if available_token > 0 and available_token >= cur_token_cnt:
@@ -168,22 +402,231 @@ class ContextManager:
                     messages[i], available_token
                 )
                 prefix_messages.append(truncated_message)
-                return prefix_messages
+                return prefix_messages, True
             else:
                 break
-        # 2. 使用 语义压缩
-        suffix_messages = self._semantic_summarize(messages[len(prefix_messages):])
-        # 3. 合并前缀消息和压缩后的后缀消息
-        compressed_messages = prefix_messages + suffix_messages
+        return prefix_messages, False
 
-        return compressed_messages
-    
-    def _semantic_summarize(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+    def _extractive_pack(
+        self, messages: list[BaseMessage], start: int, query: Optional[str] = None
+    ) -> list[BaseMessage]:
         """
-        语义压缩上下文
+        抽取式压缩（不调用LLM）：
+        - 头消息之后的系统消息与最后一条消息（当前步骤的任务）固定保留
+        - 其余消息按 BM25 与查询的相关度从高到低放入剩余预算，同分时新消息优先，最后按原顺序输出
+        - 带 tool_calls 的 AIMessage 与其 ToolMessage 作为一个整体取舍，保证工具调用成对出现
         """
-        # 使用异步方式并行处理
-        return asyncio.run(self._async_semantic_summarize(messages))
+        suffix = messages[start:]
+        if not suffix:
+            return []
+        if query is None:
+            query = next(
+                (m.content for m in reversed(messages) if isinstance(m, HumanMessage) and isinstance(m.content, str)),
+                "",
+            )
+
+        pinned = {i for i, m in enumerate(suffix) if isinstance(m, SystemMessage)}
+        pinned.add(len(suffix) - 1)
+        budget = self.max_tokens - self.count_tokens(messages[:start])
+        suffix, pinned = self._fit_pinned(suffix, pinned, budget)
+        budget -= sum(self._count_one_message(suffix[i]) for i in pinned)
+
+        units = [unit for unit in self._message_units(suffix) if not pinned.intersection(unit)]
+        documents = [
+            self._message_terms(suffix[unit[0]]) if len(unit) == 1
+            else sum((self._message_terms(suffix[i]) for i in unit), Counter())
+            for unit in units
+        ]
+        scores = BM25Index(documents).scores(tokenize(query or ""))
+        selected = set(pinned)
+        for n in sorted(range(len(units)), key=lambda n: (-scores[n], -units[n][0])):
+            cost = sum(self._count_one_message(suffix[i]) for i in units[n])
+            if cost <= budget:
+                selected.update(units[n])
+                budget -= cost
+
+        logger.info(f"抽取式压缩：{len(suffix)} 条消息中保留 {len(selected)} 条")
+        return [suffix[i] for i in sorted(selected)]
+
+    def _fit_pinned(
+        self, suffix: list[BaseMessage], pinned: set[int], budget: int
+    ) -> tuple[list[BaseMessage], set[int]]:
+        """
+        固定保留的消息超出预算时，从最长的一条开始截断，截断后仍放不下的才丢弃
+        返回 (替换了截断消息的 suffix 副本, 仍保留的下标)
+        """
+        costs = {i: self._count_one_message(suffix[i]) for i in pinned}
+        overflow = sum(costs.values()) - budget
+        if overflow <= 0:
+            return suffix, pinned
+        suffix, pinned = list(suffix), set(pinned)
+        for i in sorted(costs, key=lambda i: -costs[i]):
+            if overflow <= 0:
+                break
+            fitted = self._fit_message(suffix[i], costs[i] - overflow)
+            if fitted is None:
+                pinned.discard(i)
+                overflow -= costs[i]
+            else:
+                suffix[i] = fitted
+                overflow -= costs[i] - self._count_one_message(fitted)
+        return suffix, pinned
+
+    def _fit_message(self, message: BaseMessage, max_tokens: int) -> Optional[BaseMessage]:
+        """
+        截断消息内容，使整条消息（含类型、附加字段与估算系数）的 token 数不超过 max_tokens
+        内容清空后仍然超出时返回 None
+        """
+        content_budget = max_tokens
+        while content_budget > 0:
+            fitted = self._truncate_message_content(message, content_budget)
+            excess = self._count_one_message(fitted) - max_tokens
+            if excess <= 0:
+                return fitted
+            content_budget -= max(1, excess)
+        return None
+
+    def _message_units(self, messages: list[BaseMessage]) -> list[list[int]]:
+        """
+        把消息划分为取舍单元：带 tool_calls 的 AIMessage 连同紧随其后的 ToolMessage 为一个单元，
+        没有对应调用的 ToolMessage 归入前一个单元，其余消息各自成为一个单元
+        """
+        units: list[list[int]] = []
+        for i, msg in enumerate(messages):
+            if isinstance(msg, ToolMessage) and units:
+                units[-1].append(i)
+            else:
+                units.append([i])
+        return units
+
+    def _message_terms(self, message: BaseMessage) -> Counter:
+        """
+        消息的检索词频（带缓存，与 token 数缓存使用相同的键），重复压缩同一段历史时无需重新切分
+        """
+        key = self._token_cache_key(message)
+        terms = self._terms_cache.get(key) if key is not None else None
+        if terms is not None:
+            self._terms_cache.move_to_end(key)
+            return terms
+        terms = Counter(tokenize(self._message_text(message)))
+        if key is not None:
+            self._terms_cache[key] = terms
+            if len(self._terms_cache) > self.token_cache_size:
+                self._terms_cache.popitem(last=False)
+        return terms
+
+    def _message_text(self, message: BaseMessage) -> str:
+        """
+        参与相关度计算的文本：内容与工具调用参数
+        """
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            content += " " + json.dumps([call.get("args", {}) for call in tool_calls], ensure_ascii=False)
+        return content
+
+    async def _asummarize_suffix(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """
+        按压缩模式总结头消息之后的部分
+        """
+        if self.compression_mode == "incremental":
+            return await self._async_incremental_summarize(messages)
+        return await self._async_semantic_summarize(messages)
+
+    def _recent_start(self, messages: list[BaseMessage]) -> int:
+        """
+        末尾在 recent_tokens 预算内的消息原样保留，返回其起始位置
+        """
+        budget = self.recent_tokens
+        start = len(messages)
+        while start > 0:
+            cost = self._count_one_message(messages[start - 1])
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+        return start
+
+    async def _async_incremental_summarize(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """
+        增量语义压缩：
+        - 末尾的最近消息原样保留（每个研究步骤各不相同的任务提示在这里，不进入检查点）
+        - 之前的消息折叠进滚动摘要；与上次压缩覆盖的消息相同时，只总结新增的部分
+        - 历史被改写（前缀不一致）时丢弃检查点，重新总结
+        """
+        recent_start = self._recent_start(messages)
+        fold, recent = messages[:recent_start], messages[recent_start:]
+
+        checkpoint = self._find_rolling_checkpoint(fold)
+        if checkpoint is None:
+            covered, summary, kept, count = 0, "", [], 0
+        else:
+            covered, summary, kept, count = (
+                checkpoint.covered, checkpoint.summary, list(checkpoint.kept), checkpoint.count
+            )
+
+        new_messages = [msg for msg in fold[covered:] if not isinstance(msg, ToolMessage)]
+        new_kept, blocks = self._group_dialogue_blocks(new_messages)
+        if self.summary_batch_tokens > 0:
+            block_summaries = await self._summarize_blocks_batched(blocks)
+        else:
+            block_summaries = await asyncio.gather(*[
+                self._async_summarize_dialogue_block(block) for block in blocks
+            ])
+        summary = "\n\n".join(part for part in [summary] + [m.content for m in block_summaries] if part)
+        kept += new_kept
+        # 滚动摘要本身过长时再合并压缩一次
+        if self._count_text_tokens(summary) > self.max_tokens // 2:
+            summary = await self._condense_rolling_summary(summary)
+
+        # 有块总结失败时不推进检查点，避免把占位符永久写入滚动摘要
+        if all("original_block_size" in m.additional_kwargs for m in block_summaries):
+            key = block_key(fold)
+            self._rolling[key] = RollingCheckpoint(summary, kept, len(fold), count + 1)
+            self._rolling.move_to_end(key)
+            while len(self._rolling) > MAX_ROLLING_CHECKPOINTS:
+                self._rolling.popitem(last=False)
+            self.complete_summary_idx = len(fold)
+            self.compress_count = count + 1
+        logger.info(
+            f"增量压缩：新增 {len(fold) - covered} 条消息（{len(blocks)} 个块），"
+            f"滚动摘要覆盖 {len(fold)} 条，保留最近 {len(recent)} 条"
+        )
+
+        if not summary:
+            return kept + recent
+        rolling_message = AIMessage(
+            content=summary,
+            additional_kwargs={"rolling_summary": True, "summarized_messages": len(fold)},
+        )
+        return kept + [rolling_message] + recent
+
+    def _find_rolling_checkpoint(self, fold: list[BaseMessage]) -> Optional[RollingCheckpoint]:
+        """
+        找到覆盖 fold 最长前缀的滚动摘要检查点，没有时返回 None
+        """
+        keys_by_length: dict[int, set] = {}
+        for key, checkpoint in self._rolling.items():
+            if checkpoint.covered <= len(fold):
+                keys_by_length.setdefault(checkpoint.covered, set()).add(key)
+        for length in sorted(keys_by_length, reverse=True):
+            key = block_key(fold[:length])
+            if key in keys_by_length[length]:
+                self._rolling.move_to_end(key)
+                return self._rolling[key]
+        return None
+
+    async def _condense_rolling_summary(self, summary: str) -> str:
+        """
+        合并压缩过长的滚动摘要；失败时保留原摘要
+        """
+        prompt = CONDENSE_SUMMARY_PROMPT.format(summary=summary)
+        try:
+            response = await self._call_llm(lambda: self.llm.ainvoke([HumanMessage(content=prompt)]))
+        except Exception as e:
+            logger.error(f"滚动摘要合并失败：{e}")
+            return summary
+        return response.content if hasattr(response, 'content') else str(response)
     
     def _group_dialogue_blocks(self, messages: list[BaseMessage], max_block_tokens: int = 1500):
         """
@@ -243,11 +686,14 @@ class ContextManager:
             # 先添加占位符，稍后替换
             processed_messages.append(None)
         
-        # 4. 并行执行所有异步任务
-        results = await asyncio.gather(*[
-            self._async_summarize_dialogue_block(task['block_messages'])
-            for task in block_tasks
-        ])
+        # 4. 并行执行所有异步任务（LLM调用受 summary_concurrency 限制）
+        if self.summary_batch_tokens > 0:
+            results = await self._summarize_blocks_batched([task['block_messages'] for task in block_tasks])
+        else:
+            results = await asyncio.gather(*[
+                self._async_summarize_dialogue_block(task['block_messages'])
+                for task in block_tasks
+            ])
         
         # 5. 根据任务位置替换占位符
         for task, compressed_block in zip(block_tasks, results):
@@ -335,38 +781,148 @@ class ContextManager:
     async def _async_summarize_dialogue_block(self, block_messages: list[BaseMessage]) -> BaseMessage:
         """
         异步对对话块进行语义压缩
+        配置了摘要缓存时，相同内容的对话块直接复用已有摘要，不再调用LLM
+        """
+        try:
+            if self.summary_cache is None:
+                summary_content = await self._summarize_block_text(block_messages)
+            else:
+                key = block_key(block_messages, namespace=self._summary_namespace())
+                summary_content = await self.summary_cache.get_or_create(
+                    key, lambda: self._summarize_block_text(block_messages)
+                )
+
+            logger.info(f"对话块压缩：{len(block_messages)}条消息 -> 1条总结消息")
+            return self._summary_message(summary_content, block_messages)
+            
+        except Exception as e:
+            logger.error(f"语义压缩失败：{e}")
+            # 如果压缩失败，返回第一条消息作为占位符（不写入缓存）
+            return AIMessage(content=f"[压缩失败] {block_messages[0].content[:100]}...")
+
+    async def _summarize_block_text(self, block_messages: list[BaseMessage]) -> str:
+        """
+        调用LLM总结一个对话块，返回摘要文本
+        """
+        # 使用LLM进行语义压缩
+        prompt = BLOCK_SUMMARY_PROMPT.format(dialogue_text=self._dialogue_text(block_messages))
+        
+        # 异步调用LLM进行总结
+        response = await self._call_llm(lambda: self.llm.ainvoke([HumanMessage(content=prompt)]))
+        return response.content if hasattr(response, 'content') else str(response)
+
+    def _dialogue_text(self, block_messages: list[BaseMessage]) -> str:
+        """
+        构建对话文本
         """
-        # 构建对话文本
         dialogue_text = ""
         for msg in block_messages:
             role = "user" if isinstance(msg, HumanMessage) else "assistant"
             dialogue_text += f"{role}: {msg.content}\n"
-        
-        # 使用LLM进行语义压缩
-        prompt = f"""
-        请对以下内容进行压缩总结，保留核心信息和对话要点，同时保持语义连贯性。
-        对话内容：
-        {dialogue_text}
-        
-        请用简洁的语言总结这段文本的主要内容。
+        return dialogue_text
+
+    def _summary_message(self, summary_content: str, block_messages: list[BaseMessage]) -> AIMessage:
         """
-        
+        创建总结消息（使用AIMessage类型）
+        """
+        return AIMessage(
+            content=f"{summary_content}",
+            additional_kwargs={"original_block_size": len(block_messages)}
+        )
+
+    def _get_summary_semaphore(self) -> asyncio.Semaphore:
+        """
+        总结调用的并发信号量；同步接口每次 asyncio.run 都是新的事件循环，按循环重新创建
+        """
+        loop = asyncio.get_running_loop()
+        if self._summary_sem is None or self._summary_sem[0] is not loop:
+            self._summary_sem = (loop, asyncio.Semaphore(self.summary_concurrency))
+        return self._summary_sem[1]
+
+    async def _call_llm(self, call):
+        """
+        在并发上限内调用LLM，失败时按指数退避（带随机抖动）重试；退避等待期间不占用并发槽位
+        """
+        semaphore = self._get_summary_semaphore()
+        for attempt in range(self.summary_retries + 1):
+            async with semaphore:
+                try:
+                    return await call()
+                except Exception as e:
+                    error = e
+            if attempt == self.summary_retries:
+                raise error
+            delay = self.summary_backoff * (2 ** attempt) * (1 + random.random())
+            logger.warning(f"语义压缩调用失败，{delay:.1f}s 后第{attempt + 1}次重试：{error}")
+            await asyncio.sleep(delay)
+
+    async def _summarize_blocks_batched(self, blocks: list[list[BaseMessage]]) -> list[BaseMessage]:
+        """
+        批量压缩：已缓存的块直接复用，其余的小块按 summary_batch_tokens 打包，
+        每包一次结构化总结请求；超过上限的大块仍单独总结
+        """
+        results: list = [None] * len(blocks)
+        namespace = self._summary_namespace()
+        batches: list[list[int]] = []
+        current: list[int] = []
+        current_tokens = 0
+        for i, block in enumerate(blocks):
+            if self.summary_cache is not None:
+                cached = self.summary_cache.get(block_key(block, namespace=namespace))
+                if cached is not None:
+                    results[i] = self._summary_message(cached, block)
+                    continue
+            block_tokens = self.count_tokens(block)
+            if current and current_tokens + block_tokens > self.summary_batch_tokens:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += block_tokens
+        if current:
+            batches.append(current)
+
+        async def run_batch(indexes: list[int]):
+            if len(indexes) == 1:
+                results[indexes[0]] = await self._async_summarize_dialogue_block(blocks[indexes[0]])
+                return
+            batch_blocks = [blocks[i] for i in indexes]
+            for i, message in zip(indexes, await self._async_summarize_block_batch(batch_blocks)):
+                results[i] = message
+
+        await asyncio.gather(*[run_batch(indexes) for indexes in batches])
+        return results
+
+    async def _async_summarize_block_batch(self, batch_blocks: list[list[BaseMessage]]) -> list[BaseMessage]:
+        """
+        一次请求总结多个对话块；返回的总结数量与块数不一致或请求失败时，退回逐块总结
+        """
+        blocks_text = "\n".join(
+            f"### 对话 {i + 1}\n{self._dialogue_text(block)}" for i, block in enumerate(batch_blocks)
+        )
+        prompt = BATCH_SUMMARY_PROMPT.format(count=len(batch_blocks), blocks_text=blocks_text)
         try:
-            # 异步调用LLM进行总结
-            response = await self.llm.ainvoke([HumanMessage(content=prompt)])
-            summary_content = response.content if hasattr(response, 'content') else str(response)
-            
-            # 创建总结消息（使用AIMessage类型）
-            summary_message = AIMessage(
-                content=f"{summary_content}",
-                additional_kwargs={"original_block_size": len(block_messages)}
-            )
-            
-            logger.info(f"对话块压缩：{len(block_messages)}条消息 -> 1条总结消息")
-            return summary_message
-            
+            struct_llm = self.llm.with_structured_output(BlockSummaries)
+            response = await self._call_llm(lambda: struct_llm.ainvoke([HumanMessage(content=prompt)]))
+            summaries = response.summaries
+            if len(summaries) != len(batch_blocks):
+                raise ValueError(f"返回 {len(summaries)} 条总结，期望 {len(batch_blocks)} 条")
         except Exception as e:
-            logger.error(f"语义压缩失败：{e}")
-            # 如果压缩失败，返回第一条消息作为占位符
-            return AIMessage(content=f"[压缩失败] {block_messages[0].content[:100]}...")
+            logger.warning(f"批量语义压缩失败，改为逐块压缩：{e}")
+            return list(await asyncio.gather(*[
+                self._async_summarize_dialogue_block(block) for block in batch_blocks
+            ]))
+
+        if self.summary_cache is not None:
+            namespace = self._summary_namespace()
+            for block, summary in zip(batch_blocks, summaries):
+                self.summary_cache.set(block_key(block, namespace=namespace), summary)
+        logger.info(f"批量对话块压缩：{len(batch_blocks)}个块 -> 1次请求")
+        return [self._summary_message(summary, block) for block, summary in zip(batch_blocks, summaries)]
+
+    def _summary_namespace(self) -> str:
+        """
+        摘要缓存的命名空间：模型或提示词变化后旧摘要不再命中
+        """
+        model = getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None) or ""
+        return f"{model if isinstance(model, str) else ''}\n{BLOCK_SUMMARY_PROMPT}"
         
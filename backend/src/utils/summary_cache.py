@@ -0,0 +1,67 @@
+"""
+对话块语义摘要缓存：
+以对话块内容的哈希为键缓存 LLM 生成的摘要，同一段历史被多个研究步骤、报告合并
+或多次运行重复压缩时不再调用 LLM。
+- 内存 LRU + SQLite(WAL) 两级缓存，同一个块并发请求时只调用一次 LLM（见 TTLCache）
+"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from src.config.loader import load_yaml_config
+from src.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+def block_key(messages: Iterable[Any], namespace: str = "") -> str:
+    """
+    对话块的内容哈希：只取消息类型与内容，消息 id 等元数据不影响结果
+    namespace 用于区分模型、提示词等会改变摘要的因素
+    """
+    payload = json.dumps(
+        [namespace] + [[getattr(m, "type", ""), getattr(m, "content", "")] for m in messages],
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryCache(TTLCache):
+    """
+    摘要缓存
+    - max_entries: 内存 LRU 的条目上限
+    - path: SQLite 文件路径，为空时只使用内存
+    - ttl_seconds: 条目的过期时间，None 表示不过期
+    """
+
+    def __init__(self, max_entries: int = 2048, path: Optional[str] = None, ttl_seconds: Optional[float] = None):
+        super().__init__(max_entries, ttl_seconds, path, table="block_summaries", column="summary")
+
+
+def create_summary_cache(conf: Optional[Dict[str, Any]] = None) -> SummaryCache:
+    """根据 summary_cache 配置创建摘要缓存"""
+    conf = conf or {}
+    return SummaryCache(
+        max_entries=conf.get("max_entries", 2048),
+        path=conf.get("path") or None,
+        ttl_seconds=conf.get("ttl_seconds"),
+    )
+
+
+_default_cache: Optional[SummaryCache] = None
+
+
+def get_summary_cache() -> SummaryCache:
+    """读取 config.yaml 中的 summary_cache 配置，返回进程内共享的摘要缓存"""
+    global _default_cache
+    if _default_cache is None:
+        conf = load_yaml_config(_get_conf_path()).get("summary_cache", {}) or {}
+        _default_cache = create_summary_cache(conf)
+    return _default_cache
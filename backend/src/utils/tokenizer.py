@@ -0,0 +1,229 @@
+"""
+token 计数器：
+- Tokenizer: 计数接口，ContextManager 通过它统计文本的 token 数
+- HeuristicTokenizer: 估算（4 个 ASCII 字符 ≈ 1 token，1 个非 ASCII 字符 ≈ 1 token），偏保守
+- BPETokenizer: 加载本地 tiktoken 格式词表（每行 "base64(token) rank"）的字节级 BPE，
+  不需要联网；按预分词后的片段做 LRU 缓存，安装了 tiktoken 时使用其原生实现加速
+"""
+import base64
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.loader import load_yaml_config
+
+logger = logging.getLogger(__name__)
+
+# bytes.translate 的删除表：删除所有 ASCII 字节后，剩下的都是多字节字符的组成字节
+_ASCII_BYTES = bytes(range(128))
+
+# 预分词正则（与 tiktoken 的 cl100k_base / o200k_base 一致），需要 regex 包
+PATTERNS = {
+    "cl100k": (
+        r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+"""
+        r"""|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+    ),
+    "o200k": "|".join([
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+        r"""\p{N}{1,3}""",
+        r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+        r"""\s*[\r\n]+""",
+        r"""\s+(?!\S)""",
+        r"""\s+""",
+    ]),
+}
+
+
+def _get_conf_path() -> Path:
+    return Path(__file__).parent.parent.parent / "config.yaml"
+
+
+class Tokenizer(ABC):
+    """
+    token 计数接口
+    - exact: 计数是否与模型的真实分词一致；不精确的计数器由 ContextManager 额外乘以保守权重
+    """
+
+    name = "base"
+    exact = False
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """返回文本的 token 数"""
+
+
+class HeuristicTokenizer(Tokenizer):
+    """按字符类别估算 token 数，结果大于真实值，可以避免LLM调用时超出token限制"""
+
+    name = "heuristic"
+    exact = False
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+
+        # 纯 ASCII 文本（代码、英文工具输出）直接按长度计算
+        if text.isascii():
+            return len(text) // 4
+
+        # 按字节统计 ASCII 字符数：删除 ASCII 字节后剩余的都是非 ASCII 字符的字节
+        encoded = text.encode("utf-8", "surrogatepass")
+        english_chars = len(encoded) - len(encoded.translate(None, _ASCII_BYTES))
+        non_english_chars = len(text) - english_chars
+
+        # English at 4 chars/token, others at 1 char/token
+        return english_chars // 4 + non_english_chars
+
+
+def load_bpe_ranks(vocab_path: str) -> Dict[bytes, int]:
+    """读取 tiktoken 格式的词表文件：每行 "base64(token) rank"，空行忽略"""
+    ranks: Dict[bytes, int] = {}
+    with open(vocab_path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            token, rank = line.split()
+            ranks[base64.b64decode(token)] = int(rank)
+    return ranks
+
+
+class BPETokenizer(Tokenizer):
+    """
+    字节级 BPE 计数器
+    - vocab_path: 本地 tiktoken 格式词表，例如 cl100k_base.tiktoken
+    - pattern: 预分词正则，可以是 PATTERNS 中的名称或自定义正则
+    - cache_size: 片段 -> token 序列的 LRU 缓存大小（纯 Python 实现时生效）
+    - use_tiktoken: 安装了 tiktoken 时使用其原生实现（结果相同，速度更快）
+    """
+
+    name = "bpe"
+    exact = True
+
+    def __init__(
+        self,
+        vocab_path: str,
+        pattern: str = "cl100k",
+        cache_size: int = 8192,
+        use_tiktoken: bool = True,
+    ):
+        import regex
+
+        self.vocab_path = vocab_path
+        self.pattern = PATTERNS.get(pattern, pattern)
+        self.ranks = load_bpe_ranks(vocab_path)
+        missing = [b for b in range(256) if bytes([b]) not in self.ranks]
+        if missing:
+            raise ValueError(f"词表 {vocab_path} 缺少 {len(missing)} 个单字节 token，无法进行字节级 BPE")
+        self._regex = regex.compile(self.pattern)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._encoding = self._load_tiktoken() if use_tiktoken else None
+
+    def _load_tiktoken(self):
+        try:
+            import tiktoken
+        except ImportError:
+            return None
+        return tiktoken.Encoding(
+            name=f"local:{Path(self.vocab_path).stem}",
+            pat_str=self.pattern,
+            mergeable_ranks=self.ranks,
+            special_tokens={},
+        )
+
+    @property
+    def backend(self) -> str:
+        """实际使用的实现：tiktoken 或 python"""
+        return "tiktoken" if self._encoding is not None else "python"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode_ordinary(text))
+        return sum(len(self._encode_chunk(chunk)) for chunk in self._regex.findall(text))
+
+    def encode(self, text: str) -> List[int]:
+        """编码为 token id 序列（不处理特殊 token）"""
+        if not text:
+            return []
+        if self._encoding is not None:
+            return self._encoding.encode_ordinary(text)
+        ids: List[int] = []
+        for chunk in self._regex.findall(text):
+            ids.extend(self._encode_chunk(chunk))
+        return ids
+
+    def _encode_chunk(self, chunk: str) -> Tuple[int, ...]:
+        cached = self._cache.get(chunk)
+        if cached is not None:
+            self._cache.move_to_end(chunk)
+            return cached
+        ids = self._byte_pair_encode(chunk.encode("utf-8", "surrogatepass"))
+        if self.cache_size:
+            self._cache[chunk] = ids
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return ids
+
+    def _byte_pair_encode(self, piece: bytes) -> Tuple[int, ...]:
+        # 整个片段在词表中（常见单词）时无需合并
+        rank = self.ranks.get(piece)
+        if rank is not None:
+            return (rank,)
+        # 反复合并 rank 最小的相邻片段，直到没有可合并的片段
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        ranks = self.ranks
+        while len(parts) > 1:
+            best_rank = None
+            best_idx = -1
+            for i in range(len(parts) - 1):
+                rank = ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank = rank
+                    best_idx = i
+            if best_rank is None:
+                break
+            parts[best_idx:best_idx + 2] = [parts[best_idx] + parts[best_idx + 1]]
+        return tuple(ranks[p] for p in parts)
+
+
+def create_tokenizer(conf: Optional[Dict[str, Any]] = None) -> Tokenizer:
+    """
+    根据 tokenizer 配置创建计数器
+    词表不存在或无法加载时记录警告并回退到估算，不影响研究流程
+    """
+    conf = conf or {}
+    backend = conf.get("backend", "heuristic")
+    if backend == "bpe":
+        vocab_path = conf.get("vocab_path", "")
+        try:
+            tokenizer = BPETokenizer(
+                vocab_path,
+                pattern=conf.get("pattern", "cl100k"),
+                cache_size=conf.get("cache_size", 8192),
+                use_tiktoken=conf.get("use_tiktoken", True),
+            )
+            logger.info(f"[tokenizer] 使用 BPE 词表 {vocab_path}（{tokenizer.backend}）")
+            return tokenizer
+        except (OSError, ValueError, ImportError) as e:
+            logger.warning(f"[tokenizer] 无法加载 BPE 词表 {vocab_path}，回退到估算: {e}")
+    elif backend != "heuristic":
+        logger.warning(f"[tokenizer] 未知的 tokenizer backend: {backend}，使用估算")
+    return HeuristicTokenizer()
+
+
+_default_tokenizer: Optional[Tokenizer] = None
+
+
+def get_tokenizer() -> Tokenizer:
+    """读取 config.yaml 中的 tokenizer 配置，返回进程内共享的计数器（词表只加载一次）"""
+    global _default_tokenizer
+    if _default_tokenizer is None:
+        conf = load_yaml_config(_get_conf_path()).get("tokenizer", {}) or {}
+        _default_tokenizer = create_tokenizer(conf)
+    return _default_tokenizer
@@ -0,0 +1,192 @@
+"""
+带 TTL 的两级字符串缓存，SearchCache 与 SummaryCache 共用：
+- 内存层：进程内 LRU，条目带创建时间
+- 磁盘层（可选）：SQLite(WAL) 文件，可跨运行、跨 worker 复用
+- 相同 key 正在生成时，并发请求等待同一次调用（single-flight）：
+  协程使用 get_or_create，线程使用 get_or_set
+- hits / disk_hits / misses / shared 计数
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class TTLCache:
+    """
+    TTL + LRU + SQLite 缓存
+    - max_entries: 内存 LRU 的条目上限
+    - ttl_seconds: 条目的有效期，None 表示不过期
+    - path: SQLite 文件路径，为空时只使用内存
+    - table / column: SQLite 表名与值所在的列名，由子类指定
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float],
+        path: Optional[str],
+        table: str,
+        column: str = "value",
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._table = table
+        self._column = column
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._sync_inflight: Dict[str, Future] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        # 保护内存 LRU 与 SQLite 连接（同步调用可能来自线程池）
+        self._lock = threading.Lock()
+        # 统计信息
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared = 0
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"key TEXT PRIMARY KEY, {column} TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            # set 每次写入后按 created_at 清理过期条目，没有索引时需要扫描全表
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)")
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "shared": self.shared}
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[1]):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._memory[key]
+        entry = self._disk_get(key)
+        if entry is not None:
+            self._remember(key, *entry)
+            self.disk_hits += 1
+            return entry[0]
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        created_at = time.time()
+        self._remember(key, value, created_at)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self._table} (key, {self._column}, created_at) VALUES (?, ?, ?)",
+                    (key, value, created_at),
+                )
+                if self.ttl_seconds is not None:
+                    self._conn.execute(
+                        f"DELETE FROM {self._table} WHERE created_at < ?", (created_at - self.ttl_seconds,)
+                    )
+
+    async def get_or_create(self, key: str, factory: Callable[[], Awaitable[str]]) -> str:
+        """
+        命中缓存直接返回；否则调用 factory 生成并写入缓存
+        相同 key 正在生成时等待那次调用的结果；失败不写入缓存，异常抛给所有等待者
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            self.shared += 1
+            # asyncio.wait 不会因为 fut 被取消而抛出异常；生成方被取消时由当前调用重新生成
+            await asyncio.wait([fut])
+            if not fut.cancelled():
+                return fut.result()
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        # 没有等待者时也要取走异常，避免 "exception was never retrieved" 警告
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self.set(key, value)
+        fut.set_result(value)
+        return value
+
+    def get_or_set(self, key: str, factory: Callable[[], str]) -> str:
+        """
+        get_or_create 的同步版本，供线程池中的同步调用使用
+        相同 key 正在其他线程中生成时阻塞等待那次调用的结果；失败不写入缓存，异常抛给所有等待者
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self._lock:
+                fut = self._sync_inflight.get(key)
+                if fut is None:
+                    fut = self._sync_inflight[key] = Future()
+                    break
+            self.shared += 1
+            return fut.result()
+
+        self.misses += 1
+        try:
+            value = factory()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._sync_inflight.pop(key, None)
+        self.set(key, value)
+        fut.set_result(value)
+        return value
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while self.max_entries and len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[str, float]]:
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self._column}, created_at FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or self._is_expired(row[1]):
+            return None
+        return row[0], row[1]
@@ -12,7 +12,7 @@ export interface ResearchState {
   researchLoopCount: number;
   maxResearchLoops: number;
   planId: string | null;
-  status: 'pending' | 'coordinate' | 'plan_generated' | 'awaiting_confirmation' | 'research_completed' | 'completed';
+  status: 'pending' | 'coordinate' | 'plan_generated' | 'awaiting_confirmation' | 'researching' | 'research_completed' | 'completed';
   currentStage: string | null;
   researchSummary: string | null;
   stepResults: any[];
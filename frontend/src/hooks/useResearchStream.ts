@@ -9,7 +9,7 @@ export interface ResearchStreamState {
   isConnected: boolean;
 }
 
-// 自定义Hook：使用LangGraph实时流
+// 自定义Hook：订阅后端状态推送（status/watch），替代轮询
 export const useResearchStream = (planId: string | null) => {
   const [streamState, setStreamState] = useState<ResearchStreamState>({
     state: null,
@@ -38,7 +38,7 @@ export const useResearchStream = (planId: string | null) => {
         isConnected: true,
       });
       
-      // 如果研究已完成或需要用户确认计划，停止轮询
+      // 如果研究已完成或需要用户确认计划，停止监听
       if (state.status === 'completed' || state.status === 'awaiting_confirmation' || state.status === 'plan_generated') {
         disconnect();
       }
@@ -65,7 +65,7 @@ export const useResearchStream = (planId: string | null) => {
         isConnected: true,
       });
       
-      // 如果研究已完成或需要用户确认计划，停止轮询
+      // 如果研究已完成或需要用户确认计划，停止监听
       if (state.status === 'completed' || state.status === 'awaiting_confirmation' || state.status === 'plan_generated') {
         disconnect();
       }
@@ -56,6 +56,8 @@ const PlanPage: React.FC = () => {
       return;
     }
     setIsLoading(true);
+    // 研究过程中按顺序到达的报告章节，实时拼接展示
+    let liveReport = '';
     confirmPlanSSE(state.planId, 'confirm', undefined, {
       onStarted: () => {
         dispatch({
@@ -74,6 +76,23 @@ const PlanPage: React.FC = () => {
       onInterrupt: () => {
         dispatch({ type: 'UPDATE_FROM_BACKEND', payload: { status: 'awaiting_confirmation', currentStage: 'human_feedback', needPlan: true } });
       },
+      onStepStarted: (data) => {
+        dispatch({ type: 'UPDATE_STEP_STATUS', payload: { stepIndex: data.step_index - 1, status: 'in_progress' } });
+      },
+      onStepResearched: (data) => {
+        if (data.error) {
+          dispatch({ type: 'UPDATE_STEP_STATUS', payload: { stepIndex: data.step_index - 1, status: 'failed', result: data.message } });
+        }
+      },
+      onSectionMerged: (data) => {
+        dispatch({ type: 'UPDATE_STEP_STATUS', payload: { stepIndex: data.step_index - 1, status: 'completed', result: data.section_md } });
+        liveReport += `\n\n${data.section_md}`;
+        dispatch({ type: 'SET_RESEARCH_SUMMARY', payload: liveReport });
+      },
+      onSummaryDelta: (data) => {
+        liveReport += data.delta || '';
+        dispatch({ type: 'SET_RESEARCH_SUMMARY', payload: liveReport });
+      },
       onResearch: (data) => {
         dispatch({
           type: 'UPDATE_FROM_BACKEND',
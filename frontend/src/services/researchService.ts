@@ -8,12 +8,13 @@ export interface ResearchState {
   messages: string;
   need_plan: boolean;
   plan_id?: string;
-  status: 'pending' | 'coordinate' | 'plan_generated' | 'awaiting_confirmation' | 'research_completed' | 'completed';
+  status: 'pending' | 'coordinate' | 'plan_generated' | 'awaiting_confirmation' | 'researching' | 'research_completed' | 'completed';
   current_stage?: string;
   current_plan?: any;
   research_summary?: string;
   step_results?: any[];
   error?: string;
+  version?: number;
 }
 
 // ===== SSE 通用工具 =====
@@ -26,7 +27,12 @@ type ResearchSSEEvent =
   | 'done'
   | 'error'
   | 'chunk'
-  | 'message';
+  | 'message'
+  | 'step_started'
+  | 'step_researched'
+  | 'section_merged'
+  | 'summary_delta'
+  | 'replay_gap';
 
 export interface ResearchSSEHandlers {
   onStarted?: (data: any) => void;
@@ -37,10 +43,17 @@ export interface ResearchSSEHandlers {
   onDone?: (data: any) => void;
   onError?: (data: any) => void;
   onChunk?: (data: { plan_id?: string; delta?: string } | any) => void;
+  // 研究过程中的增量事件
+  onStepStarted?: (data: { plan_id?: string; step_index: number; title: string } | any) => void;
+  onStepResearched?: (data: { plan_id?: string; step_index: number; title: string; error: boolean } | any) => void;
+  onSectionMerged?: (data: { plan_id?: string; step_index: number; title: string; section_md: string } | any) => void;
+  onSummaryDelta?: (data: { plan_id?: string; delta: string } | any) => void;
+  // 重连时部分事件已被服务端淘汰，需要通过状态接口补齐
+  onReplayGap?: (data: { last_event_id: number; first_available_id: number } | any) => void;
   onAny?: (event: ResearchSSEEvent, data: any) => void;
 }
 
-const parseSSE = (chunk: string, buffer: { pending: string }, dispatch: (event: ResearchSSEEvent, data: any) => void) => {
+const parseSSE = (chunk: string, buffer: { pending: string }, dispatch: (event: ResearchSSEEvent, data: any, id?: number) => void) => {
   buffer.pending += chunk;
   const events = buffer.pending.split('\n\n');
   // 保留最后一个未完成块
@@ -48,9 +61,12 @@ const parseSSE = (chunk: string, buffer: { pending: string }, dispatch: (event:
   for (const rawEvent of events) {
     const lines = rawEvent.split('\n');
     let event: ResearchSSEEvent = 'message';
+    let id: number | undefined;
     const dataLines: string[] = [];
     for (const line of lines) {
-      if (line.startsWith('event:')) {
+      if (line.startsWith('id:')) {
+        id = Number(line.slice('id:'.length).trim());
+      } else if (line.startsWith('event:')) {
         event = line.slice('event:'.length).trim() as ResearchSSEEvent;
       } else if (line.startsWith('data:')) {
         dataLines.push(line.slice('data:'.length).trim());
@@ -63,17 +79,26 @@ const parseSSE = (chunk: string, buffer: { pending: string }, dispatch: (event:
     } catch {
       // 非 JSON 数据，原样传递
     }
-    dispatch(event, data);
+    dispatch(event, data, id);
   }
 };
 
+// 连接意外断开后的最大重连次数与间隔
+const SSE_MAX_RETRIES = 5;
+const SSE_RETRY_DELAY_MS = 1000;
+
 const ssePost = (url: string, body: any, handlers: ResearchSSEHandlers) => {
   const controller = new AbortController();
   const signal = controller.signal;
-  const buffer = { pending: '' };
-  const decoder = new TextDecoder();
+  // 断线重连所需：计划ID、最后收到的事件ID、服务端是否已发送 done
+  let planId: string | undefined;
+  let lastEventId = 0;
+  let serverDone = false;
 
-  const dispatch = (event: ResearchSSEEvent, data: any) => {
+  const dispatch = (event: ResearchSSEEvent, data: any, id?: number) => {
+    if (id) lastEventId = id;
+    if (!planId && data?.plan_id) planId = data.plan_id;
+    if (event === 'done') serverDone = true;
     handlers.onAny && handlers.onAny(event, data);
     switch (event) {
       case 'started':
@@ -100,44 +125,86 @@ const ssePost = (url: string, body: any, handlers: ResearchSSEHandlers) => {
       case 'error':
         handlers.onError && handlers.onError(data);
         break;
+      case 'step_started':
+        handlers.onStepStarted && handlers.onStepStarted(data);
+        break;
+      case 'step_researched':
+        handlers.onStepResearched && handlers.onStepResearched(data);
+        break;
+      case 'section_merged':
+        handlers.onSectionMerged && handlers.onSectionMerged(data);
+        break;
+      case 'summary_delta':
+        handlers.onSummaryDelta && handlers.onSummaryDelta(data);
+        break;
+      case 'replay_gap':
+        handlers.onReplayGap && handlers.onReplayGap(data);
+        break;
       default:
         break;
     }
   };
 
+  // 读取一次连接的事件流，直到服务端关闭连接
+  const readStream = async (resp: Response) => {
+    const buffer = { pending: '' };
+    const decoder = new TextDecoder();
+    const reader = resp.body!.getReader();
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      const text = decoder.decode(value, { stream: true });
+      parseSSE(text, buffer, dispatch);
+    }
+    // flush 剩余
+    if (buffer.pending) {
+      parseSSE('\n\n', buffer, dispatch);
+    }
+  };
+
+  // 重连地址与原请求同源：研究在后台继续，按 Last-Event-ID 补发错过的事件
+  const origin = url.startsWith('http') ? new URL(url).origin : '';
+
   (async () => {
-    try {
-      const resp = await fetch(url, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Accept': 'text/event-stream',
-        },
-        body: JSON.stringify(body || {}),
-        signal,
-      });
-      if (!resp.ok || !resp.body) {
-        const msg = `SSE 请求失败: ${resp.status} ${resp.statusText}`;
-        dispatch('error', { error: msg });
-        dispatch('done', {});
-        return;
-      }
-      const reader = resp.body.getReader();
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
-        const text = decoder.decode(value, { stream: true });
-        parseSSE(text, buffer, dispatch);
-      }
-      // flush 剩余
-      if (buffer.pending) {
-        parseSSE('\n\n', buffer, dispatch);
+    let lastError: string | undefined;
+    for (let attempt = 0; attempt <= SSE_MAX_RETRIES; attempt++) {
+      try {
+        const resp = attempt === 0
+          ? await fetch(url, {
+              method: 'POST',
+              headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+              },
+              body: JSON.stringify(body || {}),
+              signal,
+            })
+          : await fetch(`${origin}/api/research/stream/${planId}`, {
+              headers: {
+                'Accept': 'text/event-stream',
+                'Last-Event-ID': String(lastEventId),
+              },
+              signal,
+            });
+        if (!resp.ok || !resp.body) {
+          const msg = `SSE 请求失败: ${resp.status} ${resp.statusText}`;
+          dispatch('error', { error: msg });
+          dispatch('done', {});
+          return;
+        }
+        await readStream(resp);
+        lastError = undefined;
+      } catch (e: any) {
+        lastError = e?.message || String(e);
       }
-      dispatch('done', {});
-    } catch (e: any) {
-      dispatch('error', { error: e?.message || String(e) });
-      dispatch('done', {});
+      // 正常结束、主动取消或尚未拿到计划ID时不再重连
+      if (serverDone || signal.aborted || !planId) break;
+      await new Promise((resolve) => setTimeout(resolve, SSE_RETRY_DELAY_MS));
+    }
+    if (lastError) {
+      dispatch('error', { error: lastError });
     }
+    dispatch('done', {});
   })();
 
   return { close: () => controller.abort() };
@@ -192,27 +259,42 @@ export const getResearchStatus = async (planId: string): Promise<ResearchState>
   return await response.json();
 };
 
-// 创建实时流监听器
+// 创建实时流监听器：订阅状态推送（status/watch），首次收到完整快照，之后只收到变化部分
 export const createResearchStream = (planId: string) => {
-  // 这里可以集成LangGraph SDK的实时流功能
-  // 目前先使用轮询方式，后续可以升级为WebSocket
   return {
     subscribe: (callback: (state: ResearchState) => void) => {
-      const interval = setInterval(async () => {
-        try {
-          const status = await getResearchStatus(planId);
-          callback(status);
-          
-          // 如果研究已完成或需要用户确认计划，停止轮询
-          if (status.status === 'completed' || status.status === 'awaiting_confirmation' || status.status === 'plan_generated') {
-            clearInterval(interval);
-          }
-        } catch (error) {
-          console.error('获取研究状态失败:', error);
+      // EventSource 断线后会自动重连并携带 Last-Event-ID（状态版本号），服务端只补发之后的变化
+      const source = new EventSource(`/api/research/status/${planId}/watch`);
+      let current: ResearchState | null = null;
+
+      const emit = (next: ResearchState) => {
+        current = next;
+        callback(next);
+        // 研究已完成或需要用户确认计划时停止监听
+        if (next.status === 'completed' || next.status === 'awaiting_confirmation' || next.status === 'plan_generated') {
+          source.close();
+        }
+      };
+
+      source.addEventListener('snapshot', (e) => {
+        emit(JSON.parse((e as MessageEvent).data));
+      });
+      source.addEventListener('diff', (e) => {
+        if (!current) return;
+        const diff = JSON.parse((e as MessageEvent).data);
+        const stepResults = diff.step_results_added
+          ? [...(current.step_results || []), ...diff.step_results_added]
+          : current.step_results;
+        emit({ ...current, step_results: stepResults, ...diff.changes });
+      });
+      source.onerror = () => {
+        // 研究完成后服务端会关闭连接，此时无需重连
+        if (current?.status === 'completed') {
+          source.close();
         }
-      }, 2000); // 每2秒轮询一次
+      };
 
-      return () => clearInterval(interval);
+      return () => source.close();
     },
   };
 };
@@ -224,7 +306,8 @@ export const startResearchSSE = (
   handlers: ResearchSSEHandlers
 ) => {
   // 直连后端以避免开发代理对 SSE(POST) 的缓冲
-  return ssePost('http://localhost:8000/api/research/start/stream?mode=messages', { topic, locale }, handlers);
+  // mode=both：同时接收 LLM 增量 token 与阶段事件（每个事件携带单调递增的 seq）
+  return ssePost('http://localhost:8000/api/research/start/stream?mode=both', { topic, locale }, handlers);
 };
 
 // ===== 基于 SSE 的确认计划流 =====